@@ -0,0 +1,688 @@
+import asyncio
+import base64
+import contextvars
+import functools
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, Awaitable, Callable, List, Set, Tuple
+
+psycopg2 = None  # imported on first database use, so OPTIONS preflights never load the driver
+psycopg = None  # psycopg 3, imported by the async execution mode only
+
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '2'))
+DB_POOL_PING_INTERVAL = float(os.environ.get('DB_POOL_PING_INTERVAL', '30'))
+PREPARED_STATEMENTS_MAX = 32
+
+JSON_HEADERS = {
+    'Content-Type': 'application/json',
+    'Access-Control-Allow-Origin': '*'
+}
+PREFLIGHT_RESPONSE = {
+    'statusCode': 200,
+    'headers': {
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Methods': 'GET, OPTIONS',
+        'Access-Control-Allow-Headers': 'Content-Type',
+        'Access-Control-Max-Age': '86400'
+    },
+    'body': ''
+}
+METHOD_NOT_ALLOWED_RESPONSE = {
+    'statusCode': 405,
+    'headers': JSON_HEADERS,
+    'body': json.dumps({'error': 'Method not allowed'})
+}
+
+def json_response(status: int, payload: Any) -> Dict[str, Any]:
+    started = time.perf_counter()
+    body = json.dumps(payload, ensure_ascii=False)
+    add_metric('serialize', time.perf_counter() - started)
+    return {
+        'statusCode': status,
+        'headers': JSON_HEADERS,
+        'isBase64Encoded': False,
+        'body': body
+    }
+
+def error_response(status: int, message: str) -> Dict[str, Any]:
+    return {
+        'statusCode': status,
+        'headers': JSON_HEADERS,
+        'body': json.dumps({'error': message})
+    }
+
+# --- db runtime: copied from shared/db_runtime.py by scripts/sync_db_runtime.py, edit it there ---
+def load_driver():
+    global psycopg2, InstrumentedConnection
+    if psycopg2 is None:
+        import psycopg2.extras
+        if REQUEST_METRICS:
+            InstrumentedConnection = instrumented_connection_class()
+    return psycopg2
+
+_pool_lock = threading.Lock()
+_idle_connections: List[Tuple[Any, float]] = []
+_prepared_statements: Dict[int, Set[str]] = {}
+_pool_stats: Dict[str, int] = {'hits': 0, 'misses': 0, 'discarded': 0, 'open': 0}
+
+def _connection_is_alive(conn, last_used: float) -> bool:
+    if conn.closed:
+        return False
+    if time.monotonic() - last_used < DB_POOL_PING_INTERVAL:
+        return True
+    try:
+        with conn.cursor() as ping:
+            ping.execute('SELECT 1')
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+def _discard_connection(conn) -> None:
+    _pool_stats['discarded'] += 1
+    _pool_stats['open'] -= 1
+    _prepared_statements.pop(id(conn), None)
+    try:
+        conn.close()
+    except psycopg2.Error:
+        pass
+
+def get_connection() -> Tuple[Any, bool]:
+    '''
+    Take a warm connection from the container-level pool or open a new one.
+    Returns (connection, reused); idle connections are health-checked first.
+    '''
+    load_driver()
+    while True:
+        with _pool_lock:
+            entry = _idle_connections.pop() if _idle_connections else None
+        if entry is None:
+            break
+        conn, last_used = entry
+        if _connection_is_alive(conn, last_used):
+            _pool_stats['hits'] += 1
+            return conn, True
+        _discard_connection(conn)
+    
+    _pool_stats['misses'] += 1
+    conn = psycopg2.connect(os.environ.get('DATABASE_URL'), connection_factory=InstrumentedConnection)
+    _pool_stats['open'] += 1
+    add_metric('connects', 1)
+    return conn, False
+
+def release_connection(conn, broken: bool = False) -> None:
+    '''
+    Return a connection to the pool, rolling back any open transaction.
+    Broken connections and connections above DB_POOL_MAX_SIZE are closed.
+    '''
+    if broken or conn.closed:
+        _discard_connection(conn)
+        return
+    try:
+        if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+    except psycopg2.Error:
+        _discard_connection(conn)
+        return
+    with _pool_lock:
+        if len(_idle_connections) < DB_POOL_MAX_SIZE:
+            _idle_connections.append((conn, time.monotonic()))
+            return
+    _discard_connection(conn)
+
+def run_with_connection(operation: Callable[[Any], Dict[str, Any]]) -> Dict[str, Any]:
+    '''
+    Run operation(conn) on a pooled connection. If a reused connection turns
+    out to be dead, it is dropped and the operation is retried once on a fresh one.
+    '''
+    for attempt in range(2):
+        started = time.perf_counter()
+        conn, reused = get_connection()
+        add_metric('connect', time.perf_counter() - started)
+        try:
+            result = operation(conn)
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            release_connection(conn, broken=True)
+            if reused and attempt == 0:
+                continue
+            raise
+        except Exception:
+            release_connection(conn)
+            raise
+        release_connection(conn)
+        return result
+
+def execute_prepared(cur, name: str, statement: str, params: Tuple[Any, ...] = ()) -> None:
+    '''
+    Run a fixed statement ($1..$n placeholders) as a server-side prepared statement.
+    PREPARE is sent once per pooled connection; later calls only send EXECUTE.
+    '''
+    prepared = _prepared_statements.setdefault(id(cur.connection), set())
+    if name not in prepared:
+        if len(prepared) >= PREPARED_STATEMENTS_MAX:
+            cur.execute('DEALLOCATE ALL')
+            prepared.clear()
+        cur.execute(f'PREPARE {name} AS {statement}')
+        prepared.add(name)
+    if params:
+        cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+    else:
+        cur.execute(f'EXECUTE {name}')
+
+REQUEST_METRICS = os.environ.get('REQUEST_METRICS', '1') != '0'
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '250'))
+SLOW_QUERY_EXPLAIN_INTERVAL = 300.0
+EXPLAINABLE_STATEMENTS = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'EXECUTE')
+SLOW_QUERY_MAX_STATEMENT = 2000
+SQL_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+SQL_NUMBER_LITERAL = re.compile(r'(?<![\w$])-?\d+(?:\.\d+)?')
+SQL_REPEATED_ROWS = re.compile(r'(\([^()]*\))(?:, \([^()]*\))+')
+
+InstrumentedConnection = None  # built by load_driver() when REQUEST_METRICS is on
+_request_state = threading.local()
+_async_request: contextvars.ContextVar = contextvars.ContextVar('async_request', default=None)  # (metrics, request_id) on the event loop
+_explained_at: Dict[str, float] = {}
+
+def add_metric(name: str, amount: float) -> None:
+    metrics = getattr(_request_state, 'metrics', None)
+    if metrics is None:
+        state = _async_request.get()
+        metrics = state[0] if state else None
+    if metrics is not None:
+        metrics[name] = metrics.get(name, 0) + amount
+
+def normalize_statement(query: Any) -> str:
+    '''
+    Statement text with whitespace collapsed and inline literals (e.g. execute_values
+    batches) replaced by ?, so slow-query lines group by shape and carry no user data.
+    '''
+    if isinstance(query, bytes):
+        query = query.decode()
+    statement = SQL_NUMBER_LITERAL.sub('?', SQL_STRING_LITERAL.sub('?', ' '.join(query.split())))
+    return SQL_REPEATED_ROWS.sub(r'\1, ...', statement)[:SLOW_QUERY_MAX_STATEMENT]
+
+def log_slow_query(cur, query: Any, params: Any, seconds: float) -> None:
+    '''
+    Print a statement that took longer than SLOW_QUERY_MS with its plan. The plan is a
+    plain EXPLAIN inside a savepoint on the same connection, taken at most once per
+    statement every SLOW_QUERY_EXPLAIN_INTERVAL seconds. Parameter values are never logged.
+    '''
+    statement = normalize_statement(query)
+    plan = None
+    now = time.monotonic()
+    conn = cur.connection
+    if (statement.split(' ', 1)[0].upper() in EXPLAINABLE_STATEMENTS
+            and now - _explained_at.get(statement, -SLOW_QUERY_EXPLAIN_INTERVAL) >= SLOW_QUERY_EXPLAIN_INTERVAL
+            and conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_INERROR):
+        if len(_explained_at) >= 256:
+            _explained_at.clear()
+        _explained_at[statement] = now
+        explain = psycopg2.extensions.cursor(conn)
+        in_transaction = not conn.autocommit
+        try:
+            if in_transaction:
+                explain.execute('SAVEPOINT slow_query_explain')
+            explain.execute('EXPLAIN ' + (query.decode() if isinstance(query, bytes) else query), params)
+            plan = ' | '.join(line for line, in explain.fetchall())
+            if in_transaction:
+                explain.execute('RELEASE SAVEPOINT slow_query_explain')
+        except psycopg2.Error as e:
+            plan = f'unavailable: {str(e).strip()}'
+            if in_transaction:
+                explain.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+        finally:
+            explain.close()
+    print(f"slow_query request_id={getattr(_request_state, 'request_id', '-')} ms={seconds * 1000:.1f} "
+          f"statement={json.dumps(statement, ensure_ascii=False)} plan={json.dumps(plan, ensure_ascii=False)}")
+
+def _timed_cursor_class(base):
+    class TimedCursor(base):
+        def execute(self, query, vars=None):
+            started = time.perf_counter()
+            result = super().execute(query, vars)
+            elapsed = time.perf_counter() - started
+            add_metric('execute', elapsed)
+            add_metric('queries', 1)
+            if elapsed * 1000 >= SLOW_QUERY_MS:
+                log_slow_query(self, query, vars, elapsed)
+            return result
+
+        def fetchone(self):
+            started = time.perf_counter()
+            row = super().fetchone()
+            add_metric('fetch', time.perf_counter() - started)
+            return row
+
+        def fetchmany(self, size=None):
+            started = time.perf_counter()
+            rows = super().fetchmany(self.arraysize if size is None else size)
+            add_metric('fetch', time.perf_counter() - started)
+            return rows
+
+        def fetchall(self):
+            started = time.perf_counter()
+            rows = super().fetchall()
+            add_metric('fetch', time.perf_counter() - started)
+            return rows
+
+    TimedCursor.__name__ = f'Timed{base.__name__}'
+    return TimedCursor
+
+def instrumented_connection_class():
+    '''
+    Connection class whose cursors, whatever cursor_factory is requested, time
+    execute and fetch calls into the metrics of the current invocation.
+    '''
+    timed_classes: Dict[Any, Any] = {}
+
+    class _InstrumentedConnection(psycopg2.extensions.connection):
+        def cursor(self, *args, **kwargs):
+            base = kwargs.get('cursor_factory') or self.cursor_factory or psycopg2.extensions.cursor
+            if base not in timed_classes:
+                timed_classes[base] = _timed_cursor_class(base)
+            kwargs['cursor_factory'] = timed_classes[base]
+            return super().cursor(*args, **kwargs)
+
+    return _InstrumentedConnection
+
+def instrumented(handler_function: Callable[[Dict[str, Any], Any], Dict[str, Any]]):
+    '''
+    Print one metrics line per invocation (OPTIONS preflights excluded): request id,
+    status, total/connect/execute/fetch/serialize milliseconds, statement count,
+    new connections opened, then this container's pool: connections open and the
+    running totals of pool hits, misses and discarded connections.
+    '''
+    if not REQUEST_METRICS:
+        return handler_function
+
+    @functools.wraps(handler_function)
+    def wrapper(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+        if event.get('httpMethod') == 'OPTIONS':
+            return handler_function(event, context)
+        metrics = _request_state.metrics = {}
+        _request_state.request_id = getattr(context, 'request_id', None) or '-'
+        status = 500
+        started = time.perf_counter()
+        try:
+            response = handler_function(event, context)
+            status = response['statusCode']
+            return response
+        finally:
+            total = time.perf_counter() - started
+            _request_state.metrics = None
+            print(f"request_metrics request_id={_request_state.request_id} status={status} "
+                  f"total_ms={total * 1000:.2f} connect_ms={metrics.get('connect', 0) * 1000:.2f} "
+                  f"execute_ms={metrics.get('execute', 0) * 1000:.2f} fetch_ms={metrics.get('fetch', 0) * 1000:.2f} "
+                  f"serialize_ms={metrics.get('serialize', 0) * 1000:.2f} queries={metrics.get('queries', 0)} "
+                  f"connects={metrics.get('connects', 0)} pool_open={_pool_stats['open']} "
+                  f"pool_hits={_pool_stats['hits']} pool_misses={_pool_stats['misses']} "
+                  f"pool_discarded={_pool_stats['discarded']}")
+
+    return wrapper
+
+DB_EXECUTION_MODES = ('sync', 'async')
+DB_EXECUTION_MODE = os.environ.get('DB_EXECUTION_MODE', 'sync')
+
+AsyncTimedCursor = None  # built by load_async_driver()
+_async_loop = None
+_async_loop_lock = threading.Lock()
+_async_idle_connections: List[Tuple[Any, float]] = []  # only touched on the event loop thread
+
+def load_async_driver():
+    '''
+    psycopg 3 is an optional dependency of DB_EXECUTION_MODE=async; without it
+    handlers keep running on psycopg2.
+    '''
+    global psycopg, AsyncTimedCursor
+    if psycopg is None:
+        try:
+            import psycopg
+        except ImportError:
+            return None
+        AsyncTimedCursor = async_cursor_class()
+    return psycopg
+
+def async_mode() -> bool:
+    return DB_EXECUTION_MODE == 'async' and load_async_driver() is not None
+
+def async_cursor_class():
+    '''
+    Client-side binding cursor, so statements written for psycopg2 (%s placeholders,
+    EXPLAIN with parameters, PREPARE/EXECUTE) run unchanged. With REQUEST_METRICS on,
+    execute and fetch calls are timed into the metrics of the invocation awaiting them.
+    '''
+    base = psycopg.AsyncClientCursor
+    if not REQUEST_METRICS:
+        return base
+
+    class _AsyncTimedCursor(base):
+        async def execute(self, query, params=None, **kwargs):
+            started = time.perf_counter()
+            result = await super().execute(query, params, **kwargs)
+            elapsed = time.perf_counter() - started
+            add_metric('execute', elapsed)
+            add_metric('queries', 1)
+            if elapsed * 1000 >= SLOW_QUERY_MS:
+                print(f"slow_query request_id={current_request_id()} ms={elapsed * 1000:.1f} "
+                      f"statement={json.dumps(normalize_statement(query), ensure_ascii=False)} plan=null")
+            return result
+
+        async def fetchone(self):
+            started = time.perf_counter()
+            row = await super().fetchone()
+            add_metric('fetch', time.perf_counter() - started)
+            return row
+
+        async def fetchmany(self, size=0):
+            started = time.perf_counter()
+            rows = await super().fetchmany(size)
+            add_metric('fetch', time.perf_counter() - started)
+            return rows
+
+        async def fetchall(self):
+            started = time.perf_counter()
+            rows = await super().fetchall()
+            add_metric('fetch', time.perf_counter() - started)
+            return rows
+
+    return _AsyncTimedCursor
+
+def current_request_id() -> str:
+    state = _async_request.get()
+    return state[1] if state else getattr(_request_state, 'request_id', '-')
+
+def _event_loop():
+    '''
+    One event loop per container, running in a daemon thread so that async
+    connections stay open between invocations, like the psycopg2 pool.
+    '''
+    global _async_loop
+    with _async_loop_lock:
+        if _async_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='db-event-loop', daemon=True).start()
+            _async_loop = loop
+    return _async_loop
+
+async def _async_connection_is_alive(conn, last_used: float) -> bool:
+    if conn.closed or conn.broken:
+        return False
+    if time.monotonic() - last_used < DB_POOL_PING_INTERVAL:
+        return True
+    try:
+        await conn.execute('SELECT 1')
+        await conn.rollback()
+        return True
+    except psycopg.Error:
+        return False
+
+async def _discard_async_connection(conn) -> None:
+    _pool_stats['discarded'] += 1
+    _pool_stats['open'] -= 1
+    _prepared_statements.pop(id(conn), None)
+    try:
+        await conn.close()
+    except psycopg.Error:
+        pass
+
+async def get_async_connection() -> Tuple[Any, bool]:
+    '''
+    get_connection for psycopg 3 async connections; the pool counters are shared.
+    '''
+    while _async_idle_connections:
+        conn, last_used = _async_idle_connections.pop()
+        if await _async_connection_is_alive(conn, last_used):
+            _pool_stats['hits'] += 1
+            return conn, True
+        await _discard_async_connection(conn)
+
+    _pool_stats['misses'] += 1
+    conn = await psycopg.AsyncConnection.connect(os.environ.get('DATABASE_URL'), cursor_factory=AsyncTimedCursor)
+    _pool_stats['open'] += 1
+    add_metric('connects', 1)
+    return conn, False
+
+async def release_async_connection(conn) -> None:
+    if conn.closed or conn.broken:
+        await _discard_async_connection(conn)
+        return
+    try:
+        if conn.info.transaction_status != psycopg.pq.TransactionStatus.IDLE:
+            await conn.rollback()
+    except psycopg.Error:
+        await _discard_async_connection(conn)
+        return
+    if len(_async_idle_connections) < DB_POOL_MAX_SIZE:
+        _async_idle_connections.append((conn, time.monotonic()))
+        return
+    await _discard_async_connection(conn)
+
+async def run_with_async_connection(operation: Callable[[Any], Awaitable[Any]]) -> Any:
+    '''
+    run_with_connection for coroutines: await operation(conn) on a pooled async
+    connection, retrying once on a fresh one if a reused connection turns out dead.
+    Several of these can be gathered to run statements concurrently.
+    '''
+    for attempt in range(2):
+        started = time.perf_counter()
+        conn, reused = await get_async_connection()
+        add_metric('connect', time.perf_counter() - started)
+        try:
+            result = await operation(conn)
+        except (psycopg.OperationalError, psycopg.InterfaceError):
+            await release_async_connection(conn)
+            if reused and attempt == 0 and conn.broken:
+                continue
+            raise
+        except BaseException:
+            await release_async_connection(conn)
+            raise
+        await release_async_connection(conn)
+        return result
+
+def run_async(operation: Callable[[Any], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+    '''
+    Entry point from the synchronous handler: run run_with_async_connection(operation)
+    on the container's event loop and block until it returns or raises.
+    '''
+    state = (getattr(_request_state, 'metrics', None), getattr(_request_state, 'request_id', '-'))
+
+    async def invocation() -> Dict[str, Any]:
+        _async_request.set(state)
+        return await run_with_async_connection(operation)
+
+    return asyncio.run_coroutine_threadsafe(invocation(), _event_loop()).result()
+
+async def execute_prepared_async(cur, name: str, statement: str, params: Tuple[Any, ...] = ()) -> None:
+    '''
+    execute_prepared for async cursors.
+    '''
+    prepared = _prepared_statements.setdefault(id(cur.connection), set())
+    if name not in prepared:
+        if len(prepared) >= PREPARED_STATEMENTS_MAX:
+            await cur.execute('DEALLOCATE ALL')
+            prepared.clear()
+        await cur.execute(f'PREPARE {name} AS {statement}')
+        prepared.add(name)
+    if params:
+        await cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+    else:
+        await cur.execute(f'EXECUTE {name}')
+# --- end of db runtime ---
+
+REVIEW_TABLES = {
+    'model': ('t_p16461725_model_photo_db.model_reviews', 'model_id'),
+    'photographer': ('t_p16461725_model_photo_db.photographer_reviews', 'photographer_id')
+}
+MAX_PROFILE_IDS = 50
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    raw = json.dumps([row['created_at'].isoformat(), row['id']], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(token: str) -> Tuple[datetime, int]:
+    '''
+    Decode a keyset cursor into (created_at, id). Raises ValueError on malformed input.
+    '''
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        created_at, review_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(review_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError('Invalid cursor') from e
+
+def reviews_statement(table: str, id_column: str, after: bool) -> str:
+    '''
+    Newest reviews of each profile in $1, $2/$3 being the (created_at, id) cursor
+    when after is set, and the per-profile row limit last.
+    '''
+    keyset = 'AND (r.created_at, r.id) < ($2, $3)' if after else ''
+    return f'''
+        SELECT p.profile_id, r.id, r.author_name, r.rating, r.review_text, r.created_at
+        FROM unnest($1::int[]) AS p(profile_id)
+        CROSS JOIN LATERAL (
+            SELECT id, author_name, rating, review_text, created_at
+            FROM {table} r
+            WHERE r.{id_column} = p.profile_id {keyset}
+            ORDER BY r.created_at DESC, r.id DESC
+            LIMIT ${4 if after else 2}
+        ) r
+    '''
+
+def histogram_statement(table: str, id_column: str) -> str:
+    return f'''
+        SELECT {id_column} AS profile_id, rating, COUNT(*) AS total
+        FROM {table}
+        WHERE {id_column} = ANY($1::int[])
+        GROUP BY {id_column}, rating
+    '''
+
+# Prepared once per connection: (name, statement) by (profile type, cursor given)
+REVIEWS_STATEMENTS = {
+    (profile_type, after): (f"list_{profile_type}_reviews{'_after' if after else ''}", reviews_statement(table, id_column, after))
+    for profile_type, (table, id_column) in REVIEW_TABLES.items() for after in (False, True)
+}
+HISTOGRAM_STATEMENTS = {
+    profile_type: (f'{profile_type}_review_histogram', histogram_statement(table, id_column))
+    for profile_type, (table, id_column) in REVIEW_TABLES.items()
+}
+
+def reviews_response(profile_ids: List[int], limit: int, reviews: List[Dict[str, Any]],
+                     histogram_rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    profiles = {
+        profile_id: {
+            'reviews': [],
+            'nextCursor': None,
+            'summary': {'count': 0, 'average': None, 'histogram': {str(star): 0 for star in range(1, 6)}}
+        }
+        for profile_id in profile_ids
+    }
+    for row in histogram_rows:
+        summary = profiles[row['profile_id']]['summary']
+        summary['histogram'][str(row['rating'])] = row['total']
+        summary['count'] += row['total']
+    for profile in profiles.values():
+        summary = profile['summary']
+        if summary['count']:
+            weighted = sum(int(star) * total for star, total in summary['histogram'].items())
+            summary['average'] = round(weighted / summary['count'], 2)
+    
+    last_rows: Dict[int, Dict[str, Any]] = {}
+    for row in reviews:
+        profile = profiles[row['profile_id']]
+        if len(profile['reviews']) == limit:
+            profile['nextCursor'] = encode_cursor(last_rows[row['profile_id']])
+            continue
+        last_rows[row['profile_id']] = row
+        profile['reviews'].append({
+            'id': row['id'],
+            'authorName': row['author_name'],
+            'rating': row['rating'],
+            'reviewText': row['review_text'],
+            'createdAt': row['created_at'].isoformat()
+        })
+    
+    return json_response(200, {
+        'profiles': [{'id': profile_id, **profile} for profile_id, profile in profiles.items()]
+    })
+
+def parse_ids(raw: str) -> List[int]:
+    ids = []
+    for part in raw.split(','):
+        part = part.strip()
+        if part:
+            profile_id = int(part)
+            if profile_id not in ids:
+                ids.append(profile_id)
+    return ids
+
+@instrumented
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    '''
+    Business: List reviews for one or many models or photographers, newest first, with rating summary
+    Args: event - dict with httpMethod, queryStringParameters (type: model|photographer, ids, limit, cursor)
+          context - object with request_id, function_name
+    Returns: HTTP response with reviews, next cursor and rating histogram per profile
+    '''
+    method: str = event.get('httpMethod', 'GET')
+    
+    if method == 'OPTIONS':
+        return PREFLIGHT_RESPONSE
+    
+    if method != 'GET':
+        return METHOD_NOT_ALLOWED_RESPONSE
+    
+    params = event.get('queryStringParameters', {}) or {}
+    profile_type = params.get('type', 'model')
+    if profile_type not in REVIEW_TABLES:
+        return error_response(400, 'Invalid type')
+    
+    try:
+        profile_ids = parse_ids(params.get('ids') or params.get('id') or '')
+        limit = min(max(int(params.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+    except ValueError:
+        return error_response(400, 'ids and limit must be integers')
+    if not profile_ids or len(profile_ids) > MAX_PROFILE_IDS:
+        return error_response(400, f'Pass between 1 and {MAX_PROFILE_IDS} profile ids')
+    
+    after = None
+    if params.get('cursor'):
+        if len(profile_ids) != 1:
+            return error_response(400, 'cursor can only be used with a single profile id')
+        try:
+            after = decode_cursor(params['cursor'])
+        except ValueError:
+            return error_response(400, 'Invalid cursor')
+    
+    reviews_name, reviews_sql = REVIEWS_STATEMENTS[(profile_type, after is not None)]
+    histogram_name, histogram_sql = HISTOGRAM_STATEMENTS[profile_type]
+    reviews_args = (profile_ids, *(after or ()), limit + 1)
+    
+    if async_mode():
+        async def list_reviews_async(conn) -> Dict[str, Any]:
+            cur = conn.cursor(row_factory=psycopg.rows.dict_row)
+            await execute_prepared_async(cur, reviews_name, reviews_sql, reviews_args)
+            reviews = await cur.fetchall()
+            await execute_prepared_async(cur, histogram_name, histogram_sql, (profile_ids,))
+            histogram_rows = await cur.fetchall()
+            await cur.close()
+            return reviews_response(profile_ids, limit, reviews, histogram_rows)
+        
+        return run_async(list_reviews_async)
+    
+    def list_reviews(conn) -> Dict[str, Any]:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        execute_prepared(cur, reviews_name, reviews_sql, reviews_args)
+        reviews = cur.fetchall()
+        execute_prepared(cur, histogram_name, histogram_sql, (profile_ids,))
+        histogram_rows = cur.fetchall()
+        cur.close()
+        return reviews_response(profile_ids, limit, reviews, histogram_rows)
+    
+    return run_with_connection(list_reviews)
@@ -1,153 +1,1012 @@
+import asyncio
+import base64
+import contextvars
+import functools
+import hashlib
+import io
 import json
+import multiprocessing
 import os
-from typing import Dict, Any
-from datetime import datetime
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, Awaitable, Callable, List, Optional, Set, Tuple
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
 
+psycopg2 = None  # imported on first database use, so OPTIONS preflights never load the driver
+psycopg = None  # psycopg 3, imported by the async execution mode only
+Image = None  # Pillow, imported by the thumbnail stage only
+
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '2'))
+DB_POOL_PING_INTERVAL = float(os.environ.get('DB_POOL_PING_INTERVAL', '30'))
+PREPARED_STATEMENTS_MAX = 32
+
+JSON_HEADERS = {
+    'Content-Type': 'application/json',
+    'Access-Control-Allow-Origin': '*'
+}
+PREFLIGHT_RESPONSE = {
+    'statusCode': 200,
+    'headers': {
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Methods': 'POST, OPTIONS',
+        'Access-Control-Allow-Headers': 'Content-Type',
+        'Access-Control-Max-Age': '86400'
+    },
+    'body': ''
+}
+METHOD_NOT_ALLOWED_RESPONSE = {
+    'statusCode': 405,
+    'headers': JSON_HEADERS,
+    'body': json.dumps({'error': 'Method not allowed'})
+}
+
+def json_response(status: int, payload: Any) -> Dict[str, Any]:
+    started = time.perf_counter()
+    body = json.dumps(payload, ensure_ascii=False)
+    add_metric('serialize', time.perf_counter() - started)
+    return {
+        'statusCode': status,
+        'headers': JSON_HEADERS,
+        'isBase64Encoded': False,
+        'body': body
+    }
+
+def error_response(status: int, message: str) -> Dict[str, Any]:
+    return {
+        'statusCode': status,
+        'headers': JSON_HEADERS,
+        'body': json.dumps({'error': message})
+    }
+
+# --- db runtime: copied from shared/db_runtime.py by scripts/sync_db_runtime.py, edit it there ---
+def load_driver():
+    global psycopg2, InstrumentedConnection
+    if psycopg2 is None:
+        import psycopg2.extras
+        if REQUEST_METRICS:
+            InstrumentedConnection = instrumented_connection_class()
+    return psycopg2
+
+_pool_lock = threading.Lock()
+_idle_connections: List[Tuple[Any, float]] = []
+_prepared_statements: Dict[int, Set[str]] = {}
+_pool_stats: Dict[str, int] = {'hits': 0, 'misses': 0, 'discarded': 0, 'open': 0}
+
+def _connection_is_alive(conn, last_used: float) -> bool:
+    if conn.closed:
+        return False
+    if time.monotonic() - last_used < DB_POOL_PING_INTERVAL:
+        return True
+    try:
+        with conn.cursor() as ping:
+            ping.execute('SELECT 1')
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+def _discard_connection(conn) -> None:
+    _pool_stats['discarded'] += 1
+    _pool_stats['open'] -= 1
+    _prepared_statements.pop(id(conn), None)
+    try:
+        conn.close()
+    except psycopg2.Error:
+        pass
+
+def get_connection() -> Tuple[Any, bool]:
+    '''
+    Take a warm connection from the container-level pool or open a new one.
+    Returns (connection, reused); idle connections are health-checked first.
+    '''
+    load_driver()
+    while True:
+        with _pool_lock:
+            entry = _idle_connections.pop() if _idle_connections else None
+        if entry is None:
+            break
+        conn, last_used = entry
+        if _connection_is_alive(conn, last_used):
+            _pool_stats['hits'] += 1
+            return conn, True
+        _discard_connection(conn)
+    
+    _pool_stats['misses'] += 1
+    conn = psycopg2.connect(os.environ.get('DATABASE_URL'), connection_factory=InstrumentedConnection)
+    _pool_stats['open'] += 1
+    add_metric('connects', 1)
+    return conn, False
+
+def release_connection(conn, broken: bool = False) -> None:
+    '''
+    Return a connection to the pool, rolling back any open transaction.
+    Broken connections and connections above DB_POOL_MAX_SIZE are closed.
+    '''
+    if broken or conn.closed:
+        _discard_connection(conn)
+        return
+    try:
+        if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+    except psycopg2.Error:
+        _discard_connection(conn)
+        return
+    with _pool_lock:
+        if len(_idle_connections) < DB_POOL_MAX_SIZE:
+            _idle_connections.append((conn, time.monotonic()))
+            return
+    _discard_connection(conn)
+
+def run_with_connection(operation: Callable[[Any], Dict[str, Any]]) -> Dict[str, Any]:
+    '''
+    Run operation(conn) on a pooled connection. If a reused connection turns
+    out to be dead, it is dropped and the operation is retried once on a fresh one.
+    '''
+    for attempt in range(2):
+        started = time.perf_counter()
+        conn, reused = get_connection()
+        add_metric('connect', time.perf_counter() - started)
+        try:
+            result = operation(conn)
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            release_connection(conn, broken=True)
+            if reused and attempt == 0:
+                continue
+            raise
+        except Exception:
+            release_connection(conn)
+            raise
+        release_connection(conn)
+        return result
+
+def execute_prepared(cur, name: str, statement: str, params: Tuple[Any, ...] = ()) -> None:
+    '''
+    Run a fixed statement ($1..$n placeholders) as a server-side prepared statement.
+    PREPARE is sent once per pooled connection; later calls only send EXECUTE.
+    '''
+    prepared = _prepared_statements.setdefault(id(cur.connection), set())
+    if name not in prepared:
+        if len(prepared) >= PREPARED_STATEMENTS_MAX:
+            cur.execute('DEALLOCATE ALL')
+            prepared.clear()
+        cur.execute(f'PREPARE {name} AS {statement}')
+        prepared.add(name)
+    if params:
+        cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+    else:
+        cur.execute(f'EXECUTE {name}')
+
+REQUEST_METRICS = os.environ.get('REQUEST_METRICS', '1') != '0'
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '250'))
+SLOW_QUERY_EXPLAIN_INTERVAL = 300.0
+EXPLAINABLE_STATEMENTS = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'EXECUTE')
+SLOW_QUERY_MAX_STATEMENT = 2000
+SQL_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+SQL_NUMBER_LITERAL = re.compile(r'(?<![\w$])-?\d+(?:\.\d+)?')
+SQL_REPEATED_ROWS = re.compile(r'(\([^()]*\))(?:, \([^()]*\))+')
+
+InstrumentedConnection = None  # built by load_driver() when REQUEST_METRICS is on
+_request_state = threading.local()
+_async_request: contextvars.ContextVar = contextvars.ContextVar('async_request', default=None)  # (metrics, request_id) on the event loop
+_explained_at: Dict[str, float] = {}
+
+def add_metric(name: str, amount: float) -> None:
+    metrics = getattr(_request_state, 'metrics', None)
+    if metrics is None:
+        state = _async_request.get()
+        metrics = state[0] if state else None
+    if metrics is not None:
+        metrics[name] = metrics.get(name, 0) + amount
+
+def normalize_statement(query: Any) -> str:
+    '''
+    Statement text with whitespace collapsed and inline literals (e.g. execute_values
+    batches) replaced by ?, so slow-query lines group by shape and carry no user data.
+    '''
+    if isinstance(query, bytes):
+        query = query.decode()
+    statement = SQL_NUMBER_LITERAL.sub('?', SQL_STRING_LITERAL.sub('?', ' '.join(query.split())))
+    return SQL_REPEATED_ROWS.sub(r'\1, ...', statement)[:SLOW_QUERY_MAX_STATEMENT]
+
+def log_slow_query(cur, query: Any, params: Any, seconds: float) -> None:
+    '''
+    Print a statement that took longer than SLOW_QUERY_MS with its plan. The plan is a
+    plain EXPLAIN inside a savepoint on the same connection, taken at most once per
+    statement every SLOW_QUERY_EXPLAIN_INTERVAL seconds. Parameter values are never logged.
+    '''
+    statement = normalize_statement(query)
+    plan = None
+    now = time.monotonic()
+    conn = cur.connection
+    if (statement.split(' ', 1)[0].upper() in EXPLAINABLE_STATEMENTS
+            and now - _explained_at.get(statement, -SLOW_QUERY_EXPLAIN_INTERVAL) >= SLOW_QUERY_EXPLAIN_INTERVAL
+            and conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_INERROR):
+        if len(_explained_at) >= 256:
+            _explained_at.clear()
+        _explained_at[statement] = now
+        explain = psycopg2.extensions.cursor(conn)
+        in_transaction = not conn.autocommit
+        try:
+            if in_transaction:
+                explain.execute('SAVEPOINT slow_query_explain')
+            explain.execute('EXPLAIN ' + (query.decode() if isinstance(query, bytes) else query), params)
+            plan = ' | '.join(line for line, in explain.fetchall())
+            if in_transaction:
+                explain.execute('RELEASE SAVEPOINT slow_query_explain')
+        except psycopg2.Error as e:
+            plan = f'unavailable: {str(e).strip()}'
+            if in_transaction:
+                explain.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+        finally:
+            explain.close()
+    print(f"slow_query request_id={getattr(_request_state, 'request_id', '-')} ms={seconds * 1000:.1f} "
+          f"statement={json.dumps(statement, ensure_ascii=False)} plan={json.dumps(plan, ensure_ascii=False)}")
+
+def _timed_cursor_class(base):
+    class TimedCursor(base):
+        def execute(self, query, vars=None):
+            started = time.perf_counter()
+            result = super().execute(query, vars)
+            elapsed = time.perf_counter() - started
+            add_metric('execute', elapsed)
+            add_metric('queries', 1)
+            if elapsed * 1000 >= SLOW_QUERY_MS:
+                log_slow_query(self, query, vars, elapsed)
+            return result
+
+        def fetchone(self):
+            started = time.perf_counter()
+            row = super().fetchone()
+            add_metric('fetch', time.perf_counter() - started)
+            return row
+
+        def fetchmany(self, size=None):
+            started = time.perf_counter()
+            rows = super().fetchmany(self.arraysize if size is None else size)
+            add_metric('fetch', time.perf_counter() - started)
+            return rows
+
+        def fetchall(self):
+            started = time.perf_counter()
+            rows = super().fetchall()
+            add_metric('fetch', time.perf_counter() - started)
+            return rows
+
+    TimedCursor.__name__ = f'Timed{base.__name__}'
+    return TimedCursor
+
+def instrumented_connection_class():
+    '''
+    Connection class whose cursors, whatever cursor_factory is requested, time
+    execute and fetch calls into the metrics of the current invocation.
+    '''
+    timed_classes: Dict[Any, Any] = {}
+
+    class _InstrumentedConnection(psycopg2.extensions.connection):
+        def cursor(self, *args, **kwargs):
+            base = kwargs.get('cursor_factory') or self.cursor_factory or psycopg2.extensions.cursor
+            if base not in timed_classes:
+                timed_classes[base] = _timed_cursor_class(base)
+            kwargs['cursor_factory'] = timed_classes[base]
+            return super().cursor(*args, **kwargs)
+
+    return _InstrumentedConnection
+
+def instrumented(handler_function: Callable[[Dict[str, Any], Any], Dict[str, Any]]):
+    '''
+    Print one metrics line per invocation (OPTIONS preflights excluded): request id,
+    status, total/connect/execute/fetch/serialize milliseconds, statement count,
+    new connections opened, then this container's pool: connections open and the
+    running totals of pool hits, misses and discarded connections.
+    '''
+    if not REQUEST_METRICS:
+        return handler_function
+
+    @functools.wraps(handler_function)
+    def wrapper(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+        if event.get('httpMethod') == 'OPTIONS':
+            return handler_function(event, context)
+        metrics = _request_state.metrics = {}
+        _request_state.request_id = getattr(context, 'request_id', None) or '-'
+        status = 500
+        started = time.perf_counter()
+        try:
+            response = handler_function(event, context)
+            status = response['statusCode']
+            return response
+        finally:
+            total = time.perf_counter() - started
+            _request_state.metrics = None
+            print(f"request_metrics request_id={_request_state.request_id} status={status} "
+                  f"total_ms={total * 1000:.2f} connect_ms={metrics.get('connect', 0) * 1000:.2f} "
+                  f"execute_ms={metrics.get('execute', 0) * 1000:.2f} fetch_ms={metrics.get('fetch', 0) * 1000:.2f} "
+                  f"serialize_ms={metrics.get('serialize', 0) * 1000:.2f} queries={metrics.get('queries', 0)} "
+                  f"connects={metrics.get('connects', 0)} pool_open={_pool_stats['open']} "
+                  f"pool_hits={_pool_stats['hits']} pool_misses={_pool_stats['misses']} "
+                  f"pool_discarded={_pool_stats['discarded']}")
+
+    return wrapper
+
+DB_EXECUTION_MODES = ('sync', 'async')
+DB_EXECUTION_MODE = os.environ.get('DB_EXECUTION_MODE', 'sync')
+
+AsyncTimedCursor = None  # built by load_async_driver()
+_async_loop = None
+_async_loop_lock = threading.Lock()
+_async_idle_connections: List[Tuple[Any, float]] = []  # only touched on the event loop thread
+
+def load_async_driver():
+    '''
+    psycopg 3 is an optional dependency of DB_EXECUTION_MODE=async; without it
+    handlers keep running on psycopg2.
+    '''
+    global psycopg, AsyncTimedCursor
+    if psycopg is None:
+        try:
+            import psycopg
+        except ImportError:
+            return None
+        AsyncTimedCursor = async_cursor_class()
+    return psycopg
+
+def async_mode() -> bool:
+    return DB_EXECUTION_MODE == 'async' and load_async_driver() is not None
+
+def async_cursor_class():
+    '''
+    Client-side binding cursor, so statements written for psycopg2 (%s placeholders,
+    EXPLAIN with parameters, PREPARE/EXECUTE) run unchanged. With REQUEST_METRICS on,
+    execute and fetch calls are timed into the metrics of the invocation awaiting them.
+    '''
+    base = psycopg.AsyncClientCursor
+    if not REQUEST_METRICS:
+        return base
+
+    class _AsyncTimedCursor(base):
+        async def execute(self, query, params=None, **kwargs):
+            started = time.perf_counter()
+            result = await super().execute(query, params, **kwargs)
+            elapsed = time.perf_counter() - started
+            add_metric('execute', elapsed)
+            add_metric('queries', 1)
+            if elapsed * 1000 >= SLOW_QUERY_MS:
+                print(f"slow_query request_id={current_request_id()} ms={elapsed * 1000:.1f} "
+                      f"statement={json.dumps(normalize_statement(query), ensure_ascii=False)} plan=null")
+            return result
+
+        async def fetchone(self):
+            started = time.perf_counter()
+            row = await super().fetchone()
+            add_metric('fetch', time.perf_counter() - started)
+            return row
+
+        async def fetchmany(self, size=0):
+            started = time.perf_counter()
+            rows = await super().fetchmany(size)
+            add_metric('fetch', time.perf_counter() - started)
+            return rows
+
+        async def fetchall(self):
+            started = time.perf_counter()
+            rows = await super().fetchall()
+            add_metric('fetch', time.perf_counter() - started)
+            return rows
+
+    return _AsyncTimedCursor
+
+def current_request_id() -> str:
+    state = _async_request.get()
+    return state[1] if state else getattr(_request_state, 'request_id', '-')
+
+def _event_loop():
+    '''
+    One event loop per container, running in a daemon thread so that async
+    connections stay open between invocations, like the psycopg2 pool.
+    '''
+    global _async_loop
+    with _async_loop_lock:
+        if _async_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='db-event-loop', daemon=True).start()
+            _async_loop = loop
+    return _async_loop
+
+async def _async_connection_is_alive(conn, last_used: float) -> bool:
+    if conn.closed or conn.broken:
+        return False
+    if time.monotonic() - last_used < DB_POOL_PING_INTERVAL:
+        return True
+    try:
+        await conn.execute('SELECT 1')
+        await conn.rollback()
+        return True
+    except psycopg.Error:
+        return False
+
+async def _discard_async_connection(conn) -> None:
+    _pool_stats['discarded'] += 1
+    _pool_stats['open'] -= 1
+    _prepared_statements.pop(id(conn), None)
+    try:
+        await conn.close()
+    except psycopg.Error:
+        pass
+
+async def get_async_connection() -> Tuple[Any, bool]:
+    '''
+    get_connection for psycopg 3 async connections; the pool counters are shared.
+    '''
+    while _async_idle_connections:
+        conn, last_used = _async_idle_connections.pop()
+        if await _async_connection_is_alive(conn, last_used):
+            _pool_stats['hits'] += 1
+            return conn, True
+        await _discard_async_connection(conn)
+
+    _pool_stats['misses'] += 1
+    conn = await psycopg.AsyncConnection.connect(os.environ.get('DATABASE_URL'), cursor_factory=AsyncTimedCursor)
+    _pool_stats['open'] += 1
+    add_metric('connects', 1)
+    return conn, False
+
+async def release_async_connection(conn) -> None:
+    if conn.closed or conn.broken:
+        await _discard_async_connection(conn)
+        return
+    try:
+        if conn.info.transaction_status != psycopg.pq.TransactionStatus.IDLE:
+            await conn.rollback()
+    except psycopg.Error:
+        await _discard_async_connection(conn)
+        return
+    if len(_async_idle_connections) < DB_POOL_MAX_SIZE:
+        _async_idle_connections.append((conn, time.monotonic()))
+        return
+    await _discard_async_connection(conn)
+
+async def run_with_async_connection(operation: Callable[[Any], Awaitable[Any]]) -> Any:
+    '''
+    run_with_connection for coroutines: await operation(conn) on a pooled async
+    connection, retrying once on a fresh one if a reused connection turns out dead.
+    Several of these can be gathered to run statements concurrently.
+    '''
+    for attempt in range(2):
+        started = time.perf_counter()
+        conn, reused = await get_async_connection()
+        add_metric('connect', time.perf_counter() - started)
+        try:
+            result = await operation(conn)
+        except (psycopg.OperationalError, psycopg.InterfaceError):
+            await release_async_connection(conn)
+            if reused and attempt == 0 and conn.broken:
+                continue
+            raise
+        except BaseException:
+            await release_async_connection(conn)
+            raise
+        await release_async_connection(conn)
+        return result
+
+def run_async(operation: Callable[[Any], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+    '''
+    Entry point from the synchronous handler: run run_with_async_connection(operation)
+    on the container's event loop and block until it returns or raises.
+    '''
+    state = (getattr(_request_state, 'metrics', None), getattr(_request_state, 'request_id', '-'))
+
+    async def invocation() -> Dict[str, Any]:
+        _async_request.set(state)
+        return await run_with_async_connection(operation)
+
+    return asyncio.run_coroutine_threadsafe(invocation(), _event_loop()).result()
+
+async def execute_prepared_async(cur, name: str, statement: str, params: Tuple[Any, ...] = ()) -> None:
+    '''
+    execute_prepared for async cursors.
+    '''
+    prepared = _prepared_statements.setdefault(id(cur.connection), set())
+    if name not in prepared:
+        if len(prepared) >= PREPARED_STATEMENTS_MAX:
+            await cur.execute('DEALLOCATE ALL')
+            prepared.clear()
+        await cur.execute(f'PREPARE {name} AS {statement}')
+        prepared.add(name)
+    if params:
+        await cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+    else:
+        await cur.execute(f'EXECUTE {name}')
+# --- end of db runtime ---
+
+BULK_MAX_PROFILES = int(os.environ.get('BULK_MAX_PROFILES', '5000'))
+BULK_PAGE_SIZE = 1000
+PROFILE_TABLE = 't_p16461725_model_photo_db.models'
+CACHE_PROFILE_TYPE = 'model'
+
+PROFILE_FIELDS = [
+    ('fullName', 'full_name'), ('phone', 'phone'), ('email', 'email'),
+    ('birthDate', 'birth_date'), ('gender', 'gender'),
+    ('height', 'height'), ('weight', 'weight'), ('bust', 'bust'), ('waist', 'waist'),
+    ('hips', 'hips'), ('shoeSize', 'shoe_size'),
+    ('hairColor', 'hair_color'), ('eyeColor', 'eye_color'), ('city', 'city'), ('experience', 'experience'),
+    ('specializations', 'specializations'), ('portfolioLinks', 'portfolio_links'),
+    ('instagram', 'instagram'), ('vk', 'vk'), ('telegram', 'telegram'), ('aboutMe', 'about_me'),
+    ('opennessLevel', 'openness_level'), ('cooperationFormat', 'cooperation_format'),
+    ('isBlocked', 'is_blocked'), ('profilePhotoUrl', 'profile_photo_url')
+]
+FIELD_DEFAULTS = {'specializations': [], 'portfolioLinks': [], 'isBlocked': False}
+REQUIRED_FIELDS = ('fullName', 'phone', 'birthDate', 'gender', 'city')
+MAX_LENGTHS = {'fullName': 255, 'phone': 20, 'email': 255, 'city': 100, 'hairColor': 50, 'eyeColor': 50,
+               'instagram': 255, 'vk': 255, 'telegram': 255}
+INT4_MIN, INT4_MAX = -2**31, 2**31 - 1
+# (decimal places, min, max) of the column behind each numeric field: INTEGER for the
+# measurements, DECIMAL(3,1) for shoe_size
+NUMERIC_FIELDS = {
+    'height': (0, INT4_MIN, INT4_MAX), 'weight': (0, INT4_MIN, INT4_MAX), 'bust': (0, INT4_MIN, INT4_MAX),
+    'waist': (0, INT4_MIN, INT4_MAX), 'hips': (0, INT4_MIN, INT4_MAX), 'shoeSize': (1, Decimal('-99.9'), Decimal('99.9'))
+}
+GENDERS = ('Женщина', 'Мужчина', 'Другое')
+
+# --- reference data: copied from shared/reference_data.py by scripts/sync_db_runtime.py, edit it there ---
+OPENNESS_LEVELS_SQL = 'SELECT label, rank FROM t_p16461725_model_photo_db.openness_levels'
+_openness_ranks: Dict[str, int] = {}
+
+def openness_ranks(conn) -> Dict[str, int]:
+    '''
+    Openness level label -> rank from the openness_levels table, the one list shared
+    by register-model and search-profiles. Loaded once per container.
+    '''
+    if not _openness_ranks:
+        with conn.cursor() as cur:
+            cur.execute(OPENNESS_LEVELS_SQL)
+            _openness_ranks.update(cur.fetchall())
+    return _openness_ranks
+
+async def openness_ranks_async(conn) -> Dict[str, int]:
+    if not _openness_ranks:
+        async with conn.cursor() as cur:
+            await cur.execute(OPENNESS_LEVELS_SQL)
+            _openness_ranks.update(await cur.fetchall())
+    return _openness_ranks
+
+def city_key(name: str) -> str:
+    '''
+    Gazetteer key of a city name; db_migrations/V0011 backfills coordinates with the
+    same fold written in SQL.
+    '''
+    return name.strip().lower().replace('ё', 'е')
+
+CITIES_SQL = 'SELECT name, latitude, longitude FROM t_p16461725_model_photo_db.cities'
+_city_coordinates: Dict[str, Tuple[float, float]] = {}
+
+def city_coordinates(conn) -> Dict[str, Tuple[float, float]]:
+    '''
+    Gazetteer from the cities table keyed by city_key(name): (latitude, longitude).
+    Loaded once per container.
+    '''
+    if not _city_coordinates:
+        with conn.cursor() as cur:
+            cur.execute(CITIES_SQL)
+            _city_coordinates.update((city_key(name), (latitude, longitude)) for name, latitude, longitude in cur.fetchall())
+    return _city_coordinates
+
+async def city_coordinates_async(conn) -> Dict[str, Tuple[float, float]]:
+    if not _city_coordinates:
+        async with conn.cursor() as cur:
+            await cur.execute(CITIES_SQL)
+            _city_coordinates.update((city_key(name), (latitude, longitude)) for name, latitude, longitude in await cur.fetchall())
+    return _city_coordinates
+# --- end of reference data ---
+
+def validate_profile_values(profile: Dict[str, Any], ranks: Dict[str, int]) -> Optional[str]:
+    if profile['gender'] not in GENDERS:
+        return 'Invalid gender'
+    if profile.get('opennessLevel') and profile['opennessLevel'] not in ranks:
+        return 'Invalid opennessLevel'
+    try:
+        date.fromisoformat(str(profile['birthDate']))
+    except ValueError:
+        return 'Invalid birthDate'
+    return None
+
+# --- thumbnails: copied from shared/thumbnails.py by scripts/sync_db_runtime.py, edit it there ---
+THUMBNAIL_SIZES = tuple(int(size) for size in os.environ.get('THUMBNAIL_SIZES', '160,480').split(','))
+THUMBNAIL_QUALITY = int(os.environ.get('THUMBNAIL_QUALITY', '80'))
+THUMBNAIL_DIR = os.environ.get('THUMBNAIL_DIR', '')  # persistent directory served at search-profiles' THUMBNAIL_BASE_URL
+# 0 renders in the handler process; set it to the CPU count on multi-core containers
+THUMBNAIL_WORKERS = int(os.environ.get('THUMBNAIL_WORKERS', '0'))
+THUMBNAIL_MAX_SOURCE_BYTES = 10 * 2**20
+THUMBNAIL_MAX_PIXELS = 40_000_000
+
+_thumbnail_pool = None
+_thumbnail_pool_lock = threading.Lock()
+_thumbnail_stats: Dict[str, int] = {'hits': 0, 'generated': 0, 'failed': 0}
+
+class LocalThumbnailStore:
+    '''
+    Thumbnails as files under root named <key>/<size>.webp; search-profiles builds
+    their URLs from THUMBNAIL_BASE_URL, so root must be persistent storage served at
+    that URL (a mounted bucket, not the function's /tmp). Any object with the same
+    exists/put methods (e.g. an object storage client) can be assigned to
+    thumbnail_store instead.
+    '''
+    def __init__(self, root: str):
+        self.root = root
+
+    def exists(self, name: str) -> bool:
+        return os.path.exists(os.path.join(self.root, name))
+
+    def put(self, name: str, data: bytes) -> None:
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial = f'{path}.{os.getpid()}.{threading.get_ident()}.part'
+        with open(partial, 'wb') as f:
+            f.write(data)
+        os.replace(partial, path)
+
+# None turns the thumbnail stage off: profiles are stored without a thumbnail key
+thumbnail_store = LocalThumbnailStore(THUMBNAIL_DIR) if THUMBNAIL_DIR else None
+
+def load_pillow():
+    '''
+    Pillow is an optional dependency of the thumbnail stage; without it profiles are
+    stored without a thumbnail key and search returns thumbnailUrls: null.
+    '''
+    global Image
+    if Image is None:
+        try:
+            from PIL import Image
+        except ImportError:
+            return None
+    return Image
+
+def thumbnail_pool() -> ProcessPoolExecutor:
+    '''
+    Workers are spawned, not forked: the handler process already runs the pool lock,
+    the async event loop and the review flush timers, and a forked child would
+    inherit their locks in whatever state they were in. Spawned workers import the
+    handler module afresh by name.
+    '''
+    global _thumbnail_pool
+    with _thumbnail_pool_lock:
+        if _thumbnail_pool is None:
+            _thumbnail_pool = ProcessPoolExecutor(max_workers=THUMBNAIL_WORKERS,
+                                                  mp_context=multiprocessing.get_context('spawn'))
+        return _thumbnail_pool
+
+def discard_thumbnail_pool() -> None:
+    global _thumbnail_pool
+    with _thumbnail_pool_lock:
+        _thumbnail_pool = None
+
+def decode_data_url(url: Any) -> Optional[bytes]:
+    '''
+    Image bytes of a data:image/...;base64 URL (what the registration form sends),
+    or None for anything else, including remote URLs, which are never fetched.
+    '''
+    if not isinstance(url, str) or not url.startswith('data:image/'):
+        return None
+    header, _, payload = url.partition(',')
+    if not header.endswith(';base64') or len(payload) > THUMBNAIL_MAX_SOURCE_BYTES * 4 // 3 + 4:
+        return None
+    try:
+        return base64.b64decode(payload, validate=True)
+    except ValueError:
+        return None
+
+def thumbnail_key(source: bytes) -> str:
+    '''
+    Content address of the thumbnails of one image: the same photo uploaded again
+    maps to thumbnails already in the store, and changing the sizes or quality
+    gives new names instead of overwriting files that may be cached downstream.
+    '''
+    spec = f"webp:{THUMBNAIL_QUALITY}:{','.join(map(str, THUMBNAIL_SIZES))}\n".encode()
+    return hashlib.sha256(spec + source).hexdigest()
+
+def render_thumbnails(source: bytes, sizes: Tuple[int, ...], quality: int) -> List[bytes]:
+    '''
+    Runs in a pool worker: decode the image once and encode one WebP per size, fitted
+    into size x size with the aspect ratio kept and never upscaled.
+    '''
+    from PIL import Image, ImageOps
+    Image.MAX_IMAGE_PIXELS = THUMBNAIL_MAX_PIXELS
+    encoded: Dict[int, bytes] = {}
+    with Image.open(io.BytesIO(source)) as original:
+        original.draft('RGB', (max(sizes), max(sizes)))  # JPEGs decode straight at a reduced scale
+        image = ImageOps.exif_transpose(original)
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+        for size in sorted(sizes, reverse=True):
+            image.thumbnail((size, size), Image.LANCZOS)
+            buffer = io.BytesIO()
+            image.save(buffer, 'WEBP', quality=quality, method=4)
+            encoded[size] = buffer.getvalue()
+    return [encoded[size] for size in sizes]
+
+def make_thumbnails(photo_urls: List[Any]) -> List[Optional[str]]:
+    '''
+    Thumbnail key for each photo (None where there is no decodable data: URL). Images
+    whose thumbnails are all in thumbnail_store already are cache hits; the other
+    distinct images are rendered in the process pool and written to the store. A
+    photo that cannot be rendered gets no key and does not fail the registration.
+    Without a thumbnail_store every key is None.
+    '''
+    keys: List[Optional[str]] = [None] * len(photo_urls)
+    if thumbnail_store is None or load_pillow() is None:
+        return keys
+    started = time.perf_counter()
+    sources: Dict[str, bytes] = {}
+    hits = 0
+    for index, url in enumerate(photo_urls):
+        source = decode_data_url(url)
+        if source is None:
+            continue
+        key = keys[index] = thumbnail_key(source)
+        if key in sources:
+            continue
+        if all(thumbnail_store.exists(f'{key}/{size}.webp') for size in THUMBNAIL_SIZES):
+            hits += 1
+            sources[key] = b''
+            continue
+        sources[key] = source
+
+    pending = {key: source for key, source in sources.items() if source}
+    if THUMBNAIL_WORKERS > 0 and pending:
+        futures = {key: thumbnail_pool().submit(render_thumbnails, source, THUMBNAIL_SIZES, THUMBNAIL_QUALITY)
+                   for key, source in pending.items()}
+        render = lambda key: futures[key].result()
+    else:
+        render = lambda key: render_thumbnails(pending[key], THUMBNAIL_SIZES, THUMBNAIL_QUALITY)
+    failed: Set[str] = set()
+    for key in pending:
+        try:
+            for size, data in zip(THUMBNAIL_SIZES, render(key)):
+                thumbnail_store.put(f'{key}/{size}.webp', data)
+        except Exception as e:  # any decode/encode error raised in the worker
+            failed.add(key)
+            print(f'thumbnail_failed key={key} error={type(e).__name__}: {e}')
+            if isinstance(e, BrokenProcessPool):
+                discard_thumbnail_pool()
+    if failed:
+        keys = [None if key in failed else key for key in keys]
+
+    if sources:
+        generated = len(pending) - len(failed)
+        _thumbnail_stats['hits'] += hits
+        _thumbnail_stats['generated'] += generated
+        _thumbnail_stats['failed'] += len(failed)
+        elapsed = time.perf_counter() - started
+        total = sum(_thumbnail_stats.values())
+        print(f"thumbnails images={len(sources)} hits={hits} generated={generated} failed={len(failed)} "
+              f"ms={elapsed * 1000:.1f} images_per_sec={len(pending) / elapsed if pending else 0:.1f} "
+              f"container_hit_rate={_thumbnail_stats['hits'] / total if total else 0:.3f}")
+    return keys
+# --- end of thumbnails ---
+
+# Derived columns, always written last: openness_rank from opennessLevel, coordinates from city,
+# thumbnail_key from the profile photo
+DERIVED_COLUMNS = ['openness_rank', 'latitude', 'longitude', 'thumbnail_key']
+PROFILE_COLUMN_LIST = ', '.join([column for _, column in PROFILE_FIELDS] + DERIVED_COLUMNS)
+UPSERT_PROFILE_SQL = f'''
+    WITH upserted AS (
+        INSERT INTO {PROFILE_TABLE} ({PROFILE_COLUMN_LIST})
+        VALUES ({', '.join(f'${position}' for position in range(1, len(PROFILE_FIELDS) + len(DERIVED_COLUMNS) + 1))})
+        ON CONFLICT (phone) DO UPDATE SET phone = EXCLUDED.phone
+        RETURNING id, full_name, phone, city, created_at, (xmax = 0) AS created
+    ), bumped AS (
+        UPDATE t_p16461725_model_photo_db.profile_cache_versions
+        SET version = version + 1
+        WHERE profile_type = '{CACHE_PROFILE_TYPE}' AND EXISTS (SELECT 1 FROM upserted WHERE created)
+    )
+    SELECT id, full_name, phone, city, created_at, created FROM upserted
+'''
+
+def profile_values(profile: Dict[str, Any], ranks: Dict[str, int],
+                   cities: Dict[str, Tuple[float, float]], thumbnail: Optional[str]) -> Tuple[Any, ...]:
+    values = tuple(profile.get(key, FIELD_DEFAULTS.get(key)) for key, _ in PROFILE_FIELDS)
+    latitude, longitude = cities.get(city_key(str(profile.get('city') or '')), (None, None))
+    return values + (ranks.get(profile.get('opennessLevel')), latitude, longitude, thumbnail)
+
+class MalformedLine:
+    '''
+    An NDJSON line that is not valid JSON; reported as an error row of its own.
+    '''
+    def __init__(self, error: str):
+        self.error = error
+
+def parse_ndjson_line(line: str) -> Any:
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return MalformedLine(f'Invalid JSON: {e}')
+
+def parse_bulk_body(event: Dict[str, Any]) -> Optional[List[Any]]:
+    '''
+    Profiles of a bulk request (JSON array or NDJSON body), or None for a single profile.
+    Raises ValueError if a JSON array body does not parse.
+    '''
+    body = event.get('body') or ''
+    headers = event.get('headers') or {}
+    content_type = (headers.get('Content-Type') or headers.get('content-type') or '').lower()
+    if 'ndjson' in content_type:
+        return [parse_ndjson_line(line) for line in body.splitlines() if line.strip()]
+    if body.lstrip().startswith('['):
+        profiles = json.loads(body)
+        if not isinstance(profiles, list):
+            raise ValueError('Expected a JSON array')
+        return profiles
+    return None
+
+def numeric_value(value: Any, places: int) -> Decimal:
+    '''
+    value rounded to places decimals the way Postgres stores it in the column; raises
+    ValueError or ArithmeticError for anything the column would reject as a number.
+    '''
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f'not a number: {value!r}')
+    if places == 0 and isinstance(value, str):
+        value = int(value)
+    number = Decimal(str(value).strip())
+    if not number.is_finite():
+        raise ValueError(f'not a finite number: {value!r}')
+    return number.quantize(Decimal(1).scaleb(-places), rounding=ROUND_HALF_UP)
+
+def validate_profile(profile: Any, ranks: Dict[str, int]) -> Optional[str]:
+    if isinstance(profile, MalformedLine):
+        return profile.error
+    if not isinstance(profile, dict):
+        return 'Profile must be an object'
+    missing = [field for field in REQUIRED_FIELDS if not profile.get(field)]
+    if missing:
+        return 'Missing required fields: ' + ', '.join(missing)
+    for field, max_length in MAX_LENGTHS.items():
+        value = profile.get(field)
+        if value is not None and len(str(value)) > max_length:
+            return f'{field} is longer than {max_length} characters'
+    for field, (places, low, high) in NUMERIC_FIELDS.items():
+        value = profile.get(field)
+        if value is not None:
+            try:
+                number = numeric_value(value, places)
+            except (ArithmeticError, ValueError):
+                return f'{field} must be a number'
+            if not low <= number <= high:
+                return f'{field} must be between {low} and {high}'
+    return validate_profile_values(profile, ranks)
+
+def register_bulk(conn, profiles: List[Any]) -> Dict[str, Any]:
+    '''
+    Insert many profiles in multi-row INSERT ... ON CONFLICT (phone) DO NOTHING
+    statements and report created/existing/error per input row.
+    '''
+    ranks = openness_ranks(conn)
+    cities = city_coordinates(conn)
+    results: List[Dict[str, Any]] = []
+    accepted: List[Dict[str, Any]] = []
+    first_index: Dict[str, int] = {}
+    for index, profile in enumerate(profiles):
+        error = validate_profile(profile, ranks)
+        result: Dict[str, Any] = {'index': index, 'phone': profile.get('phone') if isinstance(profile, dict) else None}
+        results.append(result)
+        if error:
+            result['status'] = 'error'
+            result['error'] = error
+            continue
+        phone = str(profile['phone'])
+        if phone not in first_index:
+            first_index[phone] = index
+            accepted.append(profile)
+    thumbnails = make_thumbnails([profile.get('profilePhotoUrl') for profile in accepted])
+    rows = [profile_values(profile, ranks, cities, thumbnail) for profile, thumbnail in zip(accepted, thumbnails)]
+    
+    cur = conn.cursor()
+    created = psycopg2.extras.execute_values(
+        cur,
+        f'''
+        INSERT INTO {PROFILE_TABLE} ({PROFILE_COLUMN_LIST}) VALUES %s
+        ON CONFLICT (phone) DO NOTHING
+        RETURNING id, phone
+        ''',
+        rows,
+        page_size=BULK_PAGE_SIZE,
+        fetch=True
+    ) if rows else []
+    ids_by_phone = {phone: profile_id for profile_id, phone in created}
+    created_phones = set(ids_by_phone)
+    
+    pending = [phone for phone in first_index if phone not in created_phones]
+    if pending:
+        cur.execute(f'SELECT id, phone FROM {PROFILE_TABLE} WHERE phone = ANY(%s)', (pending,))
+        ids_by_phone.update({phone: profile_id for profile_id, phone in cur.fetchall()})
+    if created_phones:
+        cur.execute(
+            'UPDATE t_p16461725_model_photo_db.profile_cache_versions SET version = version + 1 WHERE profile_type = %s',
+            (CACHE_PROFILE_TYPE,)
+        )
+    conn.commit()
+    cur.close()
+    
+    summary = {'created': 0, 'existing': 0, 'error': 0}
+    for result in results:
+        if result.get('status') != 'error':
+            phone = str(result['phone'])
+            is_new = phone in created_phones and first_index[phone] == result['index']
+            result['status'] = 'created' if is_new else 'existing'
+            result['id'] = ids_by_phone.get(phone)
+        summary[result['status']] += 1
+    
+    return json_response(200, {'results': results, 'summary': summary})
+
+def registered(result: Dict[str, Any]) -> Dict[str, Any]:
+    response = {
+        'id': result['id'],
+        'fullName': result['full_name'],
+        'phone': result['phone'],
+        'city': result['city'],
+        'createdAt': result['created_at'].isoformat()
+    }
+    if not result['created']:
+        response['message'] = 'Model with this phone already exists'
+    return json_response(201 if result['created'] else 200, response)
+
+@instrumented
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
-    Business: Register new model with profile data
-    Args: event - dict with httpMethod, body containing model registration data
+    Business: Register new model with profile data, or bulk-import many (JSON array or NDJSON body)
+    Args: event - dict with httpMethod, body containing model registration data (object, array or NDJSON lines)
           context - object with request_id, function_name
-    Returns: HTTP response with created model data
+    Returns: HTTP response with created model data, or per-row created/existing/error statuses for bulk
     '''
     method: str = event.get('httpMethod', 'POST')
     
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': ''
-        }
+        return PREFLIGHT_RESPONSE
     
     if method != 'POST':
-        return {
-            'statusCode': 405,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({'error': 'Method not allowed'})
-        }
+        return METHOD_NOT_ALLOWED_RESPONSE
     
-    body_data = json.loads(event.get('body', '{}'))
+    try:
+        profiles = parse_bulk_body(event)
+    except ValueError as e:
+        return error_response(400, f'Invalid JSON body: {e}')
+    if profiles is not None:
+        if len(profiles) > BULK_MAX_PROFILES:
+            return error_response(400, f'At most {BULK_MAX_PROFILES} profiles per request')
+        return run_with_connection(lambda conn: register_bulk(conn, profiles))
     
-    database_url = os.environ.get('DATABASE_URL')
-    
-    def escape_sql(value):
-        if value is None:
-            return 'NULL'
-        if isinstance(value, bool):
-            return 'TRUE' if value else 'FALSE'
-        if isinstance(value, (int, float)):
-            return str(value)
-        if isinstance(value, list):
-            escaped_items = [escape_sql(item) for item in value]
-            return "ARRAY[" + ",".join(escaped_items) + "]"
-        return "'" + str(value).replace("'", "''") + "'"
-    
-    conn = psycopg2.connect(database_url)
-    conn.autocommit = False
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    
-    full_name = escape_sql(body_data.get('fullName'))
-    phone = escape_sql(body_data.get('phone'))
-    email = escape_sql(body_data.get('email'))
-    birth_date = escape_sql(body_data.get('birthDate'))
-    gender = escape_sql(body_data.get('gender'))
-    height = escape_sql(body_data.get('height'))
-    weight = escape_sql(body_data.get('weight'))
-    bust = escape_sql(body_data.get('bust'))
-    waist = escape_sql(body_data.get('waist'))
-    hips = escape_sql(body_data.get('hips'))
-    shoe_size = escape_sql(body_data.get('shoeSize'))
-    hair_color = escape_sql(body_data.get('hairColor'))
-    eye_color = escape_sql(body_data.get('eyeColor'))
-    city = escape_sql(body_data.get('city'))
-    experience = escape_sql(body_data.get('experience'))
-    specializations = escape_sql(body_data.get('specializations', []))
-    portfolio_links = escape_sql(body_data.get('portfolioLinks', []))
-    instagram = escape_sql(body_data.get('instagram'))
-    vk = escape_sql(body_data.get('vk'))
-    telegram = escape_sql(body_data.get('telegram'))
-    about_me = escape_sql(body_data.get('aboutMe'))
-    openness_level = escape_sql(body_data.get('opennessLevel'))
-    cooperation_format = escape_sql(body_data.get('cooperationFormat'))
-    is_blocked = escape_sql(body_data.get('isBlocked', False))
-    profile_photo_url = escape_sql(body_data.get('profilePhotoUrl'))
-    
-    check_query = f'''
-        SELECT id, full_name, phone, city, created_at
-        FROM t_p16461725_model_photo_db.models
-        WHERE phone = {phone}
-    '''
+    body_data = json.loads(event.get('body', '{}'))
     
-    cur.execute(check_query)
-    existing = cur.fetchone()
+    if async_mode():
+        async def register_async(conn) -> Dict[str, Any]:
+            ranks = await openness_ranks_async(conn)
+            if body_data.get('opennessLevel') and body_data['opennessLevel'] not in ranks:
+                return error_response(400, 'Invalid opennessLevel')
+            cur = conn.cursor(row_factory=psycopg.rows.dict_row)
+            thumbnail = make_thumbnails([body_data.get('profilePhotoUrl')])[0]
+            values = profile_values(body_data, ranks, await city_coordinates_async(conn), thumbnail)
+            await execute_prepared_async(cur, 'upsert_model', UPSERT_PROFILE_SQL, values)
+            result = await cur.fetchone()
+            await conn.commit()
+            await cur.close()
+            return registered(result)
+        
+        return run_async(register_async)
     
-    if existing:
+    def register(conn) -> Dict[str, Any]:
+        ranks = openness_ranks(conn)
+        if body_data.get('opennessLevel') and body_data['opennessLevel'] not in ranks:
+            return error_response(400, 'Invalid opennessLevel')
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        
+        thumbnail = make_thumbnails([body_data.get('profilePhotoUrl')])[0]
+        values = profile_values(body_data, ranks, city_coordinates(conn), thumbnail)
+        execute_prepared(cur, 'upsert_model', UPSERT_PROFILE_SQL, values)
+        
+        result = cur.fetchone()
+        conn.commit()
         cur.close()
-        conn.close()
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'isBase64Encoded': False,
-            'body': json.dumps({
-                'id': existing['id'],
-                'fullName': existing['full_name'],
-                'phone': existing['phone'],
-                'city': existing['city'],
-                'createdAt': existing['created_at'].isoformat(),
-                'message': 'Model with this phone already exists'
-            }, ensure_ascii=False)
-        }
-    
-    query = f'''
-        INSERT INTO t_p16461725_model_photo_db.models (
-            full_name, phone, email, birth_date, gender,
-            height, weight, bust, waist, hips, shoe_size,
-            hair_color, eye_color, city, experience,
-            specializations, portfolio_links,
-            instagram, vk, telegram, about_me,
-            openness_level, cooperation_format, is_blocked, profile_photo_url
-        ) VALUES (
-            {full_name}, {phone}, {email}, {birth_date}, {gender},
-            {height}, {weight}, {bust}, {waist}, {hips}, {shoe_size},
-            {hair_color}, {eye_color}, {city}, {experience},
-            {specializations}, {portfolio_links},
-            {instagram}, {vk}, {telegram}, {about_me},
-            {openness_level}, {cooperation_format}, {is_blocked}, {profile_photo_url}
-        ) RETURNING id, full_name, phone, city, created_at
-    '''
-    
-    cur.execute(query)
+        return registered(result)
     
-    result = cur.fetchone()
-    conn.commit()
-    cur.close()
-    conn.close()
-    
-    return {
-        'statusCode': 201,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*'
-        },
-        'isBase64Encoded': False,
-        'body': json.dumps({
-            'id': result['id'],
-            'fullName': result['full_name'],
-            'phone': result['phone'],
-            'city': result['city'],
-            'createdAt': result['created_at'].isoformat()
-        }, ensure_ascii=False)
-    }
\ No newline at end of file
+    return run_with_connection(register)
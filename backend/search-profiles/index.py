@@ -1,40 +1,1140 @@
+import asyncio
+import base64
+import bisect
+import contextvars
+import csv
+import functools
+import hashlib
+import io
 import json
+import math
 import os
-from typing import Dict, Any
-from datetime import datetime
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Awaitable, Callable, List, Optional, Set, Tuple
+from datetime import date, datetime, timedelta, timezone
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+psycopg2 = None  # imported on first database use, so OPTIONS preflights never load the driver
+psycopg = None  # psycopg 3, imported by the async execution mode only
+numpy = None  # imported by the columnar search engine only
+
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '2'))
+DB_POOL_PING_INTERVAL = float(os.environ.get('DB_POOL_PING_INTERVAL', '30'))
+PREPARED_STATEMENTS_MAX = 32
+
+JSON_HEADERS = {
+    'Content-Type': 'application/json',
+    'Access-Control-Allow-Origin': '*'
+}
+PREFLIGHT_RESPONSE = {
+    'statusCode': 200,
+    'headers': {
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Methods': 'GET, OPTIONS',
+        'Access-Control-Allow-Headers': 'Content-Type',
+        'Access-Control-Max-Age': '86400'
+    },
+    'body': ''
+}
+METHOD_NOT_ALLOWED_RESPONSE = {
+    'statusCode': 405,
+    'headers': JSON_HEADERS,
+    'body': json.dumps({'error': 'Method not allowed'})
+}
+
+def dump_json(payload: Any) -> str:
+    '''
+    Compact UTF-8 JSON via orjson when it is installed, stdlib json otherwise.
+    Both produce the same text for the payloads built here, so ETags match across containers.
+    '''
+    if orjson is not None:
+        return orjson.dumps(payload).decode()
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+
+def json_response(status: int, payload: Any) -> Dict[str, Any]:
+    started = time.perf_counter()
+    body = dump_json(payload)
+    add_metric('serialize', time.perf_counter() - started)
+    return {
+        'statusCode': status,
+        'headers': JSON_HEADERS,
+        'isBase64Encoded': False,
+        'body': body
+    }
+
+def error_response(status: int, message: str) -> Dict[str, Any]:
+    return {
+        'statusCode': status,
+        'headers': JSON_HEADERS,
+        'body': json.dumps({'error': message})
+    }
+
+# --- db runtime: copied from shared/db_runtime.py by scripts/sync_db_runtime.py, edit it there ---
+def load_driver():
+    global psycopg2, InstrumentedConnection
+    if psycopg2 is None:
+        import psycopg2.extras
+        if REQUEST_METRICS:
+            InstrumentedConnection = instrumented_connection_class()
+    return psycopg2
+
+_pool_lock = threading.Lock()
+_idle_connections: List[Tuple[Any, float]] = []
+_prepared_statements: Dict[int, Set[str]] = {}
+_pool_stats: Dict[str, int] = {'hits': 0, 'misses': 0, 'discarded': 0, 'open': 0}
+
+def _connection_is_alive(conn, last_used: float) -> bool:
+    if conn.closed:
+        return False
+    if time.monotonic() - last_used < DB_POOL_PING_INTERVAL:
+        return True
+    try:
+        with conn.cursor() as ping:
+            ping.execute('SELECT 1')
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+def _discard_connection(conn) -> None:
+    _pool_stats['discarded'] += 1
+    _pool_stats['open'] -= 1
+    _prepared_statements.pop(id(conn), None)
+    try:
+        conn.close()
+    except psycopg2.Error:
+        pass
+
+def get_connection() -> Tuple[Any, bool]:
+    '''
+    Take a warm connection from the container-level pool or open a new one.
+    Returns (connection, reused); idle connections are health-checked first.
+    '''
+    load_driver()
+    while True:
+        with _pool_lock:
+            entry = _idle_connections.pop() if _idle_connections else None
+        if entry is None:
+            break
+        conn, last_used = entry
+        if _connection_is_alive(conn, last_used):
+            _pool_stats['hits'] += 1
+            return conn, True
+        _discard_connection(conn)
+    
+    _pool_stats['misses'] += 1
+    conn = psycopg2.connect(os.environ.get('DATABASE_URL'), connection_factory=InstrumentedConnection)
+    _pool_stats['open'] += 1
+    add_metric('connects', 1)
+    return conn, False
+
+def release_connection(conn, broken: bool = False) -> None:
+    '''
+    Return a connection to the pool, rolling back any open transaction.
+    Broken connections and connections above DB_POOL_MAX_SIZE are closed.
+    '''
+    if broken or conn.closed:
+        _discard_connection(conn)
+        return
+    try:
+        if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+    except psycopg2.Error:
+        _discard_connection(conn)
+        return
+    with _pool_lock:
+        if len(_idle_connections) < DB_POOL_MAX_SIZE:
+            _idle_connections.append((conn, time.monotonic()))
+            return
+    _discard_connection(conn)
+
+def run_with_connection(operation: Callable[[Any], Dict[str, Any]]) -> Dict[str, Any]:
+    '''
+    Run operation(conn) on a pooled connection. If a reused connection turns
+    out to be dead, it is dropped and the operation is retried once on a fresh one.
+    '''
+    for attempt in range(2):
+        started = time.perf_counter()
+        conn, reused = get_connection()
+        add_metric('connect', time.perf_counter() - started)
+        try:
+            result = operation(conn)
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            release_connection(conn, broken=True)
+            if reused and attempt == 0:
+                continue
+            raise
+        except Exception:
+            release_connection(conn)
+            raise
+        release_connection(conn)
+        return result
+
+def execute_prepared(cur, name: str, statement: str, params: Tuple[Any, ...] = ()) -> None:
+    '''
+    Run a fixed statement ($1..$n placeholders) as a server-side prepared statement.
+    PREPARE is sent once per pooled connection; later calls only send EXECUTE.
+    '''
+    prepared = _prepared_statements.setdefault(id(cur.connection), set())
+    if name not in prepared:
+        if len(prepared) >= PREPARED_STATEMENTS_MAX:
+            cur.execute('DEALLOCATE ALL')
+            prepared.clear()
+        cur.execute(f'PREPARE {name} AS {statement}')
+        prepared.add(name)
+    if params:
+        cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+    else:
+        cur.execute(f'EXECUTE {name}')
+
+REQUEST_METRICS = os.environ.get('REQUEST_METRICS', '1') != '0'
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '250'))
+SLOW_QUERY_EXPLAIN_INTERVAL = 300.0
+EXPLAINABLE_STATEMENTS = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'EXECUTE')
+SLOW_QUERY_MAX_STATEMENT = 2000
+SQL_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+SQL_NUMBER_LITERAL = re.compile(r'(?<![\w$])-?\d+(?:\.\d+)?')
+SQL_REPEATED_ROWS = re.compile(r'(\([^()]*\))(?:, \([^()]*\))+')
+
+InstrumentedConnection = None  # built by load_driver() when REQUEST_METRICS is on
+_request_state = threading.local()
+_async_request: contextvars.ContextVar = contextvars.ContextVar('async_request', default=None)  # (metrics, request_id) on the event loop
+_explained_at: Dict[str, float] = {}
+
+def add_metric(name: str, amount: float) -> None:
+    metrics = getattr(_request_state, 'metrics', None)
+    if metrics is None:
+        state = _async_request.get()
+        metrics = state[0] if state else None
+    if metrics is not None:
+        metrics[name] = metrics.get(name, 0) + amount
+
+def normalize_statement(query: Any) -> str:
+    '''
+    Statement text with whitespace collapsed and inline literals (e.g. execute_values
+    batches) replaced by ?, so slow-query lines group by shape and carry no user data.
+    '''
+    if isinstance(query, bytes):
+        query = query.decode()
+    statement = SQL_NUMBER_LITERAL.sub('?', SQL_STRING_LITERAL.sub('?', ' '.join(query.split())))
+    return SQL_REPEATED_ROWS.sub(r'\1, ...', statement)[:SLOW_QUERY_MAX_STATEMENT]
+
+def log_slow_query(cur, query: Any, params: Any, seconds: float) -> None:
+    '''
+    Print a statement that took longer than SLOW_QUERY_MS with its plan. The plan is a
+    plain EXPLAIN inside a savepoint on the same connection, taken at most once per
+    statement every SLOW_QUERY_EXPLAIN_INTERVAL seconds. Parameter values are never logged.
+    '''
+    statement = normalize_statement(query)
+    plan = None
+    now = time.monotonic()
+    conn = cur.connection
+    if (statement.split(' ', 1)[0].upper() in EXPLAINABLE_STATEMENTS
+            and now - _explained_at.get(statement, -SLOW_QUERY_EXPLAIN_INTERVAL) >= SLOW_QUERY_EXPLAIN_INTERVAL
+            and conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_INERROR):
+        if len(_explained_at) >= 256:
+            _explained_at.clear()
+        _explained_at[statement] = now
+        explain = psycopg2.extensions.cursor(conn)
+        in_transaction = not conn.autocommit
+        try:
+            if in_transaction:
+                explain.execute('SAVEPOINT slow_query_explain')
+            explain.execute('EXPLAIN ' + (query.decode() if isinstance(query, bytes) else query), params)
+            plan = ' | '.join(line for line, in explain.fetchall())
+            if in_transaction:
+                explain.execute('RELEASE SAVEPOINT slow_query_explain')
+        except psycopg2.Error as e:
+            plan = f'unavailable: {str(e).strip()}'
+            if in_transaction:
+                explain.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+        finally:
+            explain.close()
+    print(f"slow_query request_id={getattr(_request_state, 'request_id', '-')} ms={seconds * 1000:.1f} "
+          f"statement={json.dumps(statement, ensure_ascii=False)} plan={json.dumps(plan, ensure_ascii=False)}")
+
+def _timed_cursor_class(base):
+    class TimedCursor(base):
+        def execute(self, query, vars=None):
+            started = time.perf_counter()
+            result = super().execute(query, vars)
+            elapsed = time.perf_counter() - started
+            add_metric('execute', elapsed)
+            add_metric('queries', 1)
+            if elapsed * 1000 >= SLOW_QUERY_MS:
+                log_slow_query(self, query, vars, elapsed)
+            return result
+
+        def fetchone(self):
+            started = time.perf_counter()
+            row = super().fetchone()
+            add_metric('fetch', time.perf_counter() - started)
+            return row
+
+        def fetchmany(self, size=None):
+            started = time.perf_counter()
+            rows = super().fetchmany(self.arraysize if size is None else size)
+            add_metric('fetch', time.perf_counter() - started)
+            return rows
+
+        def fetchall(self):
+            started = time.perf_counter()
+            rows = super().fetchall()
+            add_metric('fetch', time.perf_counter() - started)
+            return rows
+
+    TimedCursor.__name__ = f'Timed{base.__name__}'
+    return TimedCursor
+
+def instrumented_connection_class():
+    '''
+    Connection class whose cursors, whatever cursor_factory is requested, time
+    execute and fetch calls into the metrics of the current invocation.
+    '''
+    timed_classes: Dict[Any, Any] = {}
+
+    class _InstrumentedConnection(psycopg2.extensions.connection):
+        def cursor(self, *args, **kwargs):
+            base = kwargs.get('cursor_factory') or self.cursor_factory or psycopg2.extensions.cursor
+            if base not in timed_classes:
+                timed_classes[base] = _timed_cursor_class(base)
+            kwargs['cursor_factory'] = timed_classes[base]
+            return super().cursor(*args, **kwargs)
+
+    return _InstrumentedConnection
+
+def instrumented(handler_function: Callable[[Dict[str, Any], Any], Dict[str, Any]]):
+    '''
+    Print one metrics line per invocation (OPTIONS preflights excluded): request id,
+    status, total/connect/execute/fetch/serialize milliseconds, statement count,
+    new connections opened, then this container's pool: connections open and the
+    running totals of pool hits, misses and discarded connections.
+    '''
+    if not REQUEST_METRICS:
+        return handler_function
+
+    @functools.wraps(handler_function)
+    def wrapper(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+        if event.get('httpMethod') == 'OPTIONS':
+            return handler_function(event, context)
+        metrics = _request_state.metrics = {}
+        _request_state.request_id = getattr(context, 'request_id', None) or '-'
+        status = 500
+        started = time.perf_counter()
+        try:
+            response = handler_function(event, context)
+            status = response['statusCode']
+            return response
+        finally:
+            total = time.perf_counter() - started
+            _request_state.metrics = None
+            print(f"request_metrics request_id={_request_state.request_id} status={status} "
+                  f"total_ms={total * 1000:.2f} connect_ms={metrics.get('connect', 0) * 1000:.2f} "
+                  f"execute_ms={metrics.get('execute', 0) * 1000:.2f} fetch_ms={metrics.get('fetch', 0) * 1000:.2f} "
+                  f"serialize_ms={metrics.get('serialize', 0) * 1000:.2f} queries={metrics.get('queries', 0)} "
+                  f"connects={metrics.get('connects', 0)} pool_open={_pool_stats['open']} "
+                  f"pool_hits={_pool_stats['hits']} pool_misses={_pool_stats['misses']} "
+                  f"pool_discarded={_pool_stats['discarded']}")
+
+    return wrapper
+
+DB_EXECUTION_MODES = ('sync', 'async')
+DB_EXECUTION_MODE = os.environ.get('DB_EXECUTION_MODE', 'sync')
+
+AsyncTimedCursor = None  # built by load_async_driver()
+_async_loop = None
+_async_loop_lock = threading.Lock()
+_async_idle_connections: List[Tuple[Any, float]] = []  # only touched on the event loop thread
+
+def load_async_driver():
+    '''
+    psycopg 3 is an optional dependency of DB_EXECUTION_MODE=async; without it
+    handlers keep running on psycopg2.
+    '''
+    global psycopg, AsyncTimedCursor
+    if psycopg is None:
+        try:
+            import psycopg
+        except ImportError:
+            return None
+        AsyncTimedCursor = async_cursor_class()
+    return psycopg
+
+def async_mode() -> bool:
+    return DB_EXECUTION_MODE == 'async' and load_async_driver() is not None
+
+def async_cursor_class():
+    '''
+    Client-side binding cursor, so statements written for psycopg2 (%s placeholders,
+    EXPLAIN with parameters, PREPARE/EXECUTE) run unchanged. With REQUEST_METRICS on,
+    execute and fetch calls are timed into the metrics of the invocation awaiting them.
+    '''
+    base = psycopg.AsyncClientCursor
+    if not REQUEST_METRICS:
+        return base
+
+    class _AsyncTimedCursor(base):
+        async def execute(self, query, params=None, **kwargs):
+            started = time.perf_counter()
+            result = await super().execute(query, params, **kwargs)
+            elapsed = time.perf_counter() - started
+            add_metric('execute', elapsed)
+            add_metric('queries', 1)
+            if elapsed * 1000 >= SLOW_QUERY_MS:
+                print(f"slow_query request_id={current_request_id()} ms={elapsed * 1000:.1f} "
+                      f"statement={json.dumps(normalize_statement(query), ensure_ascii=False)} plan=null")
+            return result
+
+        async def fetchone(self):
+            started = time.perf_counter()
+            row = await super().fetchone()
+            add_metric('fetch', time.perf_counter() - started)
+            return row
+
+        async def fetchmany(self, size=0):
+            started = time.perf_counter()
+            rows = await super().fetchmany(size)
+            add_metric('fetch', time.perf_counter() - started)
+            return rows
+
+        async def fetchall(self):
+            started = time.perf_counter()
+            rows = await super().fetchall()
+            add_metric('fetch', time.perf_counter() - started)
+            return rows
+
+    return _AsyncTimedCursor
+
+def current_request_id() -> str:
+    state = _async_request.get()
+    return state[1] if state else getattr(_request_state, 'request_id', '-')
+
+def _event_loop():
+    '''
+    One event loop per container, running in a daemon thread so that async
+    connections stay open between invocations, like the psycopg2 pool.
+    '''
+    global _async_loop
+    with _async_loop_lock:
+        if _async_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='db-event-loop', daemon=True).start()
+            _async_loop = loop
+    return _async_loop
+
+async def _async_connection_is_alive(conn, last_used: float) -> bool:
+    if conn.closed or conn.broken:
+        return False
+    if time.monotonic() - last_used < DB_POOL_PING_INTERVAL:
+        return True
+    try:
+        await conn.execute('SELECT 1')
+        await conn.rollback()
+        return True
+    except psycopg.Error:
+        return False
+
+async def _discard_async_connection(conn) -> None:
+    _pool_stats['discarded'] += 1
+    _pool_stats['open'] -= 1
+    _prepared_statements.pop(id(conn), None)
+    try:
+        await conn.close()
+    except psycopg.Error:
+        pass
+
+async def get_async_connection() -> Tuple[Any, bool]:
+    '''
+    get_connection for psycopg 3 async connections; the pool counters are shared.
+    '''
+    while _async_idle_connections:
+        conn, last_used = _async_idle_connections.pop()
+        if await _async_connection_is_alive(conn, last_used):
+            _pool_stats['hits'] += 1
+            return conn, True
+        await _discard_async_connection(conn)
+
+    _pool_stats['misses'] += 1
+    conn = await psycopg.AsyncConnection.connect(os.environ.get('DATABASE_URL'), cursor_factory=AsyncTimedCursor)
+    _pool_stats['open'] += 1
+    add_metric('connects', 1)
+    return conn, False
+
+async def release_async_connection(conn) -> None:
+    if conn.closed or conn.broken:
+        await _discard_async_connection(conn)
+        return
+    try:
+        if conn.info.transaction_status != psycopg.pq.TransactionStatus.IDLE:
+            await conn.rollback()
+    except psycopg.Error:
+        await _discard_async_connection(conn)
+        return
+    if len(_async_idle_connections) < DB_POOL_MAX_SIZE:
+        _async_idle_connections.append((conn, time.monotonic()))
+        return
+    await _discard_async_connection(conn)
+
+async def run_with_async_connection(operation: Callable[[Any], Awaitable[Any]]) -> Any:
+    '''
+    run_with_connection for coroutines: await operation(conn) on a pooled async
+    connection, retrying once on a fresh one if a reused connection turns out dead.
+    Several of these can be gathered to run statements concurrently.
+    '''
+    for attempt in range(2):
+        started = time.perf_counter()
+        conn, reused = await get_async_connection()
+        add_metric('connect', time.perf_counter() - started)
+        try:
+            result = await operation(conn)
+        except (psycopg.OperationalError, psycopg.InterfaceError):
+            await release_async_connection(conn)
+            if reused and attempt == 0 and conn.broken:
+                continue
+            raise
+        except BaseException:
+            await release_async_connection(conn)
+            raise
+        await release_async_connection(conn)
+        return result
+
+def run_async(operation: Callable[[Any], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+    '''
+    Entry point from the synchronous handler: run run_with_async_connection(operation)
+    on the container's event loop and block until it returns or raises.
+    '''
+    state = (getattr(_request_state, 'metrics', None), getattr(_request_state, 'request_id', '-'))
+
+    async def invocation() -> Dict[str, Any]:
+        _async_request.set(state)
+        return await run_with_async_connection(operation)
+
+    return asyncio.run_coroutine_threadsafe(invocation(), _event_loop()).result()
+
+async def execute_prepared_async(cur, name: str, statement: str, params: Tuple[Any, ...] = ()) -> None:
+    '''
+    execute_prepared for async cursors.
+    '''
+    prepared = _prepared_statements.setdefault(id(cur.connection), set())
+    if name not in prepared:
+        if len(prepared) >= PREPARED_STATEMENTS_MAX:
+            await cur.execute('DEALLOCATE ALL')
+            prepared.clear()
+        await cur.execute(f'PREPARE {name} AS {statement}')
+        prepared.add(name)
+    if params:
+        await cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+    else:
+        await cur.execute(f'EXECUTE {name}')
+# --- end of db runtime ---
+
+def encode_cursor(item: Dict[str, Any]) -> str:
+    raw = json.dumps([item['lastLogin'], item['id']], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(token: str) -> List[Any]:
+    '''
+    Decode a keyset cursor into [last_login, id]; an empty token starts from the top.
+    Raises ValueError on malformed input.
+    '''
+    if not token:
+        return []
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        last_login, profile_id = json.loads(raw)
+        if last_login is not None:
+            last_login = datetime.fromisoformat(last_login)
+        return [last_login, int(profile_id)]
+    except (TypeError, ValueError) as e:
+        raise ValueError('Invalid cursor') from e
+
+COUNT_MODES = ('exact', 'estimate', 'none')
+SORT_OPTIONS = ('lastLogin', 'rating')
+RATING_ORDER = 'rating_avg DESC, review_count DESC'
+RENDER_MODES = ('python', 'postgres')
+SEARCH_RENDER_MODE = os.environ.get('SEARCH_RENDER_MODE', 'python')
+
+COUNT_CACHE_TTL = float(os.environ.get('COUNT_CACHE_TTL', '30'))
+COUNT_CACHE_MAX_SIZE = 512
+
+_count_cache: Dict[Tuple[str, str, str, Tuple[Any, ...]], Tuple[float, int]] = {}
+
+def count_profiles(cur, table: str, where_clause: str, args: List[Any], mode: str) -> Optional[int]:
+    '''
+    Total rows matching where_clause: exact COUNT(*), the planner's row estimate,
+    or None when counting is disabled. Results are cached per filter set for COUNT_CACHE_TTL.
+    '''
+    if mode == 'none':
+        return None
+    
+    key = count_cache_key(table, where_clause, args, mode)
+    total_count = cached_count(key)
+    if total_count is None:
+        cur.execute(count_statement(table, where_clause, mode), args)
+        total_count = store_count(key, mode, cur.fetchone())
+    return total_count
+
+async def count_profiles_async(conn, table: str, where_clause: str, args: List[Any], mode: str) -> int:
+    '''
+    count_profiles for a total the caller already found missing from the cache.
+    '''
+    async with conn.cursor() as cur:
+        await cur.execute(count_statement(table, where_clause, mode), args)
+        return store_count(count_cache_key(table, where_clause, args, mode), mode, await cur.fetchone())
+
+def count_cache_key(table: str, where_clause: str, args: List[Any], mode: str) -> Tuple[str, str, str, Tuple[Any, ...]]:
+    return (mode, table, where_clause, tuple(tuple(arg) if isinstance(arg, list) else arg for arg in args))
+
+def cached_count(key: Tuple[str, str, str, Tuple[Any, ...]]) -> Optional[int]:
+    cached = _count_cache.get(key)
+    return cached[1] if cached and cached[0] > time.monotonic() else None
+
+def count_statement(table: str, where_clause: str, mode: str) -> str:
+    if mode == 'estimate':
+        return f'''
+            EXPLAIN (FORMAT JSON)
+            SELECT 1 FROM t_p16461725_model_photo_db.{table} WHERE {where_clause}
+        '''
+    return f'''
+            SELECT COUNT(*) as total 
+            FROM t_p16461725_model_photo_db.{table} 
+            WHERE {where_clause}
+        '''
+
+def store_count(key: Tuple[str, str, str, Tuple[Any, ...]], mode: str, row: Tuple[Any, ...]) -> int:
+    if mode == 'estimate':
+        plan = row[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        total_count = int(plan[0]['Plan']['Plan Rows'])
+    else:
+        total_count = row[0]
+    
+    now = time.monotonic()
+    if len(_count_cache) >= COUNT_CACHE_MAX_SIZE:
+        for expired in [k for k, (expires, _) in _count_cache.items() if expires <= now]:
+            del _count_cache[expired]
+        if len(_count_cache) >= COUNT_CACHE_MAX_SIZE:
+            _count_cache.clear()
+    _count_cache[key] = (now + COUNT_CACHE_TTL, total_count)
+    return total_count
+
+def name_search(name: str) -> Tuple[str, List[Any], str]:
+    '''
+    Substring or fuzzy (trigram) match on full_name, its arguments and a similarity
+    rank taking name as its only argument. Both operators are served by the
+    gin_trgm_ops indexes from V0004.
+    '''
+    condition = "(full_name ILIKE %s OR full_name %% %s)"
+    return condition, [f'%{name}%', name], "similarity(full_name, %s)"
+
+def build_page_query(table: str, where_clause: str, args: List[Any], per_page: int, offset: int,
+                     cursor: Optional[List[Any]], rank_order: Optional[str] = None,
+                     rank_args: Optional[List[Any]] = None) -> Tuple[str, List[Any], str, List[Any], str]:
+    '''
+    Returns (FROM ..., its arguments, ORDER BY keys, their arguments, LIMIT ...) for
+    the data query. One extra row is fetched to detect whether a next page exists.
+    In page mode an optional rank ordering is sorted first; cursor mode follows the
+    keyset order only, so the handler rejects ranked searches with a cursor. Both
+    end in id, so the keys order rows totally.
+    '''
+    source = f"t_p16461725_model_photo_db.{table} WHERE {where_clause}"
+    keyset = "last_login DESC NULLS LAST, id DESC"
+    if cursor is None:
+        limit = f"LIMIT {per_page + 1} OFFSET {offset}"
+        if rank_order:
+            return source, args, f"{rank_order}, {keyset}", rank_args or [], limit
+        return source, args, keyset, [], limit
+    limit = f"LIMIT {per_page + 1}"
+    if not cursor:
+        return source, args, keyset, [], limit
+    last_login, profile_id = cursor
+    if last_login is None:
+        return f"{source} AND last_login IS NULL AND id < %s", args + [profile_id], keyset, [], limit
+    # The row comparison is only an Index Cond on the keyset indexes without an OR
+    # beside it, so the NULL last_login tail after it is read by a second branch.
+    source = f'''(
+            (SELECT * FROM {source} AND (last_login, id) < (%s, %s) ORDER BY {keyset} {limit})
+            UNION ALL
+            (SELECT * FROM {source} AND last_login IS NULL ORDER BY {keyset} {limit})
+        ) AS {table}'''
+    return source, args + [last_login, profile_id] + args, keyset, [], limit
+
+def page_statement(columns: str, page_source: str, page_sort: str, page_limit: str) -> str:
+    return f'''
+        SELECT {columns}
+        FROM {page_source}
+        ORDER BY {page_sort}
+        {page_limit}
+    '''
+
+def build_pagination(items: List[Dict[str, Any]], page: int, per_page: int,
+                     total_count: Optional[int], cursor: Optional[List[Any]]) -> Dict[str, Any]:
+    next_item = items[per_page - 1] if len(items) > per_page else None
+    del items[per_page:]
+    return pagination_info(page, per_page, total_count, cursor, next_item)
+
+def pagination_info(page: int, per_page: int, total_count: Optional[int],
+                    cursor: Optional[List[Any]], next_item: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    '''
+    next_item is the last item on this page when another page follows, else None.
+    '''
+    pagination: Dict[str, Any] = {'page': page} if cursor is None else {}
+    pagination['perPage'] = per_page
+    if total_count is not None:
+        pagination['total'] = total_count
+        pagination['totalPages'] = (total_count + per_page - 1) // per_page
+    pagination['hasMore'] = next_item is not None
+    if cursor is not None:
+        pagination['nextCursor'] = encode_cursor(next_item) if next_item else None
+    return pagination
+
+def years_before(day: date, years: int) -> date:
+    try:
+        return day.replace(year=day.year - years)
+    except ValueError:
+        return day.replace(year=day.year - years, day=28)
+
+def age_on(birth_date: date, today: date) -> int:
+    return today.year - birth_date.year - ((today.month, today.day) < (birth_date.month, birth_date.day))
+
+RESULT_CACHE_TTL = float(os.environ.get('RESULT_CACHE_TTL', '15'))
+RESULT_CACHE_MAX_SIZE = int(os.environ.get('RESULT_CACHE_MAX_SIZE', '256'))
+PARAM_DEFAULTS = {'type': 'model', 'page': '1', 'count': 'exact'}
+
+class MemoryResultCache:
+    '''
+    Per-container LRU cache with TTL. Any object with the same get/set methods
+    (e.g. a Redis-backed client) can be assigned to result_cache instead.
+    '''
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: 'OrderedDict[str, Tuple[float, Dict[str, Any]]]' = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+    
+    def set(self, key: str, value: Dict[str, Any], ttl: float) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+result_cache = MemoryResultCache(RESULT_CACHE_MAX_SIZE)
+
+READ_CACHE_VERSION_SQL = 'SELECT version FROM t_p16461725_model_photo_db.profile_cache_versions WHERE profile_type = $1'
+
+def read_cache_version(cur, profile_type: str) -> int:
+    '''
+    Registration handlers bump this counter in the same transaction as the insert,
+    so every cached page built before a new profile appeared becomes unreachable.
+    '''
+    execute_prepared(cur, 'read_cache_version', READ_CACHE_VERSION_SQL, (profile_type,))
+    row = cur.fetchone()
+    return row[0] if row else 0
+
+async def read_cache_version_async(cur, profile_type: str) -> int:
+    await execute_prepared_async(cur, 'read_cache_version', READ_CACHE_VERSION_SQL, (profile_type,))
+    row = await cur.fetchone()
+    return row[0] if row else 0
+
+def result_cache_key(params: Dict[str, str], version: int) -> str:
+    normalized = dict(PARAM_DEFAULTS)
+    for key, value in params.items():
+        value = (value or '').strip()
+        if value or key == 'cursor':
+            normalized[key] = value
+    return json.dumps([version, sorted(normalized.items())], ensure_ascii=False)
+
+def with_etag(response: Dict[str, Any], max_age: Optional[float] = None) -> Dict[str, Any]:
+    etag = '"' + hashlib.sha1(response['body'].encode()).hexdigest() + '"'
+    response['headers'] = {
+        **response['headers'],
+        'ETag': etag,
+        'Cache-Control': f'public, max-age={int(RESULT_CACHE_TTL if max_age is None else max_age)}'
+    }
+    return response
+
+def not_modified_or(response: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+    request_headers = event.get('headers') or {}
+    if_none_match = request_headers.get('If-None-Match') or request_headers.get('if-none-match')
+    etag = response['headers'].get('ETag')
+    if etag and if_none_match and etag in [tag.strip() for tag in if_none_match.split(',')]:
+        return {
+            'statusCode': 304,
+            'headers': response['headers'],
+            'isBase64Encoded': False,
+            'body': ''
+        }
+    return response
+
+# Plain tuple cursors: the item builders unpack rows positionally, in the order of these columns.
+MODEL_FIELDS = ('id', 'full_name', 'birth_date', 'gender', 'height', 'city', 'profile_photo_url', 'thumbnail_key',
+                'openness_level', 'cooperation_format', 'last_login', 'rating_avg', 'review_count')
+PHOTOGRAPHER_FIELDS = ('id', 'full_name', 'city', 'specializations', 'cooperation_format', 'price_range',
+                       'experience_years', 'profile_photo_url', 'thumbnail_key', 'last_login', 'rating_avg', 'review_count')
+MODEL_COLUMNS = ', '.join(MODEL_FIELDS)
+PHOTOGRAPHER_COLUMNS = ', '.join(PHOTOGRAPHER_FIELDS)
+MAX_BATCH_IDS = 100
+# Thumbnails written by the registration handlers as <thumbnail_key>/<size>.webp into
+# their THUMBNAIL_DIR; unset means that store is not served and thumbnailUrls is null
+THUMBNAIL_BASE_URL = os.environ.get('THUMBNAIL_BASE_URL', '').rstrip('/')
+THUMBNAIL_SIZES = tuple(int(size) for size in os.environ.get('THUMBNAIL_SIZES', '160,480').split(','))
+
+def thumbnail_urls(key: Optional[str]) -> Optional[Dict[str, str]]:
+    if not key or not THUMBNAIL_BASE_URL:
+        return None
+    return {str(size): f'{THUMBNAIL_BASE_URL}/{key}/{size}.webp' for size in THUMBNAIL_SIZES}
+
+def model_item(row: Tuple[Any, ...], today: date) -> Dict[str, Any]:
+    (profile_id, full_name, birth_date, gender, height, city, profile_photo_url, thumbnail_key,
+     openness_level, cooperation_format, last_login, rating_avg, review_count) = row
+    return {
+        'id': profile_id,
+        'fullName': full_name,
+        'age': age_on(birth_date, today) if birth_date else None,
+        'height': height,
+        'city': city,
+        'gender': gender,
+        'opennessLevel': openness_level,
+        'cooperationFormat': cooperation_format,
+        'profilePhotoUrl': profile_photo_url,
+        'thumbnailUrls': thumbnail_urls(thumbnail_key),
+        'rating': float(rating_avg) if review_count else None,
+        'reviewCount': review_count,
+        'lastLogin': last_login.isoformat() if last_login else None
+    }
+
+def photographer_item(row: Tuple[Any, ...]) -> Dict[str, Any]:
+    (profile_id, full_name, city, specializations, cooperation_format, price_range,
+     experience_years, profile_photo_url, thumbnail_key, last_login, rating_avg, review_count) = row
+    return {
+        'id': profile_id,
+        'fullName': full_name,
+        'city': city,
+        'specializations': specializations,
+        'cooperationFormat': cooperation_format,
+        'priceRange': price_range,
+        'experienceYears': experience_years,
+        'profilePhotoUrl': profile_photo_url,
+        'thumbnailUrls': thumbnail_urls(thumbnail_key),
+        'rating': float(rating_avg) if review_count else None,
+        'reviewCount': review_count,
+        'lastLogin': last_login.isoformat() if last_login else None
+    }
+
+# SEARCH_RENDER_MODE=postgres builds the profiles array inside the data query. Every
+# value is rendered exactly as model_item/photographer_item + dump_json would render
+# it (compact separators, isoformat timestamps, 4.0-style floats), so both modes
+# return byte-identical bodies.
+def json_text_sql(column: str) -> str:
+    return f"to_json({column})::text"
+
+def iso_timestamp_sql(column: str) -> str:
+    return (f"(to_char({column}, 'YYYY-MM-DD\"T\"HH24:MI:SS') || CASE WHEN "
+            f"mod(EXTRACT(MICROSECONDS FROM {column})::bigint, 1000000) = 0 THEN '' "
+            f"ELSE to_char({column}, '.US') END)")
+
+RATING_SQL = '''CASE WHEN review_count = 0 THEN NULL
+               WHEN rating_avg = trunc(rating_avg) THEN trunc(rating_avg)::int || '.0'
+               ELSE rating_avg::float8::text END'''
+# Same rule as age_on(); takes (today.year, today as MMDD) as arguments.
+AGE_SQL = "(%s - EXTRACT(YEAR FROM birth_date)::int - (to_char(birth_date, 'MMDD') > %s)::int)::text"
+
+def thumbnail_urls_sql() -> str:
+    # thumbnail_urls() rendered around the key column; the key is hex, so it needs no escaping
+    placeholder = '\x00'
+    if thumbnail_urls(placeholder) is None:
+        return 'NULL'
+    parts = dump_json(thumbnail_urls(placeholder)).split(dump_json(placeholder)[1:-1])
+    literals = ["'" + part.replace("'", "''").replace('%', '%%') + "'" for part in parts]
+    return f"CASE WHEN thumbnail_key IS NULL THEN NULL ELSE {' || thumbnail_key || '.join(literals)} END"
+
+THUMBNAIL_URLS_SQL = thumbnail_urls_sql()
+
+MODEL_JSON_FIELDS = (
+    ('id', 'id::text'),
+    ('fullName', json_text_sql('full_name')),
+    ('age', AGE_SQL),
+    ('height', 'height::text'),
+    ('city', json_text_sql('city')),
+    ('gender', json_text_sql('gender')),
+    ('opennessLevel', json_text_sql('openness_level')),
+    ('cooperationFormat', json_text_sql('cooperation_format')),
+    ('profilePhotoUrl', json_text_sql('profile_photo_url')),
+    ('thumbnailUrls', THUMBNAIL_URLS_SQL),
+    ('rating', RATING_SQL),
+    ('reviewCount', 'review_count::text'),
+    ('lastLogin', json_text_sql(iso_timestamp_sql('last_login'))),
+)
+PHOTOGRAPHER_JSON_FIELDS = (
+    ('id', 'id::text'),
+    ('fullName', json_text_sql('full_name')),
+    ('city', json_text_sql('city')),
+    ('specializations', json_text_sql('specializations')),
+    ('cooperationFormat', json_text_sql('cooperation_format')),
+    ('priceRange', json_text_sql('price_range')),
+    ('experienceYears', 'experience_years::text'),
+    ('profilePhotoUrl', json_text_sql('profile_photo_url')),
+    ('thumbnailUrls', THUMBNAIL_URLS_SQL),
+    ('rating', RATING_SQL),
+    ('reviewCount', 'review_count::text'),
+    ('lastLogin', json_text_sql(iso_timestamp_sql('last_login'))),
+)
+
+def json_object_sql(fields: Tuple[Tuple[str, str], ...]) -> str:
+    members = " || ',' || ".join(f"'\"{key}\":' || COALESCE({expression}, 'null')" for key, expression in fields)
+    return f"'{{' || {members} || '}}'"
+
+MODEL_JSON_SQL = json_object_sql(MODEL_JSON_FIELDS)
+PHOTOGRAPHER_JSON_SQL = json_object_sql(PHOTOGRAPHER_JSON_FIELDS)
+
+def render_page_in_postgres(cur, item_sql: str, item_args: List[Any],
+                            page_source: str, source_args: List[Any], page_sort: str, sort_args: List[Any],
+                            page_limit: str, page: int, per_page: int, offset: int,
+                            total_count: Optional[int], cursor: Optional[List[Any]]) -> Dict[str, Any]:
+    '''
+    Run the data query so that it returns one row: the page as a JSON array text,
+    the number of rows fetched and the keyset of the last row on the page. The
+    array is passed through into the response body without decoding any row.
+    Rows are numbered by the page sort keys and aggregated in that order, since
+    the order of a subquery's rows is not carried into the aggregate above it.
+    Items are built a level above the sort, so rows skipped by OFFSET are never
+    rendered and no rendered column shadows a sort key in ORDER BY.
+    '''
+    last = (offset if cursor is None else 0) + per_page  # row_number counts the rows OFFSET skips
+    cur.execute(f'''
+        SELECT '[' || COALESCE(string_agg(item, ',' ORDER BY n) FILTER (WHERE n <= {last}), '') || ']',
+               COUNT(*),
+               MAX(last_login_iso) FILTER (WHERE n = {last}),
+               MAX(id) FILTER (WHERE n = {last})
+        FROM (
+            SELECT {item_sql} AS item, id, {iso_timestamp_sql('last_login')} AS last_login_iso, n
+            FROM (
+                SELECT *, row_number() OVER (ORDER BY {page_sort}) AS n
+                FROM {page_source}
+                ORDER BY {page_sort}
+                {page_limit}
+            ) page
+        ) numbered
+    ''', item_args + sort_args + source_args + sort_args)
+    profiles, fetched, last_login, last_id = cur.fetchone()
+    next_item = {'lastLogin': last_login, 'id': last_id} if fetched > per_page else None
+    pagination = pagination_info(page, per_page, total_count, cursor, next_item)
+    return {
+        'statusCode': 200,
+        'headers': JSON_HEADERS,
+        'isBase64Encoded': False,
+        'body': '{"profiles":' + profiles + ',"pagination":' + dump_json(pagination) + '}'
+    }
+
+def parse_profile_ids(raw: str, default_type: str) -> List[Tuple[str, int]]:
+    '''
+    Parse ids=1,2,photographer:7,model:3 into unique (type, id) pairs in input order.
+    Bare ids take the request's type. Raises ValueError on bad input or too many ids.
+    '''
+    default_type = 'model' if default_type == 'model' else 'photographer'
+    entries: List[Tuple[str, int]] = []
+    for part in raw.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        profile_type, _, profile_id = part.rpartition(':')
+        profile_type = profile_type or default_type
+        if profile_type not in ('model', 'photographer'):
+            raise ValueError(f'Unknown profile type in ids: {profile_type}')
+        try:
+            entry = (profile_type, int(profile_id))
+        except ValueError:
+            raise ValueError(f'Invalid profile id: {part}') from None
+        if entry not in entries:
+            entries.append(entry)
+    if len(entries) > MAX_BATCH_IDS:
+        raise ValueError(f'At most {MAX_BATCH_IDS} ids per request')
+    return entries
+
+def fetch_profiles_by_ids(cur, entries: List[Tuple[str, int]]) -> Dict[str, Any]:
+    '''
+    Load the requested profiles with one = ANY(...) query per profile table,
+    returned in request order. Unknown or blocked profiles are listed in missing.
+    '''
+    today = date.today()
+    found: Dict[Tuple[str, int], Dict[str, Any]] = {}
+    for profile_type, table, columns in (('model', 'models', MODEL_COLUMNS),
+                                         ('photographer', 'photographers', PHOTOGRAPHER_COLUMNS)):
+        ids = [profile_id for entry_type, profile_id in entries if entry_type == profile_type]
+        if not ids:
+            continue
+        cur.execute(f'''
+            SELECT {columns}
+            FROM t_p16461725_model_photo_db.{table}
+            WHERE is_blocked = FALSE AND id = ANY(%s)
+        ''', (ids,))
+        for row in cur.fetchall():
+            item = model_item(row, today) if profile_type == 'model' else photographer_item(row)
+            found[(profile_type, item['id'])] = {'type': profile_type, **item}
+    
+    return json_response(200, {
+        'profiles': [found[entry] for entry in entries if entry in found],
+        'missing': [{'type': entry[0], 'id': entry[1]} for entry in entries if entry not in found]
+    })
+
+FACET_CACHE_TTL = float(os.environ.get('FACET_CACHE_TTL', '120'))
+MODEL_FACETS = (('city', 'city'), ('gender', 'gender'), ('opennessLevel', 'openness_level'),
+                ('cooperationFormat', 'cooperation_format'))
+PHOTOGRAPHER_FACETS = (('city', 'city'), ('cooperationFormat', 'cooperation_format'),
+                       ('specialization', 'specialization'))
+# Each photographer row is joined to one untagged row plus one row per specialization,
+# so a single scan feeds both the per-profile facets and the specialization facet.
+PHOTOGRAPHER_FACET_SOURCE = '''t_p16461725_model_photo_db.photographers
+        CROSS JOIN LATERAL (SELECT NULL::text UNION ALL SELECT unnest(specializations)) s(specialization)'''
+
+def count_facets(cur, profile_type: str, params: Dict[str, str]) -> Dict[str, Any]:
+    '''
+    Counts per value of every facet under the current filters, plus the total,
+    from one GROUPING SETS query. Each facet is counted with all filters applied.
+    '''
+    if profile_type == 'model':
+        facets, source = MODEL_FACETS, 't_p16461725_model_photo_db.models'
+        where_clause, args, _, _ = model_filters(
+            params, date.today(), openness_ranks(cur.connection), city_coordinates(cur.connection)
+        )
+        profile_count, tag_count = 'COUNT(*)', '0'
+    else:
+        facets, source = PHOTOGRAPHER_FACETS, PHOTOGRAPHER_FACET_SOURCE
+        where_clause, args, _, _ = photographer_filters(params, city_coordinates(cur.connection))
+        profile_count = 'COUNT(*) FILTER (WHERE specialization IS NULL)'
+        tag_count = 'COUNT(*) FILTER (WHERE specialization IS NOT NULL)'
+    columns = ', '.join(column for _, column in facets)
+    cur.execute(f'''
+        SELECT GROUPING({columns}), {columns}, {profile_count}, {tag_count}
+        FROM {source}
+        WHERE {where_clause}
+        GROUP BY GROUPING SETS ({', '.join(f'({column})' for _, column in facets)}, ())
+    ''', args)
+    
+    all_grouped = (1 << len(facets)) - 1
+    result: Dict[str, List[Dict[str, Any]]] = {key: [] for key, _ in facets}
+    total = 0
+    for row in cur.fetchall():
+        grouping, values, profiles, tagged = row[0], row[1:-2], row[-2], row[-1]
+        if grouping == all_grouped:
+            total = profiles
+            continue
+        position = next(i for i in range(len(facets)) if not grouping & (1 << (len(facets) - 1 - i)))
+        key, column = facets[position]
+        value = values[position]
+        if value is not None:
+            result[key].append({'value': value, 'count': tagged if column == 'specialization' else profiles})
+    for options in result.values():
+        options.sort(key=lambda option: (-option['count'], option['value']))
+    
+    return json_response(200, {'facets': result, 'total': total})
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8'
+}
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '2000'))
+EXPORT_MAX_ROWS = int(os.environ.get('EXPORT_MAX_ROWS', '50000'))
+
+def export_profiles(conn, profile_type: str, params: Dict[str, str], export_format: str,
+                    write: Callable[[str], Any], limit: Optional[int] = None) -> int:
+    '''
+    Write every profile matching the search filters in params to write() as NDJSON
+    lines or CSV rows, in keyset order (rank order for sort=rating). Rows come from
+    a server-side cursor EXPORT_BATCH_SIZE at a time, so memory stays flat however
+    many rows match. Returns the number of rows written.
+    '''
+    today = date.today()
+    if profile_type == 'model':
+        table, columns, fields = 'models', MODEL_COLUMNS, MODEL_JSON_FIELDS
+        where_clause, args, rank_order, rank_args = model_filters(
+            params, today, openness_ranks(conn), city_coordinates(conn)
+        )
+        to_item = lambda row: model_item(row, today)
+    else:
+        table, columns, fields = 'photographers', PHOTOGRAPHER_COLUMNS, PHOTOGRAPHER_JSON_FIELDS
+        where_clause, args, rank_order, rank_args = photographer_filters(params, city_coordinates(conn))
+        to_item = photographer_item
+    order = "last_login DESC NULLS LAST, id DESC"
+    if rank_order:
+        order = f"{rank_order}, {order}"
+        args = args + (rank_args or [])
+    
+    started = time.monotonic()
+    keys = [key for key, _ in fields]
+    if export_format == 'csv':
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(keys)
+        write(buffer.getvalue())
+    
+    cur = conn.cursor(name=f'export_{table}')
+    cur.execute(f'''
+        SELECT {columns}
+        FROM t_p16461725_model_photo_db.{table}
+        WHERE {where_clause}
+        ORDER BY {order}
+        {f'LIMIT {int(limit)}' if limit is not None else ''}
+    ''', args)
+    rows_written = 0
+    while True:
+        rows = cur.fetchmany(EXPORT_BATCH_SIZE)
+        if not rows:
+            break
+        items = [to_item(row) for row in rows]
+        if export_format == 'csv':
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(
+                [';'.join(value.values() if isinstance(value, dict) else value)
+                 if isinstance(value, (list, dict)) else value for value in item.values()]
+                for item in items
+            )
+            write(buffer.getvalue())
+        else:
+            write(''.join(dump_json(item) + '\n' for item in items))
+        rows_written += len(rows)
+    cur.close()
+    
+    elapsed = time.monotonic() - started
+    print(f"export type={profile_type} format={export_format} rows={rows_written} "
+          f"seconds={elapsed:.3f} rows_per_sec={rows_written / elapsed if elapsed else 0:.0f}")
+    return rows_written
+
+@instrumented
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
-    Business: Search and filter models or photographers with pagination
-    Args: event - dict with httpMethod, queryStringParameters (type: model|photographer, filters)
+    Business: Search and filter models or photographers with pagination, radius search, facet counts, fetch a batch by ids, or export all matches
+    Args: event - dict with httpMethod, queryStringParameters (type: model|photographer, filters, radiusKm with lat/lon or city, facets, ids or export: ndjson|csv)
           context - object with request_id, function_name
     Returns: HTTP response with filtered profiles list and pagination info
     '''
     method: str = event.get('httpMethod', 'GET')
     
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': ''
-        }
+        return PREFLIGHT_RESPONSE
     
     if method != 'GET':
-        return {
-            'statusCode': 405,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({'error': 'Method not allowed'})
-        }
+        return METHOD_NOT_ALLOWED_RESPONSE
     
     params = event.get('queryStringParameters', {}) or {}
     profile_type = params.get('type', 'model')
@@ -43,21 +1143,204 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     per_page = 20
     offset = (page - 1) * per_page
     
-    database_url = os.environ.get('DATABASE_URL')
-    conn = psycopg2.connect(database_url)
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    if params.get('count', 'exact') not in COUNT_MODES:
+        return error_response(400, 'Invalid count mode')
     
-    if profile_type == 'model':
-        result = search_models(cur, params, page, per_page, offset)
-    else:
-        result = search_photographers(cur, params, page, per_page, offset)
+    sort = params.get('sort', 'lastLogin')
+    if sort not in SORT_OPTIONS or (sort == 'rating' and 'cursor' in params):
+        return error_response(400, 'Invalid sort (rating sort is only available in page mode)')
+    if 'cursor' in params and (params.get('radiusKm') or params.get('name')):
+        return error_response(400, 'radiusKm and name searches are ranked and only available in page mode')
     
-    cur.close()
-    conn.close()
+    cursor = None
+    if 'cursor' in params:
+        try:
+            cursor = decode_cursor(params['cursor'])
+        except ValueError:
+            return error_response(400, 'Invalid cursor')
+    
+    if params.get('ids'):
+        try:
+            entries = parse_profile_ids(params['ids'], profile_type)
+        except ValueError as e:
+            return error_response(400, str(e))
+        
+        def fetch(conn) -> Dict[str, Any]:
+            cur = conn.cursor()
+            result = with_etag(fetch_profiles_by_ids(cur, entries))
+            cur.close()
+            return result
+        
+        return not_modified_or(run_with_connection(fetch), event)
+    
+    if params.get('export'):
+        export_format = params['export']
+        if export_format not in EXPORT_FORMATS:
+            return error_response(400, 'Invalid export format')
+        
+        def export(conn) -> Dict[str, Any]:
+            chunks: List[str] = []
+            rows = export_profiles(conn, profile_type, params, export_format, chunks.append, EXPORT_MAX_ROWS + 1)
+            if rows > EXPORT_MAX_ROWS:
+                return error_response(413, f'Export is limited to {EXPORT_MAX_ROWS} rows, narrow the filters')
+            table = 'models' if profile_type == 'model' else 'photographers'
+            return {
+                'statusCode': 200,
+                'headers': {
+                    'Content-Type': EXPORT_FORMATS[export_format],
+                    'Content-Disposition': f'attachment; filename="{table}.{export_format}"',
+                    'Access-Control-Allow-Origin': '*',
+                    'X-Export-Rows': str(rows)
+                },
+                'isBase64Encoded': False,
+                'body': ''.join(chunks)
+            }
+        
+        try:
+            return run_with_connection(export)
+        except ValueError as e:
+            return error_response(400, str(e))
+    
+    if async_mode() and SEARCH_ENGINE == 'sql' and SEARCH_RENDER_MODE == 'python' and not params.get('facets'):
+        async def search_async(conn) -> Dict[str, Any]:
+            async with conn.cursor() as cur:
+                version = await read_cache_version_async(cur, 'model' if profile_type == 'model' else 'photographer')
+            cache_key = result_cache_key(params, version)
+            result = result_cache.get(cache_key)
+            if result is None:
+                result = with_etag(await search_profiles_async(conn, profile_type, params, page, per_page, offset, cursor))
+                result_cache.set(cache_key, result, RESULT_CACHE_TTL)
+            return result
+        
+        try:
+            return not_modified_or(run_async(search_async), event)
+        except ValueError as e:
+            return error_response(400, str(e))
     
-    return result
+    def search(conn) -> Dict[str, Any]:
+        cur = conn.cursor()
+        version = read_cache_version(cur, 'model' if profile_type == 'model' else 'photographer')
+        cache_key = result_cache_key(params, version)
+        result = result_cache.get(cache_key)
+        if result is None:
+            ttl = RESULT_CACHE_TTL
+            if params.get('facets'):
+                result, ttl = count_facets(cur, profile_type, params), FACET_CACHE_TTL
+            elif profile_type == 'model':
+                result = search_models(cur, params, page, per_page, offset, cursor)
+            else:
+                result = search_photographers(cur, params, page, per_page, offset, cursor)
+            result = with_etag(result, ttl)
+            result_cache.set(cache_key, result, ttl)
+        cur.close()
+        return result
+    
+    try:
+        return not_modified_or(run_with_connection(search), event)
+    except ValueError as e:
+        return error_response(400, str(e))
+
+MAX_RADIUS_KM = 500.0
+KM_PER_DEGREE = 111.32
+# Great-circle (haversine) distance in km from the point given as (latitude, latitude, longitude)
+DISTANCE_SQL = ('(12742.0 * asin(least(1.0, sqrt(power(sin(radians(latitude - %s) / 2), 2) + '
+                'cos(radians(%s)) * cos(radians(latitude)) * power(sin(radians(longitude - %s) / 2), 2)))))')
+
+# --- reference data: copied from shared/reference_data.py by scripts/sync_db_runtime.py, edit it there ---
+OPENNESS_LEVELS_SQL = 'SELECT label, rank FROM t_p16461725_model_photo_db.openness_levels'
+_openness_ranks: Dict[str, int] = {}
 
-def search_models(cur, params, page, per_page, offset):
+def openness_ranks(conn) -> Dict[str, int]:
+    '''
+    Openness level label -> rank from the openness_levels table, the one list shared
+    by register-model and search-profiles. Loaded once per container.
+    '''
+    if not _openness_ranks:
+        with conn.cursor() as cur:
+            cur.execute(OPENNESS_LEVELS_SQL)
+            _openness_ranks.update(cur.fetchall())
+    return _openness_ranks
+
+async def openness_ranks_async(conn) -> Dict[str, int]:
+    if not _openness_ranks:
+        async with conn.cursor() as cur:
+            await cur.execute(OPENNESS_LEVELS_SQL)
+            _openness_ranks.update(await cur.fetchall())
+    return _openness_ranks
+
+def city_key(name: str) -> str:
+    '''
+    Gazetteer key of a city name; db_migrations/V0011 backfills coordinates with the
+    same fold written in SQL.
+    '''
+    return name.strip().lower().replace('ё', 'е')
+
+CITIES_SQL = 'SELECT name, latitude, longitude FROM t_p16461725_model_photo_db.cities'
+_city_coordinates: Dict[str, Tuple[float, float]] = {}
+
+def city_coordinates(conn) -> Dict[str, Tuple[float, float]]:
+    '''
+    Gazetteer from the cities table keyed by city_key(name): (latitude, longitude).
+    Loaded once per container.
+    '''
+    if not _city_coordinates:
+        with conn.cursor() as cur:
+            cur.execute(CITIES_SQL)
+            _city_coordinates.update((city_key(name), (latitude, longitude)) for name, latitude, longitude in cur.fetchall())
+    return _city_coordinates
+
+async def city_coordinates_async(conn) -> Dict[str, Tuple[float, float]]:
+    if not _city_coordinates:
+        async with conn.cursor() as cur:
+            await cur.execute(CITIES_SQL)
+            _city_coordinates.update((city_key(name), (latitude, longitude)) for name, latitude, longitude in await cur.fetchall())
+    return _city_coordinates
+# --- end of reference data ---
+
+def near_point(params: Dict[str, str], cities: Dict[str, Tuple[float, float]]) -> Optional[Tuple[float, float, float]]:
+    '''
+    (latitude, longitude, radius_km) for a radiusKm search centred on lat/lon or,
+    failing that, on the city param. None without radiusKm. Raises ValueError on
+    bad values or a city missing from the gazetteer.
+    '''
+    if not params.get('radiusKm'):
+        return None
+    radius = float(params['radiusKm'])
+    if not 0 < radius <= MAX_RADIUS_KM:
+        raise ValueError(f'radiusKm must be between 0 and {MAX_RADIUS_KM:g}')
+    if params.get('lat') and params.get('lon'):
+        latitude, longitude = float(params['lat']), float(params['lon'])
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise ValueError('lat/lon out of range')
+        return latitude, longitude, radius
+    coordinates = cities.get(city_key(params.get('city') or ''))
+    if coordinates is None:
+        raise ValueError('radiusKm needs lat and lon or a known city')
+    return coordinates[0], coordinates[1], radius
+
+def radius_condition(near: Tuple[float, float, float]) -> Tuple[str, List[Any], str, List[Any]]:
+    '''
+    Condition and arguments for profiles within the radius, plus the distance
+    ordering and its arguments. The bounding box is served by the GiST index on
+    point(longitude, latitude) from V0011; the haversine check trims its corners.
+    '''
+    latitude, longitude, radius = near
+    lat_delta = radius / KM_PER_DEGREE
+    cos_lat = math.cos(math.radians(latitude))
+    lon_delta = 180.0 if cos_lat < 0.01 else min(radius / (KM_PER_DEGREE * cos_lat), 180.0)
+    condition = f"point(longitude, latitude) <@ box(point(%s, %s), point(%s, %s)) AND {DISTANCE_SQL} <= %s"
+    args = [longitude - lon_delta, latitude - lat_delta, longitude + lon_delta, latitude + lat_delta,
+            latitude, latitude, longitude, radius]
+    return condition, args, f"{DISTANCE_SQL} ASC", [latitude, latitude, longitude]
+
+def model_filters(params: Dict[str, str], today: date, ranks: Dict[str, int],
+                  cities: Dict[str, Tuple[float, float]]) -> Tuple[str, List[Any], Optional[str], Optional[List[Any]]]:
+    '''
+    WHERE clause and arguments for the model filters in params, plus the rank
+    ordering (and its arguments) to use in page mode, if any. ranks maps openness
+    level labels to their openness_rank; cities is the gazetteer for radiusKm.
+    Raises ValueError on an invalid radius search.
+    '''
     profile_id = params.get('id')
     name = params.get('name')
     city = params.get('city')
@@ -70,101 +1353,54 @@ def search_models(cur, params, page, per_page, offset):
     cooperation_format = params.get('cooperationFormat')
     
     query_conditions = ["is_blocked = FALSE"]
+    query_args: List[Any] = []
     
     if profile_id:
-        query_conditions.append(f"id = {int(profile_id)}")
+        query_conditions.append("id = %s")
+        query_args.append(int(profile_id))
+    rank_order, rank_args = None, None
     if name:
-        safe_name = name.replace("'", "''")
-        query_conditions.append(f"full_name ILIKE '%{safe_name}%'")
-    if city:
-        safe_city = city.replace("'", "''")
-        query_conditions.append(f"city = '{safe_city}'")
+        name_condition, name_args, rank = name_search(name)
+        query_conditions.append(name_condition)
+        query_args.extend(name_args)
+        rank_order, rank_args = f"{rank} DESC", [name]
+    near = near_point(params, cities)
+    if near:
+        radius_clause, radius_args, rank_order, rank_args = radius_condition(near)
+        query_conditions.append(radius_clause)
+        query_args.extend(radius_args)
+    elif city:
+        query_conditions.append("city = %s")
+        query_args.append(city)
     if gender:
-        safe_gender = gender.replace("'", "''")
-        query_conditions.append(f"gender = '{safe_gender}'")
+        query_conditions.append("gender = %s")
+        query_args.append(gender)
     if min_height:
-        query_conditions.append(f"height >= {int(min_height)}")
+        query_conditions.append("height >= %s")
+        query_args.append(int(min_height))
     if max_height:
-        query_conditions.append(f"height <= {int(max_height)}")
+        query_conditions.append("height <= %s")
+        query_args.append(int(max_height))
     if min_age:
-        current_year = datetime.now().year
-        max_birth_year = current_year - int(min_age)
-        query_conditions.append(f"EXTRACT(YEAR FROM birth_date) <= {max_birth_year}")
+        query_conditions.append("birth_date <= %s")
+        query_args.append(years_before(today, int(min_age)))
     if max_age:
-        current_year = datetime.now().year
-        min_birth_year = current_year - int(max_age)
-        query_conditions.append(f"EXTRACT(YEAR FROM birth_date) >= {min_birth_year}")
-    if openness_level:
-        levels = ['Портрет', 'Купальник', 'Бельё', 'Гламур', 'Эротика', 'Ню', 'Метарт', 'Порно']
-        if openness_level in levels:
-            level_index = levels.index(openness_level)
-            allowed_levels = levels[level_index:]
-            levels_str = "', '".join(allowed_levels)
-            query_conditions.append(f"openness_level IN ('{levels_str}')")
+        query_conditions.append("birth_date > %s")
+        query_args.append(years_before(today, int(max_age) + 1))
+    if openness_level in ranks:
+        query_conditions.append("openness_rank >= %s")
+        query_args.append(ranks[openness_level])
     if cooperation_format:
-        safe_format = cooperation_format.replace("'", "''")
-        query_conditions.append(f"cooperation_format = '{safe_format}'")
+        query_conditions.append("cooperation_format = %s")
+        query_args.append(cooperation_format)
     
-    where_clause = ' AND '.join(query_conditions)
+    if params.get('sort') == 'rating':
+        rank_order, rank_args = RATING_ORDER, None
     
-    count_query = f'''
-        SELECT COUNT(*) as total 
-        FROM t_p16461725_model_photo_db.models 
-        WHERE {where_clause}
-    '''
-    cur.execute(count_query)
-    total_count = cur.fetchone()['total']
-    
-    data_query = f'''
-        SELECT id, full_name, phone, email, birth_date, gender, height, 
-               city, profile_photo_url, openness_level, cooperation_format, 
-               created_at, last_login
-        FROM t_p16461725_model_photo_db.models
-        WHERE {where_clause}
-        ORDER BY last_login DESC NULLS LAST
-        LIMIT {per_page} OFFSET {offset}
-    '''
-    cur.execute(data_query)
-    models = cur.fetchall()
-    
-    result = []
-    for model in models:
-        age = None
-        if model['birth_date']:
-            age = datetime.now().year - model['birth_date'].year
-        
-        result.append({
-            'id': model['id'],
-            'fullName': model['full_name'],
-            'age': age,
-            'height': model['height'],
-            'city': model['city'],
-            'gender': model['gender'],
-            'opennessLevel': model['openness_level'],
-            'cooperationFormat': model['cooperation_format'],
-            'profilePhotoUrl': model['profile_photo_url'],
-            'lastLogin': model['last_login'].isoformat() if model['last_login'] else None
-        })
-    
-    return {
-        'statusCode': 200,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*'
-        },
-        'isBase64Encoded': False,
-        'body': json.dumps({
-            'profiles': result,
-            'pagination': {
-                'page': page,
-                'perPage': per_page,
-                'total': total_count,
-                'totalPages': (total_count + per_page - 1) // per_page
-            }
-        }, ensure_ascii=False)
-    }
+    return ' AND '.join(query_conditions), query_args, rank_order, rank_args
 
-def search_photographers(cur, params, page, per_page, offset):
+def photographer_filters(params: Dict[str, str],
+                         cities: Dict[str, Tuple[float, float]]) -> Tuple[str, List[Any], Optional[str], Optional[List[Any]]]:
     profile_id = params.get('id')
     name = params.get('name')
     city = params.get('city')
@@ -172,72 +1408,427 @@ def search_photographers(cur, params, page, per_page, offset):
     cooperation_format = params.get('cooperationFormat')
     
     query_conditions = ["is_blocked = FALSE"]
+    query_args: List[Any] = []
     
     if profile_id:
-        query_conditions.append(f"id = {int(profile_id)}")
+        query_conditions.append("id = %s")
+        query_args.append(int(profile_id))
+    rank_order, rank_args = None, None
     if name:
-        safe_name = name.replace("'", "''")
-        query_conditions.append(f"full_name ILIKE '%{safe_name}%'")
-    if city:
-        safe_city = city.replace("'", "''")
-        query_conditions.append(f"city = '{safe_city}'")
+        name_condition, name_args, rank = name_search(name)
+        query_conditions.append(name_condition)
+        query_args.extend(name_args)
+        rank_order, rank_args = f"{rank} DESC", [name]
+    near = near_point(params, cities)
+    if near:
+        radius_clause, radius_args, rank_order, rank_args = radius_condition(near)
+        query_conditions.append(radius_clause)
+        query_args.extend(radius_args)
+    elif city:
+        query_conditions.append("city = %s")
+        query_args.append(city)
     if specialization:
-        safe_spec = specialization.replace("'", "''")
-        query_conditions.append(f"'{safe_spec}' = ANY(specializations)")
+        query_conditions.append("specializations @> ARRAY[%s]::text[]")
+        query_args.append(specialization)
     if cooperation_format:
-        safe_format = cooperation_format.replace("'", "''")
-        query_conditions.append(f"cooperation_format = '{safe_format}'")
+        query_conditions.append("cooperation_format = %s")
+        query_args.append(cooperation_format)
     
-    where_clause = ' AND '.join(query_conditions)
+    if params.get('sort') == 'rating':
+        rank_order, rank_args = RATING_ORDER, None
     
-    count_query = f'''
-        SELECT COUNT(*) as total 
-        FROM t_p16461725_model_photo_db.photographers 
-        WHERE {where_clause}
+    return ' AND '.join(query_conditions), query_args, rank_order, rank_args
+
+SEARCH_ENGINES = ('sql', 'columnar')
+SEARCH_ENGINE = os.environ.get('SEARCH_ENGINE', 'sql')
+PROFILE_INDEX_REFRESH_INTERVAL = float(os.environ.get('PROFILE_INDEX_REFRESH_INTERVAL', '5'))
+# rows are re-read this far behind the watermark, so writes committed late by a longer transaction are not missed
+PROFILE_INDEX_OVERLAP = timedelta(seconds=float(os.environ.get('PROFILE_INDEX_OVERLAP', '10')))
+PROFILE_INDEX_BATCH_SIZE = 50000
+PROFILE_INDEX_SCAN_CHUNK = 4096
+COLUMNAR_PARAMS = {'type', 'page', 'count', 'sort', 'cursor', 'city', 'gender', 'minHeight', 'maxHeight',
+                   'minAge', 'maxAge', 'opennessLevel', 'cooperationFormat', 'specialization'}
+NULL_INT = -2**31
+NULL_TIMESTAMP = -2**62
+EPOCH = datetime(1970, 1, 1)
+
+# (column, SQL expression, kind). ints are read with NULLs already replaced by the
+# sentinel, labels are dictionary-encoded to int32 codes (-1 = NULL), tags become a
+# bitmask; visible mirrors the is_blocked = FALSE condition of the filters.
+MODEL_INDEX_COLUMNS = (
+    ('id', 'id', 'int32'),
+    ('visible', 'is_blocked IS FALSE', 'bool'),
+    ('city', 'city', 'label'),
+    ('gender', 'gender', 'label'),
+    ('height', f'COALESCE(height, {NULL_INT})', 'int32'),
+    ('birth_date', f"COALESCE(birth_date - DATE '1970-01-01', {NULL_INT})", 'int32'),
+    ('openness_rank', f'COALESCE(openness_rank, {NULL_INT})', 'int32'),
+    ('cooperation_format', 'cooperation_format', 'label'),
+    ('last_login', f'COALESCE((extract(epoch FROM last_login) * 1000000)::bigint, {NULL_TIMESTAMP})', 'int64'),
+    ('rating', '(rating_avg * 100)::int', 'int16'),
+    ('review_count', 'review_count', 'int32'),
+)
+PHOTOGRAPHER_INDEX_COLUMNS = (
+    ('id', 'id', 'int32'),
+    ('visible', 'is_blocked IS FALSE', 'bool'),
+    ('city', 'city', 'label'),
+    ('specializations', 'specializations', 'tags'),
+    ('cooperation_format', 'cooperation_format', 'label'),
+    ('last_login', f'COALESCE((extract(epoch FROM last_login) * 1000000)::bigint, {NULL_TIMESTAMP})', 'int64'),
+    ('rating', '(rating_avg * 100)::int', 'int16'),
+    ('review_count', 'review_count', 'int32'),
+)
+
+def load_numpy():
+    '''
+    NumPy is an optional dependency of the columnar engine; without it searches use SQL.
+    '''
+    global numpy
+    if numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            return None
+    return numpy
+
+class ProfileIndex:
+    '''
+    Columnar in-memory copy of the filterable fields of one profile table, for the
+    columnar search engine. The first use loads every row; after that, refresh reads
+    only rows whose updated_at is past the watermark (kept current by the V0012
+    trigger) and swaps in a new snapshot, so readers never see a half-applied refresh.
     '''
-    cur.execute(count_query)
-    total_count = cur.fetchone()['total']
+    def __init__(self, table: str, columns: Tuple[Tuple[str, str, str], ...]):
+        self.table = table
+        self.columns = columns
+        self.labels: Dict[str, Dict[Optional[str], int]] = {name: {None: -1} for name, _, kind in columns if kind == 'label'}
+        self.tags: Dict[str, int] = {}
+        self.snapshot: Optional[Dict[str, Any]] = None
+        self.watermark: Optional[datetime] = None
+        self.refreshed_at = float('-inf')
+        self.lock = threading.Lock()
     
-    data_query = f'''
-        SELECT id, full_name, phone, email, city, specializations, 
-               profile_photo_url, cooperation_format, price_range,
-               experience_years, created_at, last_login
-        FROM t_p16461725_model_photo_db.photographers
-        WHERE {where_clause}
-        ORDER BY last_login DESC NULLS LAST
-        LIMIT {per_page} OFFSET {offset}
-    '''
-    cur.execute(data_query)
-    photographers = cur.fetchall()
-    
-    result = []
-    for photographer in photographers:
-        result.append({
-            'id': photographer['id'],
-            'fullName': photographer['full_name'],
-            'city': photographer['city'],
-            'specializations': photographer['specializations'],
-            'cooperationFormat': photographer['cooperation_format'],
-            'priceRange': photographer['price_range'],
-            'experienceYears': photographer['experience_years'],
-            'profilePhotoUrl': photographer['profile_photo_url'],
-            'lastLogin': photographer['last_login'].isoformat() if photographer['last_login'] else None
-        })
+    def current(self, conn) -> Dict[str, Any]:
+        '''
+        The latest snapshot, refreshed first when PROFILE_INDEX_REFRESH_INTERVAL has
+        passed. Only the first load blocks concurrent readers.
+        '''
+        if time.monotonic() - self.refreshed_at >= PROFILE_INDEX_REFRESH_INTERVAL:
+            if self.lock.acquire(blocking=self.snapshot is None):
+                try:
+                    if time.monotonic() - self.refreshed_at >= PROFILE_INDEX_REFRESH_INTERVAL:
+                        self.refresh(conn)
+                finally:
+                    self.lock.release()
+        return self.snapshot
     
-    return {
-        'statusCode': 200,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*'
-        },
-        'isBase64Encoded': False,
-        'body': json.dumps({
-            'profiles': result,
-            'pagination': {
-                'page': page,
-                'perPage': per_page,
-                'total': total_count,
-                'totalPages': (total_count + per_page - 1) // per_page
-            }
-        }, ensure_ascii=False)
-    }
\ No newline at end of file
+    def encode(self, name: str, kind: str, values: Tuple[Any, ...]):
+        if kind == 'label':
+            codes = self.labels[name]
+            return numpy.array([codes.setdefault(value, len(codes) - 1) for value in values], dtype=numpy.int32)
+        if kind == 'tags':
+            masks = []
+            for tags in values:
+                mask = 0
+                for tag in tags or ():
+                    if tag not in self.tags:
+                        self.tags[tag] = 1 << len(self.tags) if len(self.tags) < 64 else 0
+                    mask |= self.tags[tag]
+                masks.append(mask)
+            return numpy.array(masks, dtype=numpy.uint64)
+        return numpy.array(values, dtype=kind)
+    
+    def refresh(self, conn) -> int:
+        '''
+        Load rows changed since the watermark (all rows on the first call) and
+        return how many were read.
+        '''
+        load_numpy()
+        started = time.monotonic()
+        expressions = ', '.join(expression for _, expression, _ in self.columns)
+        query = f'SELECT {expressions}, updated_at FROM t_p16461725_model_photo_db.{self.table}'
+        args: List[Any] = []
+        if self.watermark is not None:
+            query += ' WHERE updated_at > %s'
+            args.append(self.watermark - PROFILE_INDEX_OVERLAP)
+        
+        cur = conn.cursor(name=f'profile_index_{self.table}')
+        cur.execute(query, args)
+        batches: Dict[str, List[Any]] = {name: [] for name, _, _ in self.columns}
+        watermark = self.watermark
+        while True:
+            rows = cur.fetchmany(PROFILE_INDEX_BATCH_SIZE)
+            if not rows:
+                break
+            values = list(zip(*rows))
+            for (name, _, kind), column in zip(self.columns, values):
+                batches[name].append(self.encode(name, kind, column))
+            latest = max((updated for updated in values[-1] if updated is not None), default=None)
+            if latest is not None and (watermark is None or latest > watermark):
+                watermark = latest
+        cur.close()
+        
+        changed = {name: numpy.concatenate(parts) if parts else None for name, parts in batches.items()}
+        rows_read = 0 if changed['id'] is None else len(changed['id'])
+        if self.snapshot is None:
+            columns = {name: array if array is not None else numpy.empty(0, dtype=self.dtype(name))
+                       for name, array in changed.items()}
+            self.snapshot = self.build_snapshot(columns)
+        elif rows_read:
+            self.snapshot = self.build_snapshot(self.merge(self.snapshot['columns'], self.snapshot['positions'], changed))
+        self.watermark = watermark
+        self.refreshed_at = time.monotonic()
+        print(f"profile_index table={self.table} rows_read={rows_read} rows={len(self.snapshot['columns']['id'])} "
+              f"ms={(self.refreshed_at - started) * 1000:.1f}")
+        return rows_read
+    
+    def dtype(self, name: str):
+        kind = next(kind for column, _, kind in self.columns if column == name)
+        return {'label': numpy.int32, 'tags': numpy.uint64}.get(kind, kind)
+    
+    @staticmethod
+    def merge(columns: Dict[str, Any], positions: Any, changed: Dict[str, Any]) -> Dict[str, Any]:
+        ids = changed['id']
+        known = ids < len(positions)
+        slots = numpy.full(len(ids), -1, dtype=numpy.int64)
+        slots[known] = positions[ids[known]]
+        existing = slots >= 0
+        merged = {}
+        for name, array in columns.items():
+            updated = array.copy()
+            updated[slots[existing]] = changed[name][existing]
+            merged[name] = numpy.concatenate([updated, changed[name][~existing]])
+        return merged
+    
+    @staticmethod
+    def build_snapshot(columns: Dict[str, Any]) -> Dict[str, Any]:
+        '''
+        Rows are stored in the default ORDER BY last_login DESC NULLS LAST, id DESC,
+        so a filter mask is already in page order; positions maps id to row.
+        '''
+        layout = numpy.lexsort((columns['id'], columns['last_login']))[::-1]
+        columns = {name: array[layout] for name, array in columns.items()}
+        ids = columns['id']
+        positions = numpy.full(int(ids.max()) + 1 if len(ids) else 0, -1, dtype=numpy.int64)
+        positions[ids] = numpy.arange(len(ids))
+        return {'columns': columns, 'positions': positions, 'orders': {}}
+
+def rating_order(snapshot: Dict[str, Any]):
+    '''
+    Row positions in RATING_ORDER followed by the default order; computed on first use per snapshot.
+    '''
+    orders = snapshot['orders']
+    if 'rating' not in orders:
+        columns = snapshot['columns']
+        orders['rating'] = numpy.lexsort((columns['id'], columns['last_login'], columns['review_count'], columns['rating']))[::-1]
+    return orders['rating']
+
+def rows_after_cursor(snapshot: Dict[str, Any], cursor: List[Any]) -> int:
+    '''
+    First row strictly after the keyset cursor, by binary search over the default layout.
+    '''
+    columns = snapshot['columns']
+    last_logins, ids = columns['last_login'], columns['id']
+    key = (NULL_TIMESTAMP if cursor[0] is None else timestamp_micros(cursor[0]), cursor[1])
+    return bisect.bisect_left(range(len(ids)), True, key=lambda row: (last_logins[row], ids[row]) < key)
+
+def first_matches(mask, order, start: int, count: int):
+    '''
+    Positions of the first count rows of mask from start on, in order (None: row
+    order). Scans in growing chunks, so shallow pages never touch the whole index.
+    '''
+    found = []
+    chunk = PROFILE_INDEX_SCAN_CHUNK
+    while start < len(mask) and count > 0:
+        window = mask[start:start + chunk] if order is None else mask[order[start:start + chunk]]
+        hits = numpy.flatnonzero(window)[:count] + start
+        found.append(hits if order is None else order[hits])
+        count -= len(hits)
+        start += chunk
+        chunk *= 4
+    return numpy.concatenate(found) if found else numpy.empty(0, dtype=numpy.int64)
+
+def label_mask(snapshot: Dict[str, Any], index: ProfileIndex, name: str, value: str):
+    code = index.labels[name].get(value)
+    if code is None:
+        return numpy.zeros(len(snapshot['columns']['id']), dtype=bool)
+    return snapshot['columns'][name] == code
+
+def timestamp_micros(value: datetime) -> int:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+def columnar_mask(snapshot: Dict[str, Any], index: ProfileIndex, params: Dict[str, str],
+                  today: date, ranks: Dict[str, int]):
+    '''
+    Boolean mask of the rows matching the same filters as model_filters/photographer_filters.
+    '''
+    columns = snapshot['columns']
+    mask = columns['visible'].copy()
+    for param, name in (('city', 'city'), ('gender', 'gender'), ('cooperationFormat', 'cooperation_format')):
+        if params.get(param) and name in columns:
+            mask &= label_mask(snapshot, index, name, params[param])
+    if params.get('minHeight') and 'height' in columns:
+        mask &= columns['height'] >= int(params['minHeight'])
+    if params.get('maxHeight') and 'height' in columns:
+        mask &= (columns['height'] <= int(params['maxHeight'])) & (columns['height'] != NULL_INT)
+    if params.get('minAge') and 'birth_date' in columns:
+        bound = (years_before(today, int(params['minAge'])) - EPOCH.date()).days
+        mask &= (columns['birth_date'] <= bound) & (columns['birth_date'] != NULL_INT)
+    if params.get('maxAge') and 'birth_date' in columns:
+        mask &= columns['birth_date'] > (years_before(today, int(params['maxAge']) + 1) - EPOCH.date()).days
+    if params.get('opennessLevel') in ranks and 'openness_rank' in columns:
+        mask &= columns['openness_rank'] >= ranks[params['opennessLevel']]
+    if params.get('specialization') and 'specializations' in columns:
+        mask &= (columns['specializations'] & numpy.uint64(index.tags.get(params['specialization'], 0))) != 0
+    return mask
+
+def columnar_supported(params: Dict[str, str], index: ProfileIndex) -> bool:
+    '''
+    Whether the columnar engine can answer params: no name, id or radius filters, and
+    no specialization beyond the first 64 distinct ones, which have no bit in the mask.
+    '''
+    if load_numpy() is None:
+        return False
+    if params.get('specialization') and index.tags.get(params['specialization']) == 0:
+        return False
+    return all(key in COLUMNAR_PARAMS for key, value in params.items() if value not in (None, ''))
+
+def columnar_search(cur, profile_type: str, params: Dict[str, str], page: int, per_page: int,
+                    offset: int, cursor: Optional[List[Any]]) -> Dict[str, Any]:
+    '''
+    search_models/search_photographers on the columnar index: filters, count, sort
+    and pagination run over the snapshot with NumPy, then only the page's rows
+    (plus one to detect a next page) are read from Postgres by id.
+    '''
+    today = date.today()
+    table, fields, columns_sql = (('models', MODEL_FIELDS, MODEL_COLUMNS) if profile_type == 'model'
+                                  else ('photographers', PHOTOGRAPHER_FIELDS, PHOTOGRAPHER_COLUMNS))
+    index = profile_indexes[table]
+    snapshot = index.current(cur.connection)
+    ranks = openness_ranks(cur.connection) if profile_type == 'model' else {}
+    mask = columnar_mask(snapshot, index, params, today, ranks)
+    
+    total_count = None if params.get('count', 'exact') == 'none' else int(numpy.count_nonzero(mask))
+    if cursor is not None:
+        start = rows_after_cursor(snapshot, cursor) if cursor else 0
+        matches = first_matches(mask, None, start, per_page + 1)
+    else:
+        order = rating_order(snapshot) if params.get('sort') == 'rating' else None
+        matches = first_matches(mask, order, 0, offset + per_page + 1)[offset:]
+    page_ids = snapshot['columns']['id'][matches].tolist()
+    
+    rows_by_id = {}
+    if page_ids:
+        cur.execute(f'''
+            SELECT {columns_sql}
+            FROM t_p16461725_model_photo_db.{table}
+            WHERE id = ANY(%s) AND is_blocked = FALSE
+        ''', (page_ids,))
+        rows_by_id = {row[0]: row for row in cur.fetchall()}
+    rows = [rows_by_id[profile_id] for profile_id in page_ids if profile_id in rows_by_id]
+    if profile_type == 'model':
+        result = [model_item(row, today) for row in rows]
+    else:
+        result = [photographer_item(row) for row in rows]
+    pagination = build_pagination(result, page, per_page, total_count, cursor)
+    return json_response(200, {'profiles': result, 'pagination': pagination})
+
+profile_indexes = {
+    'models': ProfileIndex('models', MODEL_INDEX_COLUMNS),
+    'photographers': ProfileIndex('photographers', PHOTOGRAPHER_INDEX_COLUMNS),
+}
+
+def search_models(cur, params, page, per_page, offset, cursor):
+    if SEARCH_ENGINE == 'columnar' and columnar_supported(params, profile_indexes['models']):
+        return columnar_search(cur, 'model', params, page, per_page, offset, cursor)
+    today = date.today()
+    where_clause, query_args, rank_order, rank_args = model_filters(
+        params, today, openness_ranks(cur.connection), city_coordinates(cur.connection)
+    )
+    
+    total_count = count_profiles(cur, 'models', where_clause, query_args, params.get('count', 'exact'))
+    
+    page_source, source_args, page_sort, sort_args, page_limit = build_page_query(
+        'models', where_clause, query_args, per_page, offset, cursor, rank_order, rank_args
+    )
+    if SEARCH_RENDER_MODE == 'postgres':
+        return render_page_in_postgres(
+            cur, MODEL_JSON_SQL, [today.year, today.strftime('%m%d')], page_source, source_args, page_sort, sort_args,
+            page_limit, page, per_page, offset, total_count, cursor
+        )
+    cur.execute(page_statement(MODEL_COLUMNS, page_source, page_sort, page_limit), source_args + sort_args)
+    result = [model_item(row, today) for row in cur.fetchall()]
+    pagination = build_pagination(result, page, per_page, total_count, cursor)
+    
+    return json_response(200, {'profiles': result, 'pagination': pagination})
+
+def search_photographers(cur, params, page, per_page, offset, cursor):
+    if SEARCH_ENGINE == 'columnar' and columnar_supported(params, profile_indexes['photographers']):
+        return columnar_search(cur, 'photographer', params, page, per_page, offset, cursor)
+    where_clause, query_args, rank_order, rank_args = photographer_filters(params, city_coordinates(cur.connection))
+    
+    total_count = count_profiles(cur, 'photographers', where_clause, query_args, params.get('count', 'exact'))
+    
+    page_source, source_args, page_sort, sort_args, page_limit = build_page_query(
+        'photographers', where_clause, query_args, per_page, offset, cursor, rank_order, rank_args
+    )
+    if SEARCH_RENDER_MODE == 'postgres':
+        return render_page_in_postgres(
+            cur, PHOTOGRAPHER_JSON_SQL, [], page_source, source_args, page_sort, sort_args,
+            page_limit, page, per_page, offset, total_count, cursor
+        )
+    cur.execute(page_statement(PHOTOGRAPHER_COLUMNS, page_source, page_sort, page_limit), source_args + sort_args)
+    result = [photographer_item(row) for row in cur.fetchall()]
+    pagination = build_pagination(result, page, per_page, total_count, cursor)
+    
+    return json_response(200, {'profiles': result, 'pagination': pagination})
+
+async def search_profiles_async(conn, profile_type: str, params: Dict[str, str], page: int, per_page: int,
+                                offset: int, cursor: Optional[List[Any]]) -> Dict[str, Any]:
+    '''
+    search_models/search_photographers for DB_EXECUTION_MODE=async (SQL engine, rows
+    rendered in Python). When the total is not cached, COUNT runs on a second pooled
+    connection concurrently with the page query, so the request waits for the slower
+    of the two instead of their sum.
+    '''
+    today = date.today()
+    cities = await city_coordinates_async(conn)
+    if profile_type == 'model':
+        table, columns = 'models', MODEL_COLUMNS
+        where_clause, query_args, rank_order, rank_args = model_filters(
+            params, today, await openness_ranks_async(conn), cities
+        )
+    else:
+        table, columns = 'photographers', PHOTOGRAPHER_COLUMNS
+        where_clause, query_args, rank_order, rank_args = photographer_filters(params, cities)
+    
+    page_source, source_args, page_sort, sort_args, page_limit = build_page_query(
+        table, where_clause, query_args, per_page, offset, cursor, rank_order, rank_args
+    )
+    
+    async def fetch_page() -> List[Tuple[Any, ...]]:
+        async with conn.cursor() as cur:
+            await cur.execute(page_statement(columns, page_source, page_sort, page_limit), source_args + sort_args)
+            return await cur.fetchall()
+    
+    mode = params.get('count', 'exact')
+    total_count = None if mode == 'none' else cached_count(count_cache_key(table, where_clause, query_args, mode))
+    if mode == 'none' or total_count is not None:
+        rows = await fetch_page()
+    else:
+        total_count, rows = await asyncio.gather(
+            run_with_async_connection(
+                lambda count_conn: count_profiles_async(count_conn, table, where_clause, query_args, mode)
+            ),
+            fetch_page()
+        )
+    
+    if profile_type == 'model':
+        result = [model_item(row, today) for row in rows]
+    else:
+        result = [photographer_item(row) for row in rows]
+    pagination = build_pagination(result, page, per_page, total_count, cursor)
+    
+    return json_response(200, {'profiles': result, 'pagination': pagination})
@@ -1,83 +1,823 @@
+import asyncio
+import contextvars
+import functools
 import json
 import os
-from typing import Dict, Any
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, Awaitable, Callable, List, Optional, Set, Tuple
 
+psycopg2 = None  # imported on first database use, so OPTIONS preflights never load the driver
+psycopg = None  # psycopg 3, imported by the async execution mode only
+
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '2'))
+DB_POOL_PING_INTERVAL = float(os.environ.get('DB_POOL_PING_INTERVAL', '30'))
+PREPARED_STATEMENTS_MAX = 32
+
+JSON_HEADERS = {
+    'Content-Type': 'application/json',
+    'Access-Control-Allow-Origin': '*'
+}
+PREFLIGHT_RESPONSE = {
+    'statusCode': 200,
+    'headers': {
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Methods': 'POST, OPTIONS',
+        'Access-Control-Allow-Headers': 'Content-Type',
+        'Access-Control-Max-Age': '86400'
+    },
+    'body': ''
+}
+METHOD_NOT_ALLOWED_RESPONSE = {
+    'statusCode': 405,
+    'headers': JSON_HEADERS,
+    'body': json.dumps({'error': 'Method not allowed'})
+}
+
+def json_response(status: int, payload: Any) -> Dict[str, Any]:
+    started = time.perf_counter()
+    body = json.dumps(payload, ensure_ascii=False)
+    add_metric('serialize', time.perf_counter() - started)
+    return {
+        'statusCode': status,
+        'headers': JSON_HEADERS,
+        'isBase64Encoded': False,
+        'body': body
+    }
+
+def error_response(status: int, message: str) -> Dict[str, Any]:
+    return {
+        'statusCode': status,
+        'headers': JSON_HEADERS,
+        'body': json.dumps({'error': message})
+    }
+
+# --- db runtime: copied from shared/db_runtime.py by scripts/sync_db_runtime.py, edit it there ---
+def load_driver():
+    global psycopg2, InstrumentedConnection
+    if psycopg2 is None:
+        import psycopg2.extras
+        if REQUEST_METRICS:
+            InstrumentedConnection = instrumented_connection_class()
+    return psycopg2
+
+_pool_lock = threading.Lock()
+_idle_connections: List[Tuple[Any, float]] = []
+_prepared_statements: Dict[int, Set[str]] = {}
+_pool_stats: Dict[str, int] = {'hits': 0, 'misses': 0, 'discarded': 0, 'open': 0}
+
+def _connection_is_alive(conn, last_used: float) -> bool:
+    if conn.closed:
+        return False
+    if time.monotonic() - last_used < DB_POOL_PING_INTERVAL:
+        return True
+    try:
+        with conn.cursor() as ping:
+            ping.execute('SELECT 1')
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+def _discard_connection(conn) -> None:
+    _pool_stats['discarded'] += 1
+    _pool_stats['open'] -= 1
+    _prepared_statements.pop(id(conn), None)
+    try:
+        conn.close()
+    except psycopg2.Error:
+        pass
+
+def get_connection() -> Tuple[Any, bool]:
+    '''
+    Take a warm connection from the container-level pool or open a new one.
+    Returns (connection, reused); idle connections are health-checked first.
+    '''
+    load_driver()
+    while True:
+        with _pool_lock:
+            entry = _idle_connections.pop() if _idle_connections else None
+        if entry is None:
+            break
+        conn, last_used = entry
+        if _connection_is_alive(conn, last_used):
+            _pool_stats['hits'] += 1
+            return conn, True
+        _discard_connection(conn)
+    
+    _pool_stats['misses'] += 1
+    conn = psycopg2.connect(os.environ.get('DATABASE_URL'), connection_factory=InstrumentedConnection)
+    _pool_stats['open'] += 1
+    add_metric('connects', 1)
+    return conn, False
+
+def release_connection(conn, broken: bool = False) -> None:
+    '''
+    Return a connection to the pool, rolling back any open transaction.
+    Broken connections and connections above DB_POOL_MAX_SIZE are closed.
+    '''
+    if broken or conn.closed:
+        _discard_connection(conn)
+        return
+    try:
+        if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+    except psycopg2.Error:
+        _discard_connection(conn)
+        return
+    with _pool_lock:
+        if len(_idle_connections) < DB_POOL_MAX_SIZE:
+            _idle_connections.append((conn, time.monotonic()))
+            return
+    _discard_connection(conn)
+
+def run_with_connection(operation: Callable[[Any], Dict[str, Any]]) -> Dict[str, Any]:
+    '''
+    Run operation(conn) on a pooled connection. If a reused connection turns
+    out to be dead, it is dropped and the operation is retried once on a fresh one.
+    '''
+    for attempt in range(2):
+        started = time.perf_counter()
+        conn, reused = get_connection()
+        add_metric('connect', time.perf_counter() - started)
+        try:
+            result = operation(conn)
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            release_connection(conn, broken=True)
+            if reused and attempt == 0:
+                continue
+            raise
+        except Exception:
+            release_connection(conn)
+            raise
+        release_connection(conn)
+        return result
+
+def execute_prepared(cur, name: str, statement: str, params: Tuple[Any, ...] = ()) -> None:
+    '''
+    Run a fixed statement ($1..$n placeholders) as a server-side prepared statement.
+    PREPARE is sent once per pooled connection; later calls only send EXECUTE.
+    '''
+    prepared = _prepared_statements.setdefault(id(cur.connection), set())
+    if name not in prepared:
+        if len(prepared) >= PREPARED_STATEMENTS_MAX:
+            cur.execute('DEALLOCATE ALL')
+            prepared.clear()
+        cur.execute(f'PREPARE {name} AS {statement}')
+        prepared.add(name)
+    if params:
+        cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+    else:
+        cur.execute(f'EXECUTE {name}')
+
+REQUEST_METRICS = os.environ.get('REQUEST_METRICS', '1') != '0'
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '250'))
+SLOW_QUERY_EXPLAIN_INTERVAL = 300.0
+EXPLAINABLE_STATEMENTS = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'EXECUTE')
+SLOW_QUERY_MAX_STATEMENT = 2000
+SQL_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+SQL_NUMBER_LITERAL = re.compile(r'(?<![\w$])-?\d+(?:\.\d+)?')
+SQL_REPEATED_ROWS = re.compile(r'(\([^()]*\))(?:, \([^()]*\))+')
+
+InstrumentedConnection = None  # built by load_driver() when REQUEST_METRICS is on
+_request_state = threading.local()
+_async_request: contextvars.ContextVar = contextvars.ContextVar('async_request', default=None)  # (metrics, request_id) on the event loop
+_explained_at: Dict[str, float] = {}
+
+def add_metric(name: str, amount: float) -> None:
+    metrics = getattr(_request_state, 'metrics', None)
+    if metrics is None:
+        state = _async_request.get()
+        metrics = state[0] if state else None
+    if metrics is not None:
+        metrics[name] = metrics.get(name, 0) + amount
+
+def normalize_statement(query: Any) -> str:
+    '''
+    Statement text with whitespace collapsed and inline literals (e.g. execute_values
+    batches) replaced by ?, so slow-query lines group by shape and carry no user data.
+    '''
+    if isinstance(query, bytes):
+        query = query.decode()
+    statement = SQL_NUMBER_LITERAL.sub('?', SQL_STRING_LITERAL.sub('?', ' '.join(query.split())))
+    return SQL_REPEATED_ROWS.sub(r'\1, ...', statement)[:SLOW_QUERY_MAX_STATEMENT]
+
+def log_slow_query(cur, query: Any, params: Any, seconds: float) -> None:
+    '''
+    Print a statement that took longer than SLOW_QUERY_MS with its plan. The plan is a
+    plain EXPLAIN inside a savepoint on the same connection, taken at most once per
+    statement every SLOW_QUERY_EXPLAIN_INTERVAL seconds. Parameter values are never logged.
+    '''
+    statement = normalize_statement(query)
+    plan = None
+    now = time.monotonic()
+    conn = cur.connection
+    if (statement.split(' ', 1)[0].upper() in EXPLAINABLE_STATEMENTS
+            and now - _explained_at.get(statement, -SLOW_QUERY_EXPLAIN_INTERVAL) >= SLOW_QUERY_EXPLAIN_INTERVAL
+            and conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_INERROR):
+        if len(_explained_at) >= 256:
+            _explained_at.clear()
+        _explained_at[statement] = now
+        explain = psycopg2.extensions.cursor(conn)
+        in_transaction = not conn.autocommit
+        try:
+            if in_transaction:
+                explain.execute('SAVEPOINT slow_query_explain')
+            explain.execute('EXPLAIN ' + (query.decode() if isinstance(query, bytes) else query), params)
+            plan = ' | '.join(line for line, in explain.fetchall())
+            if in_transaction:
+                explain.execute('RELEASE SAVEPOINT slow_query_explain')
+        except psycopg2.Error as e:
+            plan = f'unavailable: {str(e).strip()}'
+            if in_transaction:
+                explain.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+        finally:
+            explain.close()
+    print(f"slow_query request_id={getattr(_request_state, 'request_id', '-')} ms={seconds * 1000:.1f} "
+          f"statement={json.dumps(statement, ensure_ascii=False)} plan={json.dumps(plan, ensure_ascii=False)}")
+
+def _timed_cursor_class(base):
+    class TimedCursor(base):
+        def execute(self, query, vars=None):
+            started = time.perf_counter()
+            result = super().execute(query, vars)
+            elapsed = time.perf_counter() - started
+            add_metric('execute', elapsed)
+            add_metric('queries', 1)
+            if elapsed * 1000 >= SLOW_QUERY_MS:
+                log_slow_query(self, query, vars, elapsed)
+            return result
+
+        def fetchone(self):
+            started = time.perf_counter()
+            row = super().fetchone()
+            add_metric('fetch', time.perf_counter() - started)
+            return row
+
+        def fetchmany(self, size=None):
+            started = time.perf_counter()
+            rows = super().fetchmany(self.arraysize if size is None else size)
+            add_metric('fetch', time.perf_counter() - started)
+            return rows
+
+        def fetchall(self):
+            started = time.perf_counter()
+            rows = super().fetchall()
+            add_metric('fetch', time.perf_counter() - started)
+            return rows
+
+    TimedCursor.__name__ = f'Timed{base.__name__}'
+    return TimedCursor
+
+def instrumented_connection_class():
+    '''
+    Connection class whose cursors, whatever cursor_factory is requested, time
+    execute and fetch calls into the metrics of the current invocation.
+    '''
+    timed_classes: Dict[Any, Any] = {}
+
+    class _InstrumentedConnection(psycopg2.extensions.connection):
+        def cursor(self, *args, **kwargs):
+            base = kwargs.get('cursor_factory') or self.cursor_factory or psycopg2.extensions.cursor
+            if base not in timed_classes:
+                timed_classes[base] = _timed_cursor_class(base)
+            kwargs['cursor_factory'] = timed_classes[base]
+            return super().cursor(*args, **kwargs)
+
+    return _InstrumentedConnection
+
+def instrumented(handler_function: Callable[[Dict[str, Any], Any], Dict[str, Any]]):
+    '''
+    Print one metrics line per invocation (OPTIONS preflights excluded): request id,
+    status, total/connect/execute/fetch/serialize milliseconds, statement count,
+    new connections opened, then this container's pool: connections open and the
+    running totals of pool hits, misses and discarded connections.
+    '''
+    if not REQUEST_METRICS:
+        return handler_function
+
+    @functools.wraps(handler_function)
+    def wrapper(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+        if event.get('httpMethod') == 'OPTIONS':
+            return handler_function(event, context)
+        metrics = _request_state.metrics = {}
+        _request_state.request_id = getattr(context, 'request_id', None) or '-'
+        status = 500
+        started = time.perf_counter()
+        try:
+            response = handler_function(event, context)
+            status = response['statusCode']
+            return response
+        finally:
+            total = time.perf_counter() - started
+            _request_state.metrics = None
+            print(f"request_metrics request_id={_request_state.request_id} status={status} "
+                  f"total_ms={total * 1000:.2f} connect_ms={metrics.get('connect', 0) * 1000:.2f} "
+                  f"execute_ms={metrics.get('execute', 0) * 1000:.2f} fetch_ms={metrics.get('fetch', 0) * 1000:.2f} "
+                  f"serialize_ms={metrics.get('serialize', 0) * 1000:.2f} queries={metrics.get('queries', 0)} "
+                  f"connects={metrics.get('connects', 0)} pool_open={_pool_stats['open']} "
+                  f"pool_hits={_pool_stats['hits']} pool_misses={_pool_stats['misses']} "
+                  f"pool_discarded={_pool_stats['discarded']}")
+
+    return wrapper
+
+DB_EXECUTION_MODES = ('sync', 'async')
+DB_EXECUTION_MODE = os.environ.get('DB_EXECUTION_MODE', 'sync')
+
+AsyncTimedCursor = None  # built by load_async_driver()
+_async_loop = None
+_async_loop_lock = threading.Lock()
+_async_idle_connections: List[Tuple[Any, float]] = []  # only touched on the event loop thread
+
+def load_async_driver():
+    '''
+    psycopg 3 is an optional dependency of DB_EXECUTION_MODE=async; without it
+    handlers keep running on psycopg2.
+    '''
+    global psycopg, AsyncTimedCursor
+    if psycopg is None:
+        try:
+            import psycopg
+        except ImportError:
+            return None
+        AsyncTimedCursor = async_cursor_class()
+    return psycopg
+
+def async_mode() -> bool:
+    return DB_EXECUTION_MODE == 'async' and load_async_driver() is not None
+
+def async_cursor_class():
+    '''
+    Client-side binding cursor, so statements written for psycopg2 (%s placeholders,
+    EXPLAIN with parameters, PREPARE/EXECUTE) run unchanged. With REQUEST_METRICS on,
+    execute and fetch calls are timed into the metrics of the invocation awaiting them.
+    '''
+    base = psycopg.AsyncClientCursor
+    if not REQUEST_METRICS:
+        return base
+
+    class _AsyncTimedCursor(base):
+        async def execute(self, query, params=None, **kwargs):
+            started = time.perf_counter()
+            result = await super().execute(query, params, **kwargs)
+            elapsed = time.perf_counter() - started
+            add_metric('execute', elapsed)
+            add_metric('queries', 1)
+            if elapsed * 1000 >= SLOW_QUERY_MS:
+                print(f"slow_query request_id={current_request_id()} ms={elapsed * 1000:.1f} "
+                      f"statement={json.dumps(normalize_statement(query), ensure_ascii=False)} plan=null")
+            return result
+
+        async def fetchone(self):
+            started = time.perf_counter()
+            row = await super().fetchone()
+            add_metric('fetch', time.perf_counter() - started)
+            return row
+
+        async def fetchmany(self, size=0):
+            started = time.perf_counter()
+            rows = await super().fetchmany(size)
+            add_metric('fetch', time.perf_counter() - started)
+            return rows
+
+        async def fetchall(self):
+            started = time.perf_counter()
+            rows = await super().fetchall()
+            add_metric('fetch', time.perf_counter() - started)
+            return rows
+
+    return _AsyncTimedCursor
+
+def current_request_id() -> str:
+    state = _async_request.get()
+    return state[1] if state else getattr(_request_state, 'request_id', '-')
+
+def _event_loop():
+    '''
+    One event loop per container, running in a daemon thread so that async
+    connections stay open between invocations, like the psycopg2 pool.
+    '''
+    global _async_loop
+    with _async_loop_lock:
+        if _async_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='db-event-loop', daemon=True).start()
+            _async_loop = loop
+    return _async_loop
+
+async def _async_connection_is_alive(conn, last_used: float) -> bool:
+    if conn.closed or conn.broken:
+        return False
+    if time.monotonic() - last_used < DB_POOL_PING_INTERVAL:
+        return True
+    try:
+        await conn.execute('SELECT 1')
+        await conn.rollback()
+        return True
+    except psycopg.Error:
+        return False
+
+async def _discard_async_connection(conn) -> None:
+    _pool_stats['discarded'] += 1
+    _pool_stats['open'] -= 1
+    _prepared_statements.pop(id(conn), None)
+    try:
+        await conn.close()
+    except psycopg.Error:
+        pass
+
+async def get_async_connection() -> Tuple[Any, bool]:
+    '''
+    get_connection for psycopg 3 async connections; the pool counters are shared.
+    '''
+    while _async_idle_connections:
+        conn, last_used = _async_idle_connections.pop()
+        if await _async_connection_is_alive(conn, last_used):
+            _pool_stats['hits'] += 1
+            return conn, True
+        await _discard_async_connection(conn)
+
+    _pool_stats['misses'] += 1
+    conn = await psycopg.AsyncConnection.connect(os.environ.get('DATABASE_URL'), cursor_factory=AsyncTimedCursor)
+    _pool_stats['open'] += 1
+    add_metric('connects', 1)
+    return conn, False
+
+async def release_async_connection(conn) -> None:
+    if conn.closed or conn.broken:
+        await _discard_async_connection(conn)
+        return
+    try:
+        if conn.info.transaction_status != psycopg.pq.TransactionStatus.IDLE:
+            await conn.rollback()
+    except psycopg.Error:
+        await _discard_async_connection(conn)
+        return
+    if len(_async_idle_connections) < DB_POOL_MAX_SIZE:
+        _async_idle_connections.append((conn, time.monotonic()))
+        return
+    await _discard_async_connection(conn)
+
+async def run_with_async_connection(operation: Callable[[Any], Awaitable[Any]]) -> Any:
+    '''
+    run_with_connection for coroutines: await operation(conn) on a pooled async
+    connection, retrying once on a fresh one if a reused connection turns out dead.
+    Several of these can be gathered to run statements concurrently.
+    '''
+    for attempt in range(2):
+        started = time.perf_counter()
+        conn, reused = await get_async_connection()
+        add_metric('connect', time.perf_counter() - started)
+        try:
+            result = await operation(conn)
+        except (psycopg.OperationalError, psycopg.InterfaceError):
+            await release_async_connection(conn)
+            if reused and attempt == 0 and conn.broken:
+                continue
+            raise
+        except BaseException:
+            await release_async_connection(conn)
+            raise
+        await release_async_connection(conn)
+        return result
+
+def run_async(operation: Callable[[Any], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+    '''
+    Entry point from the synchronous handler: run run_with_async_connection(operation)
+    on the container's event loop and block until it returns or raises.
+    '''
+    state = (getattr(_request_state, 'metrics', None), getattr(_request_state, 'request_id', '-'))
+
+    async def invocation() -> Dict[str, Any]:
+        _async_request.set(state)
+        return await run_with_async_connection(operation)
+
+    return asyncio.run_coroutine_threadsafe(invocation(), _event_loop()).result()
+
+async def execute_prepared_async(cur, name: str, statement: str, params: Tuple[Any, ...] = ()) -> None:
+    '''
+    execute_prepared for async cursors.
+    '''
+    prepared = _prepared_statements.setdefault(id(cur.connection), set())
+    if name not in prepared:
+        if len(prepared) >= PREPARED_STATEMENTS_MAX:
+            await cur.execute('DEALLOCATE ALL')
+            prepared.clear()
+        await cur.execute(f'PREPARE {name} AS {statement}')
+        prepared.add(name)
+    if params:
+        await cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+    else:
+        await cur.execute(f'EXECUTE {name}')
+# --- end of db runtime ---
+
+INSERT_REVIEW_SQL = '''
+    WITH inserted AS (
+        INSERT INTO model_reviews (
+            model_id, author_name, author_phone, rating, review_text, is_verified
+        ) VALUES (
+            $1, $2, $3, $4, $5, $6
+        ) RETURNING id, model_id, author_name, rating, review_text, created_at
+    ), rated AS (
+        UPDATE t_p16461725_model_photo_db.models p
+        SET rating_sum = p.rating_sum + inserted.rating,
+            review_count = p.review_count + 1,
+            rating_avg = ROUND((p.rating_sum + inserted.rating)::numeric / (p.review_count + 1), 2)
+        FROM inserted
+        WHERE p.id = inserted.model_id
+    )
+    SELECT id, model_id, author_name, rating, review_text, created_at FROM inserted
+'''
+
+REVIEW_INGEST_MODES = ('direct', 'batched')
+REVIEW_INGEST_MODE = os.environ.get('REVIEW_INGEST_MODE', 'direct')
+REVIEW_QUEUE_PATH = os.environ.get('REVIEW_QUEUE_PATH', '/tmp/model_review_queue.sqlite3')
+REVIEW_BATCH_SIZE = int(os.environ.get('REVIEW_BATCH_SIZE', '50'))
+REVIEW_FLUSH_INTERVAL = float(os.environ.get('REVIEW_FLUSH_INTERVAL', '2'))
+REVIEW_FLUSH_MAX_ROWS = 1000
+PROFILE_ID_FIELD = 'modelId'
+MAX_LENGTHS = {'authorName': 255, 'authorPhone': 20}
+
+# One statement per batch: reviews for unknown profiles and (model_id, author_phone)
+# pairs that already have a review are skipped, aggregates move once per profile
+FLUSH_REVIEWS_SQL = '''
+    WITH batch AS (
+        SELECT *
+        FROM unnest(%s::int[], %s::text[], %s::text[], %s::int[], %s::text[], %s::timestamp[])
+            AS b(model_id, author_name, author_phone, rating, review_text, created_at)
+    ), fresh AS (
+        SELECT b.*
+        FROM batch b
+        JOIN t_p16461725_model_photo_db.models p ON p.id = b.model_id
+        WHERE NOT EXISTS (
+            SELECT 1 FROM model_reviews r
+            WHERE r.model_id = b.model_id AND r.author_phone = b.author_phone
+        )
+    ), inserted AS (
+        INSERT INTO model_reviews (
+            model_id, author_name, author_phone, rating, review_text, created_at, is_verified
+        )
+        SELECT model_id, author_name, author_phone, rating, review_text, created_at, TRUE FROM fresh
+        RETURNING model_id, rating
+    ), totals AS (
+        SELECT model_id, SUM(rating) AS rating_sum, COUNT(*) AS review_count
+        FROM inserted
+        GROUP BY model_id
+    ), rated AS (
+        UPDATE t_p16461725_model_photo_db.models p
+        SET rating_sum = p.rating_sum + totals.rating_sum,
+            review_count = p.review_count + totals.review_count,
+            rating_avg = ROUND((p.rating_sum + totals.rating_sum)::numeric / (p.review_count + totals.review_count), 2)
+        FROM totals
+        WHERE p.id = totals.model_id
+    )
+    SELECT COUNT(*) FROM inserted
+'''
+
+_queue_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_timer_lock = threading.Lock()
+_review_queue = None
+_flush_timer = None
+
+def review_queue():
+    '''
+    The container-local SQLite queue of accepted reviews. It survives a crashed
+    invocation but not the container: reviews still queued when the container is
+    stopped are lost. The flush timer writes them at most REVIEW_FLUSH_INTERVAL after
+    they were queued, but only while the container keeps running; a platform that
+    freezes idle containers also freezes the timer, so the interval is no bound there.
+    '''
+    global _review_queue
+    if _review_queue is None:
+        import sqlite3
+        queue = sqlite3.connect(REVIEW_QUEUE_PATH, isolation_level=None, check_same_thread=False)
+        queue.execute('PRAGMA journal_mode=WAL')
+        queue.execute('PRAGMA synchronous=NORMAL')
+        queue.execute('''
+            CREATE TABLE IF NOT EXISTS pending_reviews (
+                id INTEGER PRIMARY KEY,
+                profile_id INTEGER NOT NULL,
+                author_name TEXT NOT NULL,
+                author_phone TEXT NOT NULL,
+                rating INTEGER NOT NULL,
+                review_text TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                queued_at REAL NOT NULL,
+                UNIQUE (profile_id, author_phone)
+            )
+        ''')
+        _review_queue = queue
+    return _review_queue
+
+def validate_review(review: Any) -> Optional[str]:
+    '''
+    Queued reviews are only written later, so anything the insert would reject is refused up front.
+    '''
+    if not isinstance(review, dict):
+        return 'Review must be an object'
+    profile_id = review.get(PROFILE_ID_FIELD)
+    if not isinstance(profile_id, int) or isinstance(profile_id, bool) or profile_id <= 0:
+        return f'{PROFILE_ID_FIELD} must be a positive integer'
+    for field in ('authorName', 'authorPhone', 'reviewText'):
+        if not isinstance(review.get(field), str) or not review[field].strip():
+            return f'Missing required field: {field}'
+    for field, max_length in MAX_LENGTHS.items():
+        if len(review[field]) > max_length:
+            return f'{field} is longer than {max_length} characters'
+    rating = review.get('rating', 5)
+    if not isinstance(rating, int) or isinstance(rating, bool) or not 1 <= rating <= 5:
+        return 'rating must be an integer from 1 to 5'
+    return None
+
+def enqueue_review(review: Dict[str, Any]) -> Optional[str]:
+    '''
+    Queue a validated review. Returns its created_at, or None when a review from the
+    same authorPhone for the same profile is already waiting.
+    '''
+    created_at = datetime.now().isoformat()
+    with _queue_lock:
+        inserted = review_queue().execute(
+            'INSERT OR IGNORE INTO pending_reviews '
+            '(profile_id, author_name, author_phone, rating, review_text, created_at, queued_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (review[PROFILE_ID_FIELD], review['authorName'], review['authorPhone'],
+             review.get('rating', 5), review['reviewText'], created_at, time.time())
+        ).rowcount
+    return created_at if inserted else None
+
+def review_flush_due() -> bool:
+    with _queue_lock:
+        pending, oldest = review_queue().execute('SELECT COUNT(*), MIN(queued_at) FROM pending_reviews').fetchone()
+    return pending >= REVIEW_BATCH_SIZE or (pending > 0 and time.time() - oldest >= REVIEW_FLUSH_INTERVAL)
+
+def write_review_batch(conn, rows: List[Tuple[Any, ...]]) -> int:
+    cur = conn.cursor()
+    cur.execute('SELECT pg_advisory_xact_lock(hashtext(%s))', ('model_reviews_ingest',))
+    cur.execute(FLUSH_REVIEWS_SQL, [list(column) for column in list(zip(*rows))[1:]])
+    inserted = cur.fetchone()[0]
+    conn.commit()
+    cur.close()
+    return inserted
+
+def flush_review_queue(conn) -> Dict[str, int]:
+    '''
+    Write up to REVIEW_FLUSH_MAX_ROWS queued reviews in one statement, then drop
+    them from the queue. Flushes from all containers are serialized by an advisory
+    lock, so the duplicate check against stored reviews holds; a batch that is
+    written but not yet dropped when the container dies is skipped as duplicates on
+    the next flush. If the batch is rejected, rows are retried one by one and only
+    the failing ones are discarded. Callers hold _flush_lock.
+    '''
+    started = time.monotonic()
+    with _queue_lock:
+        rows = review_queue().execute(
+            'SELECT id, profile_id, author_name, author_phone, rating, review_text, created_at '
+            'FROM pending_reviews ORDER BY id LIMIT ?', (REVIEW_FLUSH_MAX_ROWS,)
+        ).fetchall()
+    if not rows:
+        return {'rows': 0, 'inserted': 0, 'skipped': 0, 'failed': 0}
+    failed = 0
+    try:
+        inserted = write_review_batch(conn, rows)
+    except (psycopg2.DataError, psycopg2.IntegrityError):
+        conn.rollback()
+        inserted = 0
+        for row in rows:
+            try:
+                inserted += write_review_batch(conn, [row])
+            except (psycopg2.DataError, psycopg2.IntegrityError) as e:
+                conn.rollback()
+                failed += 1
+                print(f"review_flush dropped profile_id={row[1]} error={json.dumps(str(e).strip(), ensure_ascii=False)}")
+    with _queue_lock:
+        review_queue().execute('DELETE FROM pending_reviews WHERE id <= ?', (rows[-1][0],))
+    stats = {'rows': len(rows), 'inserted': inserted, 'skipped': len(rows) - inserted - failed, 'failed': failed}
+    print(f"review_flush rows={stats['rows']} inserted={inserted} skipped={stats['skipped']} failed={failed} "
+          f"ms={(time.monotonic() - started) * 1000:.1f}")
+    return stats
+
+def flush_reviews_now() -> None:
+    '''
+    Flush on this thread; a failed flush leaves the queue for the next one. Callers hold _flush_lock.
+    '''
+    try:
+        run_with_connection(flush_review_queue)
+    except load_driver().Error as e:
+        print(f"review_flush failed error={json.dumps(str(e).strip(), ensure_ascii=False)}")
+
+def schedule_review_flush() -> None:
+    '''
+    Start the flush timer unless it is already pending, so queued reviews are written
+    REVIEW_FLUSH_INTERVAL later even if no further request arrives to flush them.
+    '''
+    global _flush_timer
+    with _timer_lock:
+        if _flush_timer is None:
+            _flush_timer = threading.Timer(REVIEW_FLUSH_INTERVAL, flush_on_timer)
+            _flush_timer.daemon = True
+            _flush_timer.start()
+
+def flush_on_timer() -> None:
+    global _flush_timer
+    with _flush_lock:
+        flush_reviews_now()
+    with _timer_lock:
+        _flush_timer = None
+    with _queue_lock:
+        pending = review_queue().execute('SELECT COUNT(*) FROM pending_reviews').fetchone()[0]
+    if pending:
+        schedule_review_flush()
+
+def ingest_review(body_data: Any) -> Dict[str, Any]:
+    '''
+    Batched mode: accept the review into the queue (202, or 200 for a queued
+    duplicate) and flush when REVIEW_BATCH_SIZE reviews are waiting or the oldest
+    has waited REVIEW_FLUSH_INTERVAL, unless another thread is already flushing.
+    Otherwise the flush timer writes the review REVIEW_FLUSH_INTERVAL later.
+    {"flush": true} flushes now.
+    '''
+    if isinstance(body_data, dict) and body_data.get('flush') is True:
+        with _flush_lock:
+            return json_response(200, run_with_connection(flush_review_queue))
+    error = validate_review(body_data)
+    if error:
+        return error_response(400, error)
+    created_at = enqueue_review(body_data)
+    if review_flush_due() and _flush_lock.acquire(blocking=False):
+        try:
+            flush_reviews_now()
+        finally:
+            _flush_lock.release()
+    schedule_review_flush()
+    return json_response(202 if created_at else 200, {
+        'status': 'queued' if created_at else 'duplicate',
+        PROFILE_ID_FIELD: body_data[PROFILE_ID_FIELD],
+        'authorName': body_data['authorName'],
+        'rating': body_data.get('rating', 5),
+        'reviewText': body_data['reviewText'],
+        'createdAt': created_at
+    })
+
+@instrumented
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
-    Business: Submit review for a model with rating
+    Business: Submit review for a model with rating, directly or through the batched write-behind queue
     Args: event - dict with httpMethod, body containing review data (modelId, authorName, authorPhone, rating, reviewText)
           context - object with request_id, function_name
-    Returns: HTTP response with created review data
+    Returns: HTTP response with created review data (201), or the queued review (202) in batched mode
     '''
     method: str = event.get('httpMethod', 'POST')
     
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': ''
-        }
+        return PREFLIGHT_RESPONSE
     
     if method != 'POST':
-        return {
-            'statusCode': 405,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({'error': 'Method not allowed'})
-        }
+        return METHOD_NOT_ALLOWED_RESPONSE
     
     body_data = json.loads(event.get('body', '{}'))
     
-    database_url = os.environ.get('DATABASE_URL')
-    
-    conn = psycopg2.connect(database_url)
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    if REVIEW_INGEST_MODE == 'batched':
+        return ingest_review(body_data)
     
-    cur.execute(
-        '''
-        INSERT INTO model_reviews (
-            model_id, author_name, author_phone, rating, review_text, is_verified
-        ) VALUES (
-            %s, %s, %s, %s, %s, %s
-        ) RETURNING id, model_id, author_name, rating, review_text, created_at
-        ''',
-        (
-            body_data.get('modelId'),
-            body_data.get('authorName'),
-            body_data.get('authorPhone'),
-            body_data.get('rating', 5),
-            body_data.get('reviewText'),
-            True
-        )
+    values = (
+        body_data.get('modelId'),
+        body_data.get('authorName'),
+        body_data.get('authorPhone'),
+        body_data.get('rating', 5),
+        body_data.get('reviewText'),
+        True
     )
     
-    result = cur.fetchone()
-    conn.commit()
-    cur.close()
-    conn.close()
-    
-    return {
-        'statusCode': 201,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*'
-        },
-        'isBase64Encoded': False,
-        'body': json.dumps({
+    def created(result: Dict[str, Any]) -> Dict[str, Any]:
+        return json_response(201, {
             'id': result['id'],
             'modelId': result['model_id'],
             'authorName': result['author_name'],
             'rating': result['rating'],
             'reviewText': result['review_text'],
             'createdAt': result['created_at'].isoformat()
-        }, ensure_ascii=False)
-    }
+        })
+    
+    if async_mode():
+        async def submit_async(conn) -> Dict[str, Any]:
+            cur = conn.cursor(row_factory=psycopg.rows.dict_row)
+            await execute_prepared_async(cur, 'insert_model_review', INSERT_REVIEW_SQL, values)
+            result = await cur.fetchone()
+            await conn.commit()
+            await cur.close()
+            return created(result)
+        
+        return run_async(submit_async)
+    
+    def submit(conn) -> Dict[str, Any]:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        execute_prepared(cur, 'insert_model_review', INSERT_REVIEW_SQL, values)
+        result = cur.fetchone()
+        conn.commit()
+        cur.close()
+        return created(result)
+    
+    return run_with_connection(submit)
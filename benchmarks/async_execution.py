@@ -0,0 +1,158 @@
+'''
+Synchronous psycopg2 execution versus DB_EXECUTION_MODE=async (psycopg 3 on an event
+loop) for the handlers that have an async path. search-profiles runs each filter shape
+with the count cache cleared before every request, so COUNT always runs: sequentially
+after the page query on one connection in sync mode, concurrently on a second
+connection in async mode. Bodies must match between modes. Single registrations and
+direct review submissions are then timed the same way; the profiles and reviews they
+write are deleted afterwards and the rating aggregates restored.
+
+Usage: DATABASE_URL=postgres://... python benchmarks/async_execution.py [repeat] [writes]
+Seed data at 100k or 1M profiles with benchmarks/load_test.py (database handler_bench).
+'''
+import importlib.util
+import io
+import json
+import os
+import statistics
+import sys
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+import psycopg2
+
+BACKEND = Path(__file__).resolve().parent.parent / 'backend'
+MODES = ('sync', 'async')
+PHONE_PREFIX = '+7996'
+CURSOR_PAGES = 3
+
+def load_handler(name: str, mode: str):
+    os.environ['DB_EXECUTION_MODE'] = mode
+    spec = importlib.util.spec_from_file_location(f"{name.replace('-', '_')}_{mode}", BACKEND / name / 'index.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    if hasattr(module, 'result_cache'):
+        module.result_cache = module.MemoryResultCache(0)
+    return module
+
+def filter_shapes() -> List[Dict[str, str]]:
+    city = 'Хабаровск'
+    return [
+        {'type': 'model'},
+        {'type': 'model', 'page': '5'},
+        {'type': 'model', 'city': city, 'gender': 'Женщина'},
+        {'type': 'model', 'city': city, 'minAge': '18', 'maxAge': '30', 'minHeight': '165'},
+        {'type': 'model', 'opennessLevel': 'Ню', 'cooperationFormat': 'TFP'},
+        {'type': 'model', 'sort': 'rating'},
+        {'type': 'model', 'count': 'estimate'},
+        {'type': 'model', 'cursor': ''},
+        {'type': 'photographer'},
+        {'type': 'photographer', 'specialization': 'Портрет', 'city': city},
+        {'type': 'photographer', 'sort': 'rating', 'page': '2'},
+    ]
+
+def timed(module, event: Dict[str, Any]) -> Tuple[Dict[str, Any], float]:
+    if hasattr(module, '_count_cache'):
+        module._count_cache.clear()
+    with redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        response = module.handler(event, None)
+    return response, (time.perf_counter() - started) * 1000
+
+def compare_search(repeat: int) -> int:
+    modules = {mode: load_handler('search-profiles', mode) for mode in MODES}
+    if modules['async'].load_async_driver() is None:
+        print('psycopg 3 is not installed, async mode falls back to sync')
+        return 1
+    mismatches = 0
+    timings: Dict[str, List[float]] = {mode: [] for mode in MODES}
+    for params in filter_shapes():
+        for _ in range(CURSOR_PAGES if 'cursor' in params else 1):
+            event = {'httpMethod': 'GET', 'queryStringParameters': params}
+            bodies = {mode: timed(module, event)[0]['body'] for mode, module in modules.items()}
+            samples: Dict[str, List[float]] = {mode: [] for mode in MODES}
+            for round_number in range(repeat):
+                for mode in MODES[::1 if round_number % 2 else -1]:
+                    samples[mode].append(timed(modules[mode], event)[1])
+            for mode in MODES:
+                timings[mode].extend(samples[mode])
+            same = bodies['sync'] == bodies['async']
+            mismatches += not same
+            print(f"{'ok' if same else 'FAIL':>4} sync {statistics.median(samples['sync']):7.2f} ms  "
+                  f"async {statistics.median(samples['async']):7.2f} ms  {json.dumps(params, ensure_ascii=False)}")
+            next_cursor = json.loads(bodies['sync'])['pagination'].get('nextCursor')
+            if not next_cursor:
+                break
+            params = {**params, 'cursor': next_cursor}
+    for mode, samples in timings.items():
+        print(f'{mode:>6}: median {statistics.median(samples):.2f} ms per search')
+    return mismatches
+
+def compare_writes(name: str, make_body: Callable[[str], Dict[str, Any]], writes: int, expected: int) -> int:
+    failures = 0
+    for mode in MODES:
+        module = load_handler(name, mode)
+        samples: List[float] = []
+        for i in range(writes):
+            event = {'httpMethod': 'POST', 'body': json.dumps(make_body(f'{PHONE_PREFIX}{MODES.index(mode)}{i:06d}'), ensure_ascii=False)}
+            response, elapsed = timed(module, event)
+            failures += response['statusCode'] != expected
+            samples.append(elapsed)
+        print(f'{name:>26} {mode:>5}: median {statistics.median(samples):6.2f} ms  p95 '
+              f'{sorted(samples)[int(len(samples) * 0.95)]:6.2f} ms over {writes} requests')
+    return failures
+
+def cleanup(conn) -> None:
+    conn.rollback()
+    with conn.cursor() as cur:
+        cur.execute('DELETE FROM t_p16461725_model_photo_db.models WHERE phone LIKE %s', (PHONE_PREFIX + '%',))
+        cur.execute('DELETE FROM t_p16461725_model_photo_db.photographers WHERE phone LIKE %s', (PHONE_PREFIX + '%',))
+        for table, column, profile_table in (('model_reviews', 'model_id', 'models'),
+                                             ('photographer_reviews', 'photographer_id', 'photographers')):
+            cur.execute(f'''
+                WITH removed AS (
+                    DELETE FROM t_p16461725_model_photo_db.{table} WHERE author_phone LIKE %s RETURNING {column} AS id
+                )
+                UPDATE t_p16461725_model_photo_db.{profile_table} p
+                SET rating_sum = r.rating_sum, review_count = r.review_count,
+                    rating_avg = CASE WHEN r.review_count = 0 THEN 0 ELSE ROUND(r.rating_sum::numeric / r.review_count, 2) END
+                FROM (
+                    SELECT d.id, COALESCE(SUM(x.rating), 0) AS rating_sum, COUNT(x.rating) AS review_count
+                    FROM (SELECT DISTINCT id FROM removed) d
+                    LEFT JOIN t_p16461725_model_photo_db.{table} x ON x.{column} = d.id AND x.author_phone NOT LIKE %s
+                    GROUP BY d.id
+                ) r
+                WHERE p.id = r.id
+            ''', (PHONE_PREFIX + '%', PHONE_PREFIX + '%'))
+    conn.commit()
+
+def main(repeat: int, writes: int) -> int:
+    failures = compare_search(repeat)
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    try:
+        failures += compare_writes('register-model', lambda phone: {
+            'fullName': 'Нагрузка Асинхронная', 'phone': phone, 'birthDate': '2000-01-01', 'gender': 'Женщина',
+            'city': 'Хабаровск', 'height': 170, 'specializations': ['Портрет'], 'opennessLevel': 'Ню'
+        }, writes, 201)
+        failures += compare_writes('register-photographer', lambda phone: {
+            'fullName': 'Нагрузка Асинхронная', 'phone': phone, 'city': 'Хабаровск', 'specializations': ['Портрет']
+        }, writes, 201)
+        failures += compare_writes('submit-model-review', lambda phone: {
+            'modelId': 1, 'authorName': 'Нагрузка', 'authorPhone': phone, 'rating': 4, 'reviewText': 'Асинхронно'
+        }, writes, 201)
+        failures += compare_writes('submit-photographer-review', lambda phone: {
+            'photographerId': 1, 'authorName': 'Нагрузка', 'authorPhone': phone, 'rating': 4, 'reviewText': 'Асинхронно'
+        }, writes, 201)
+    finally:
+        cleanup(conn)
+        conn.close()
+    print(f'{failures} mismatched search page(s) or failed write(s)')
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 5,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    ))
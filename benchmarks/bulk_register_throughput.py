@@ -0,0 +1,70 @@
+'''
+Throughput of register-model bulk import versus one request per profile.
+
+Usage: DATABASE_URL=postgres://... python benchmarks/bulk_register_throughput.py [profiles] [single_sample]
+Synthetic profiles use phones starting with +7000 and are deleted afterwards.
+'''
+import importlib.util
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import psycopg2
+
+HANDLER_PATH = Path(__file__).resolve().parent.parent / 'backend' / 'register-model' / 'index.py'
+PHONE_PREFIX = '+7000'
+
+def load_handler():
+    spec = importlib.util.spec_from_file_location('register_model', HANDLER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def synthetic_profiles(count: int, offset: int = 0) -> List[Dict[str, Any]]:
+    return [
+        {
+            'fullName': f'Модель {i}',
+            'phone': f'{PHONE_PREFIX}{i:08d}',
+            'birthDate': f'{1990 + i % 15}-0{1 + i % 9}-1{i % 10}',
+            'gender': 'Женщина' if i % 3 else 'Мужчина',
+            'height': 160 + i % 30,
+            'city': ['Москва', 'Хабаровск', 'Казань'][i % 3],
+            'specializations': ['Fashion']
+        }
+        for i in range(offset, offset + count)
+    ]
+
+def cleanup() -> None:
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    with conn, conn.cursor() as cur:
+        cur.execute('DELETE FROM t_p16461725_model_photo_db.models WHERE phone LIKE %s', (PHONE_PREFIX + '%',))
+    conn.close()
+
+def main(count: int, single_sample: int) -> None:
+    register = load_handler()
+    cleanup()
+    try:
+        body = json.dumps(synthetic_profiles(count), ensure_ascii=False)
+        for label in ('bulk (new)', 'bulk (existing)'):
+            started = time.perf_counter()
+            response = register.handler({'httpMethod': 'POST', 'body': body}, None)
+            elapsed = time.perf_counter() - started
+            summary = json.loads(response['body'])['summary']
+            print(f'{label:>16}: {count / elapsed:10.0f} rows/s  {summary}')
+
+        started = time.perf_counter()
+        for profile in synthetic_profiles(single_sample, offset=count):
+            register.handler({'httpMethod': 'POST', 'body': json.dumps(profile, ensure_ascii=False)}, None)
+        elapsed = time.perf_counter() - started
+        print(f"{'single requests':>16}: {single_sample / elapsed:10.0f} rows/s")
+    finally:
+        cleanup()
+
+if __name__ == '__main__':
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 5000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    )
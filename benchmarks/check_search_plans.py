@@ -0,0 +1,168 @@
+'''
+Plan regression check for search-profiles: runs the handler for the hot filter
+shapes, captures every SQL statement it issues and EXPLAINs each one with
+enable_seqscan = off (prepared statements through their EXECUTE). Exits non-zero
+if any statement still needs a sequential scan of models or photographers, i.e.
+no index can serve it, or applies a keyset cursor comparison as a Filter instead
+of an Index Cond. Ranked searches (radiusKm, name) combined with a cursor must be
+rejected with 400 before any query runs, since the keyset cannot keep their order.
+
+Usage: DATABASE_URL=postgres://... python benchmarks/check_search_plans.py
+'''
+import importlib.util
+import json
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+import psycopg2
+
+HANDLER_PATH = Path(__file__).resolve().parent.parent / 'backend' / 'search-profiles' / 'index.py'
+TABLES = ('models', 'photographers')
+CURSOR_CONDITION = 'ROW(last_login, id) <'
+DEEP_CURSOR_OFFSET = 100000
+
+def load_handler():
+    spec = importlib.util.spec_from_file_location('search_profiles', HANDLER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def deep_cursor(search, conn, table: str) -> str:
+    '''
+    Cursor of the row DEEP_CURSOR_OFFSET rows into the unfiltered keyset order, so
+    that a Filter on the cursor would have to discard that many rows.
+    '''
+    with conn.cursor() as cur:
+        cur.execute(f'''
+            SELECT last_login, id FROM t_p16461725_model_photo_db.{table}
+            WHERE is_blocked = FALSE AND last_login IS NOT NULL
+            ORDER BY last_login DESC NULLS LAST, id DESC
+            OFFSET {DEEP_CURSOR_OFFSET} LIMIT 1
+        ''')
+        row = cur.fetchone()
+    conn.rollback()
+    last_login, profile_id = row if row else (datetime.now(), 2 ** 31 - 1)
+    return search.encode_cursor({'lastLogin': last_login.isoformat(), 'id': profile_id})
+
+def hot_queries(search, conn) -> List[Dict[str, str]]:
+    city = 'Хабаровск'
+    after = search.encode_cursor({'lastLogin': datetime.now().isoformat(), 'id': 2 ** 31 - 1})
+    deep_models = deep_cursor(search, conn, 'models')
+    deep_photographers = deep_cursor(search, conn, 'photographers')
+    return [
+        {'type': 'model'},
+        {'type': 'model', 'city': city},
+        {'type': 'model', 'city': city, 'gender': 'Женщина'},
+        {'type': 'model', 'city': city, 'gender': 'Женщина', 'minAge': '18', 'maxAge': '25'},
+        {'type': 'model', 'city': city, 'cursor': after},
+        {'type': 'model', 'cursor': deep_models},
+        {'type': 'model', 'city': city, 'gender': 'Женщина', 'cursor': deep_models},
+        {'type': 'model', 'opennessLevel': 'Ню'},
+        {'type': 'model', 'city': city, 'radiusKm': '200'},
+        {'type': 'model', 'name': 'Анна'},
+        {'type': 'model', 'sort': 'rating'},
+        {'type': 'photographer'},
+        {'type': 'photographer', 'city': city},
+        {'type': 'photographer', 'specialization': 'Портрет'},
+        {'type': 'photographer', 'lat': '48.48', 'lon': '135.08', 'radiusKm': '50'},
+        {'type': 'photographer', 'city': city, 'cursor': after},
+        {'type': 'photographer', 'cursor': deep_photographers},
+        {'type': 'photographer', 'name': 'Иван'},
+        {'type': 'photographer', 'sort': 'rating'},
+    ]
+
+def rejected_queries() -> List[Dict[str, str]]:
+    return [
+        {'type': 'model', 'city': 'Хабаровск', 'radiusKm': '200', 'cursor': ''},
+        {'type': 'photographer', 'lat': '48.48', 'lon': '135.08', 'radiusKm': '50', 'cursor': ''},
+        {'type': 'model', 'name': 'Анна', 'cursor': ''},
+    ]
+
+class RecordingCursor:
+    def __init__(self, cursor, statements: List[str]):
+        self._cursor = cursor
+        self._statements = statements
+
+    def execute(self, query, args=None):
+        self._statements.append(self._cursor.mogrify(query, args).decode())
+        return self._cursor.execute(query, args)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+class RecordingConnection:
+    def __init__(self, conn, statements: List[str]):
+        self._conn = conn
+        self._statements = statements
+
+    def cursor(self, *args, **kwargs):
+        return RecordingCursor(self._conn.cursor(*args, **kwargs), self._statements)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+def seq_scans(node: Dict[str, Any]) -> List[str]:
+    found = []
+    if node['Node Type'] == 'Seq Scan' and node.get('Relation Name') in TABLES:
+        found.append(node['Relation Name'])
+    for child in node.get('Plans', []):
+        found.extend(seq_scans(child))
+    return found
+
+def index_conditions(node: Dict[str, Any]) -> List[str]:
+    found = [node['Index Cond']] if 'Index Cond' in node else []
+    for child in node.get('Plans', []):
+        found.extend(index_conditions(child))
+    return found
+
+def main() -> int:
+    search = load_handler()
+    search.load_driver()
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    statements: List[str] = []
+    search.get_connection = lambda: (RecordingConnection(conn, statements), False)
+    search.release_connection = lambda connection, broken=False: connection.rollback()
+    search.result_cache = search.MemoryResultCache(0)
+
+    failures = 0
+    for params in hot_queries(search, conn):
+        statements.clear()
+        search._count_cache.clear()
+        search.handler({'httpMethod': 'GET', 'queryStringParameters': params}, None)
+        for statement in statements:
+            # EXPLAIN cannot wrap PREPARE/DEALLOCATE; EXECUTE of the prepared statement is
+            # explained as is, since the handler prepared it on this same connection
+            if statement.lstrip().upper().startswith(('EXPLAIN', 'PREPARE', 'DEALLOCATE')):
+                continue
+            with conn.cursor() as cur:
+                cur.execute('SET LOCAL enable_seqscan = off')
+                cur.execute('EXPLAIN (FORMAT JSON) ' + statement)
+                plan = cur.fetchone()[0]
+            conn.rollback()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            scanned = seq_scans(plan[0]['Plan'])
+            # A cursor page has to seek to the cursor in the index, not filter up to it
+            filtered_cursor = '(last_login, id) <' in statement and not any(
+                CURSOR_CONDITION in condition for condition in index_conditions(plan[0]['Plan'])
+            )
+            status = 'FAIL' if scanned or filtered_cursor else 'ok'
+            failures += bool(scanned or filtered_cursor)
+            print(f"{status:>4} {json.dumps(params, ensure_ascii=False)} {' '.join(statement.split())[:120]}")
+    for params in rejected_queries():
+        statements.clear()
+        response = search.handler({'httpMethod': 'GET', 'queryStringParameters': params}, None)
+        rejected = response['statusCode'] == 400 and not statements
+        failures += not rejected
+        print(f"{'ok' if rejected else 'FAIL':>4} {json.dumps(params, ensure_ascii=False)} "
+              f"status {response['statusCode']}, {len(statements)} statement(s)")
+    conn.close()
+    print(f'{failures} statement(s) fall back to a sequential scan or filter on the cursor, '
+          f'or ranked cursor search(es) not rejected')
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,80 @@
+'''
+Equivalence check for search-profiles render modes: runs the handler for a set of
+filter shapes with SEARCH_RENDER_MODE=python and =postgres and fails unless every
+response body is byte-identical. Also follows nextCursor for a few pages and
+prints the median handler time per mode.
+
+Usage: DATABASE_URL=postgres://... python benchmarks/check_search_render_modes.py [repeat]
+'''
+import importlib.util
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+HANDLER_PATH = Path(__file__).resolve().parent.parent / 'backend' / 'search-profiles' / 'index.py'
+CURSOR_PAGES = 3
+
+def load_handler():
+    spec = importlib.util.spec_from_file_location('search_profiles', HANDLER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def filter_shapes() -> List[Dict[str, str]]:
+    city = 'Хабаровск'
+    return [
+        {'type': 'model'},
+        {'type': 'model', 'page': '3'},
+        {'type': 'model', 'city': city, 'gender': 'Женщина'},
+        {'type': 'model', 'minAge': '18', 'maxAge': '30', 'count': 'none'},
+        {'type': 'model', 'opennessLevel': 'Ню'},
+        {'type': 'model', 'sort': 'rating'},
+        {'type': 'model', 'cursor': ''},
+        {'type': 'photographer'},
+        {'type': 'photographer', 'city': city},
+        {'type': 'photographer', 'specialization': 'Портрет'},
+        {'type': 'photographer', 'sort': 'rating', 'page': '2'},
+        {'type': 'photographer', 'cursor': ''},
+        {'type': 'model', 'page': '100000'},
+    ]
+
+def render(search, mode: str, params: Dict[str, str]) -> str:
+    search.SEARCH_RENDER_MODE = mode
+    search._count_cache.clear()
+    response = search.handler({'httpMethod': 'GET', 'queryStringParameters': params}, None)
+    assert response['statusCode'] == 200, response
+    return response['body']
+
+def main(repeat: int) -> int:
+    search = load_handler()
+    search.result_cache = search.MemoryResultCache(0)
+    mismatches = 0
+    timings: Dict[str, List[float]] = {mode: [] for mode in search.RENDER_MODES}
+    for params in filter_shapes():
+        for _ in range(CURSOR_PAGES if 'cursor' in params else 1):
+            bodies = {mode: render(search, mode, params) for mode in search.RENDER_MODES}
+            for mode in search.RENDER_MODES:
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    render(search, mode, params)
+                    timings[mode].append((time.perf_counter() - started) * 1000)
+            same = len(set(bodies.values())) == 1
+            mismatches += not same
+            print(f"{'ok' if same else 'FAIL':>4} {json.dumps(params, ensure_ascii=False)}")
+            if not same:
+                for mode, body in bodies.items():
+                    print(f'     {mode}: {body[:300]}')
+            next_cursor = json.loads(bodies['python'])['pagination'].get('nextCursor')
+            if not next_cursor:
+                break
+            params = {**params, 'cursor': next_cursor}
+    for mode, samples in timings.items():
+        print(f'{mode:>9}: median {statistics.median(samples):.2f} ms per request')
+    print(f'{mismatches} response(s) differ between render modes')
+    return 1 if mismatches else 0
+
+if __name__ == '__main__':
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5))
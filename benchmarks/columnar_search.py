@@ -0,0 +1,128 @@
+'''
+Columnar search engine versus SQL for search-profiles. First the columnar index is
+loaded and its load time and size are reported. Then each filter shape runs with
+SEARCH_ENGINE=sql and =columnar. The check fails unless totals and page order agree:
+lastLogin/rating sequences in page mode (SQL leaves ties unordered there) and exact
+ids when following cursors. The median handler time per engine is printed. Finally
+--touch rows get a new last_login, and the incremental refresh is timed and checked again.
+
+Usage: DATABASE_URL=postgres://... python benchmarks/columnar_search.py [repeat] [touch]
+Seed data at 100k or 1M profiles with benchmarks/load_test.py (database handler_bench).
+The touch step updates rows, so point it at a scratch database.
+'''
+import importlib.util
+import io
+import json
+import statistics
+import sys
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+HANDLER_PATH = Path(__file__).resolve().parent.parent / 'backend' / 'search-profiles' / 'index.py'
+CURSOR_PAGES = 3
+
+def load_handler():
+    spec = importlib.util.spec_from_file_location('search_profiles', HANDLER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def filter_shapes() -> List[Dict[str, str]]:
+    city = 'Хабаровск'
+    return [
+        {'type': 'model'},
+        {'type': 'model', 'page': '5'},
+        {'type': 'model', 'city': city, 'gender': 'Женщина'},
+        {'type': 'model', 'city': city, 'minAge': '18', 'maxAge': '30', 'minHeight': '165'},
+        {'type': 'model', 'opennessLevel': 'Ню', 'cooperationFormat': 'TFP'},
+        {'type': 'model', 'sort': 'rating'},
+        {'type': 'model', 'city': 'Москва', 'sort': 'rating', 'count': 'none'},
+        {'type': 'model', 'cursor': ''},
+        {'type': 'photographer'},
+        {'type': 'photographer', 'specialization': 'Портрет', 'city': city},
+        {'type': 'photographer', 'sort': 'rating', 'page': '2'},
+        {'type': 'photographer', 'cursor': ''},
+    ]
+
+def run(search, engine: str, params: Dict[str, str]) -> Tuple[Dict[str, Any], float]:
+    search.SEARCH_ENGINE = engine
+    search._count_cache.clear()
+    with redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        response = search.handler({'httpMethod': 'GET', 'queryStringParameters': params}, None)
+    elapsed = (time.perf_counter() - started) * 1000
+    assert response['statusCode'] == 200, response
+    return json.loads(response['body']), elapsed
+
+def comparable(body: Dict[str, Any], params: Dict[str, str]) -> Any:
+    if 'cursor' in params:
+        order = [profile['id'] for profile in body['profiles']]
+    elif params.get('sort') == 'rating':
+        order = [(p['rating'], p['reviewCount'], p['lastLogin']) for p in body['profiles']]
+    else:
+        order = [profile['lastLogin'] for profile in body['profiles']]
+    pagination = body['pagination']
+    return order, pagination.get('total'), pagination['hasMore']
+
+def compare_engines(search, repeat: int) -> int:
+    mismatches = 0
+    timings: Dict[str, List[float]] = {'sql': [], 'columnar': []}
+    for params in filter_shapes():
+        for _ in range(CURSOR_PAGES if 'cursor' in params else 1):
+            bodies = {}
+            samples: Dict[str, List[float]] = {}
+            for engine in timings:
+                bodies[engine], _ = run(search, engine, params)
+                samples[engine] = [run(search, engine, params)[1] for _ in range(repeat)]
+                timings[engine].extend(samples[engine])
+            same = comparable(bodies['sql'], params) == comparable(bodies['columnar'], params)
+            mismatches += not same
+            print(f"{'ok' if same else 'FAIL':>4} sql {statistics.median(samples['sql']):7.2f} ms  "
+                  f"columnar {statistics.median(samples['columnar']):6.2f} ms  {json.dumps(params, ensure_ascii=False)}")
+            next_cursor = bodies['sql']['pagination'].get('nextCursor')
+            if not next_cursor:
+                break
+            params = {**params, 'cursor': next_cursor}
+    for engine, samples in timings.items():
+        print(f'{engine:>9}: median {statistics.median(samples):.2f} ms per request')
+    return mismatches
+
+def main(repeat: int, touch: int) -> int:
+    search = load_handler()
+    search.result_cache = search.MemoryResultCache(0)
+    conn = search.load_driver().connect(search.os.environ['DATABASE_URL'])
+    for table, index in search.profile_indexes.items():
+        started = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            rows = index.refresh(conn)
+        conn.rollback()
+        size = sum(array.nbytes for array in index.snapshot['columns'].values())
+        print(f'{table}: loaded {rows} rows in {time.perf_counter() - started:.2f} s, {size / 2**20:.1f} MiB of columns')
+    search.PROFILE_INDEX_REFRESH_INTERVAL = float('inf')
+    mismatches = compare_engines(search, repeat)
+
+    if touch:
+        with conn.cursor() as cur:
+            cur.execute('''
+                UPDATE t_p16461725_model_photo_db.models SET last_login = now()
+                WHERE id IN (SELECT id FROM t_p16461725_model_photo_db.models ORDER BY random() LIMIT %s)
+            ''', (touch,))
+        conn.commit()
+        index = search.profile_indexes['models']
+        started = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            rows = index.refresh(conn)
+        conn.rollback()
+        print(f'refresh after touching {touch} models: read {rows} rows in {(time.perf_counter() - started) * 1000:.1f} ms')
+        mismatches += compare_engines(search, 1)
+    conn.close()
+    print(f'{mismatches} page(s) differ between engines')
+    return 1 if mismatches else 0
+
+if __name__ == '__main__':
+    sys.exit(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 5,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    ))
@@ -0,0 +1,69 @@
+'''
+Concurrency check for the registration upsert: fires parallel registrations
+with the same phone and fails unless every call succeeds, exactly one of them
+created the profile and all of them returned the same id.
+
+Usage: DATABASE_URL=postgres://... python benchmarks/concurrent_registration_check.py [workers]
+'''
+import importlib.util
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import psycopg2
+
+BACKEND = Path(__file__).resolve().parent.parent / 'backend'
+PHONE = '+70009999999'
+CASES = {
+    'register-model': ('models', {
+        'fullName': 'Гонка Регистраций', 'phone': PHONE, 'birthDate': '2000-01-01',
+        'gender': 'Женщина', 'city': 'Хабаровск'
+    }),
+    'register-photographer': ('photographers', {
+        'fullName': 'Гонка Регистраций', 'phone': PHONE, 'city': 'Хабаровск'
+    }),
+}
+
+def load_handler(name: str):
+    spec = importlib.util.spec_from_file_location(name.replace('-', '_'), BACKEND / name / 'index.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def cleanup(table: str) -> None:
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    with conn, conn.cursor() as cur:
+        cur.execute(f'DELETE FROM t_p16461725_model_photo_db.{table} WHERE phone = %s', (PHONE,))
+    conn.close()
+
+def main(workers: int) -> int:
+    failed = False
+    for name, (table, profile) in CASES.items():
+        register = load_handler(name)
+        register.DB_POOL_MAX_SIZE = workers
+        event = {'httpMethod': 'POST', 'body': json.dumps(profile, ensure_ascii=False)}
+        cleanup(table)
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                outcomes = list(pool.map(lambda _: _call(register, event), range(workers)))
+        finally:
+            cleanup(table)
+
+        errors = [outcome for outcome in outcomes if isinstance(outcome, Exception)]
+        statuses = [outcome['statusCode'] for outcome in outcomes if isinstance(outcome, dict)]
+        ids = {json.loads(outcome['body'])['id'] for outcome in outcomes if isinstance(outcome, dict)}
+        ok = not errors and statuses.count(201) == 1 and set(statuses) <= {200, 201} and len(ids) == 1
+        failed = failed or not ok
+        print(f"{'ok' if ok else 'FAIL':>4} {name}: statuses={sorted(statuses)} ids={ids} errors={errors[:3]}")
+    return 1 if failed else 0
+
+def _call(register, event):
+    try:
+        return register.handler(event, None)
+    except Exception as e:
+        return e
+
+if __name__ == '__main__':
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 16))
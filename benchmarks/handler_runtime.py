@@ -0,0 +1,81 @@
+'''
+Cold-start and per-request cost of the handlers at a git revision versus the
+working tree. Every measurement runs in a fresh interpreter, so import time is
+what a new container pays before its first invocation.
+
+Usage: python benchmarks/handler_runtime.py [revision] [requests]
+With DATABASE_URL set, warm GET/POST latency is measured as well; otherwise only
+import time and OPTIONS preflight latency are reported.
+'''
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict
+
+ROOT = Path(__file__).resolve().parent.parent
+HANDLERS = {
+    'search-profiles': {'httpMethod': 'GET', 'queryStringParameters': {'type': 'model', 'city': 'Хабаровск'}},
+    'list-reviews': {'httpMethod': 'GET', 'queryStringParameters': {'type': 'model', 'ids': '1'}},
+    'submit-model-review': None,
+    'register-model': None,
+}
+
+PROBE = r'''
+import importlib.util, json, os, sys, time
+started = time.perf_counter()
+spec = importlib.util.spec_from_file_location('handler', sys.argv[1])
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+result = {'import_ms': (time.perf_counter() - started) * 1000,
+          'driver_loaded_on_import': 'psycopg2' in sys.modules}
+requests = int(sys.argv[2])
+event = json.loads(sys.argv[3])
+
+def timed(event):
+    samples = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        module.handler(event, None)
+        samples.append((time.perf_counter() - started) * 1e6)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+result['options_us'] = timed({'httpMethod': 'OPTIONS'})
+if event and os.environ.get('DATABASE_URL'):
+    result['request_us'] = timed(event)
+print(json.dumps(result))
+'''
+
+def probe(path: Path, requests: int, event: Any) -> Dict[str, Any]:
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE, str(path), str(requests), json.dumps(event)],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main(revision: str, requests: int) -> None:
+    with tempfile.TemporaryDirectory() as scratch:
+        for name, event in HANDLERS.items():
+            current = ROOT / 'backend' / name / 'index.py'
+            previous = Path(scratch) / f'{name}.py'
+            shown = subprocess.run(
+                ['git', 'show', f'{revision}:backend/{name}/index.py'],
+                cwd=ROOT, capture_output=True, text=True
+            )
+            rows = [('current', probe(current, requests, event))]
+            if shown.returncode == 0:
+                previous.write_text(shown.stdout)
+                rows.insert(0, (revision, probe(previous, requests, event)))
+            for label, result in rows:
+                request = f"{result['request_us']:9.0f} us" if 'request_us' in result else '        -'
+                print(f"{name:>22} {label:>10}: import {result['import_ms']:6.1f} ms  "
+                      f"driver={'yes' if result['driver_loaded_on_import'] else 'no ':3}  "
+                      f"options {result['options_us']:6.1f} us  request {request}")
+
+if __name__ == '__main__':
+    main(
+        sys.argv[1] if len(sys.argv) > 1 else 'HEAD~12',
+        int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    )
@@ -0,0 +1,412 @@
+'''
+Load test for every backend handler. Creates a scratch database, applies
+db_migrations, seeds synthetic models, photographers and reviews at the given
+scales, then calls each handler() directly from a thread pool and reports
+p50/p95/p99 latency, throughput and SQL statements per request. Results are
+written as JSON so runs at different commits can be diffed (--compare).
+
+Usage:
+  python benchmarks/load_test.py --database-url postgres://user@host/postgres [--scale 10k,100k,1M]
+  python benchmarks/load_test.py --initdb [--scale 10k]     # temporary cluster, needs initdb/pg_ctl on PATH or PG_BIN
+Options: --requests N per handler scenario, --concurrency N threads, --output FILE,
+         --compare OLD.json, --result-cache (keep the search result cache on).
+
+--database-url only needs rights to create databases: the run uses its own
+database (handler_bench) and never touches existing ones.
+'''
+import argparse
+import importlib.util
+import io
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+import psycopg2
+import psycopg2.extensions
+
+ROOT = Path(__file__).resolve().parent.parent
+BACKEND = ROOT / 'backend'
+MIGRATIONS = ROOT / 'db_migrations'
+BENCH_DATABASE = 'handler_bench'
+SCHEMA = 't_p16461725_model_photo_db'
+SCALES = {'10k': 10_000, '100k': 100_000, '1M': 1_000_000}
+# Columns the handlers rely on that no migration in db_migrations creates
+SCHEMA_PRELUDE = f'''
+ALTER TABLE {SCHEMA}.models
+    ADD COLUMN IF NOT EXISTS is_blocked BOOLEAN DEFAULT FALSE,
+    ADD COLUMN IF NOT EXISTS openness_level VARCHAR(50),
+    ADD COLUMN IF NOT EXISTS cooperation_format VARCHAR(100);
+ALTER TABLE {SCHEMA}.photographers
+    ADD COLUMN IF NOT EXISTS is_blocked BOOLEAN DEFAULT FALSE,
+    ADD COLUMN IF NOT EXISTS cooperation_format VARCHAR(100);
+'''
+
+_counters = threading.local()
+
+def _counted(factory):
+    class CountingCursor(factory):
+        def execute(self, query, vars=None):
+            _counters.queries = getattr(_counters, 'queries', 0) + 1
+            return super().execute(query, vars)
+    return CountingCursor
+
+_counting_factories: Dict[Any, Any] = {}
+_counting_connections: Dict[Any, Any] = {}
+
+def counting_connection(base):
+    '''
+    Subclass of the connection class the handler asked for (if any) whose cursors, whatever
+    cursor_factory is requested, count execute() calls of the current thread.
+    '''
+    if base not in _counting_connections:
+        class CountingConnection(base):
+            def cursor(self, *args, **kwargs):
+                factory = kwargs.pop('cursor_factory', None) or self.cursor_factory or psycopg2.extensions.cursor
+                if factory not in _counting_factories:
+                    _counting_factories[factory] = _counted(factory)
+                return super().cursor(*args, cursor_factory=_counting_factories[factory], **kwargs)
+        _counting_connections[base] = CountingConnection
+    return _counting_connections[base]
+
+def with_database(url: str, database: str) -> str:
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme, parts.netloc, '/' + database, parts.query, parts.fragment))
+
+def start_temporary_cluster() -> Tuple[str, Callable[[], None]]:
+    pg_bin = os.environ.get('PG_BIN')
+    initdb = os.path.join(pg_bin, 'initdb') if pg_bin else shutil.which('initdb')
+    pg_ctl = os.path.join(pg_bin, 'pg_ctl') if pg_bin else shutil.which('pg_ctl')
+    if not initdb or not pg_ctl:
+        sys.exit('initdb/pg_ctl not found: put them on PATH or set PG_BIN')
+    if hasattr(os, 'geteuid') and os.geteuid() == 0:
+        sys.exit('PostgreSQL refuses to run as root: use --database-url or run as an unprivileged user')
+    data_dir = tempfile.mkdtemp(prefix='handler_bench_')
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    subprocess.run([initdb, '-D', data_dir, '-U', 'postgres', '--auth=trust', '-E', 'UTF8'],
+                   check=True, stdout=subprocess.DEVNULL)
+    subprocess.run([pg_ctl, '-D', data_dir, '-w', '-l', os.path.join(data_dir, 'server.log'),
+                    '-o', f"-k {data_dir} -p {port} -c listen_addresses='' -c fsync=off", 'start'],
+                   check=True, stdout=subprocess.DEVNULL)
+
+    def stop() -> None:
+        subprocess.run([pg_ctl, '-D', data_dir, '-m', 'fast', 'stop'], stdout=subprocess.DEVNULL)
+        shutil.rmtree(data_dir, ignore_errors=True)
+    return f'postgresql://postgres@/postgres?host={data_dir}&port={port}', stop
+
+def create_schema(admin_url: str) -> Tuple[str, List[str]]:
+    '''
+    (Re)create the bench database and apply every migration in order. Returns its
+    URL and the migrations that failed (e.g. pg_trgm not installed on this server).
+    '''
+    admin = psycopg2.connect(admin_url)
+    admin.autocommit = True
+    with admin.cursor() as cur:
+        cur.execute(f'DROP DATABASE IF EXISTS {BENCH_DATABASE}')
+        cur.execute(f'CREATE DATABASE {BENCH_DATABASE}')
+    admin.close()
+
+    url = with_database(admin_url, BENCH_DATABASE)
+    conn = psycopg2.connect(url)
+    conn.autocommit = True
+    failed = []
+    with conn.cursor() as cur:
+        cur.execute(f'CREATE SCHEMA {SCHEMA}')
+        cur.execute(f'ALTER DATABASE {BENCH_DATABASE} SET search_path TO {SCHEMA}, public')
+        cur.execute(f'SET search_path TO {SCHEMA}, public')
+        for index, migration in enumerate(sorted(MIGRATIONS.glob('V*.sql'))):
+            if index == 1:
+                cur.execute(SCHEMA_PRELUDE)
+            try:
+                cur.execute(migration.read_text())
+            except psycopg2.Error as e:
+                failed.append(f'{migration.name}: {str(e).splitlines()[0]}')
+    conn.close()
+    return url, failed
+
+def seed(url: str, models: int) -> Dict[str, int]:
+    '''
+    Synthetic data: models, half as many photographers, one review per model and per
+    photographer, rating aggregates consistent with the reviews. Deterministic.
+    '''
+    photographers = max(models // 2, 1)
+    conn = psycopg2.connect(url)
+    with conn, conn.cursor() as cur:
+        cur.execute(f'SET search_path TO {SCHEMA}, public')
+        cur.execute('TRUNCATE models, photographers, model_reviews, photographer_reviews RESTART IDENTITY CASCADE')
+        cur.execute('''
+            WITH c AS (SELECT array_agg(name ORDER BY name) AS names, array_agg(latitude ORDER BY name) AS lats,
+                              array_agg(longitude ORDER BY name) AS lons, count(*)::int AS n FROM cities),
+                 l AS (SELECT array_agg(label ORDER BY rank) AS labels FROM openness_levels)
+            INSERT INTO models (full_name, phone, birth_date, gender, height, city, latitude, longitude,
+                                openness_level, openness_rank, cooperation_format, last_login, profile_photo_url)
+            SELECT (ARRAY['Анна','Мария','Елена','Ольга','Дарья','Иван','Пётр','Сергей'])[1 + mod(i, 8)]
+                       || ' ' || (ARRAY['Петрова','Иванова','Смирнова','Кузнецова','Попова'])[1 + mod(i / 8, 5)] || ' ' || i,
+                   '+71' || lpad(i::text, 10, '0'),
+                   date '1980-01-01' + mod(i * 7919, 10000)::int,
+                   (ARRAY['Женщина','Женщина','Мужчина','Другое'])[1 + mod(i, 4)],
+                   150 + mod(i, 45),
+                   CASE WHEN mod(i, 4) = 0 THEN 'Хабаровск' ELSE c.names[1 + mod(i * 31, c.n)] END,
+                   CASE WHEN mod(i, 4) = 0 THEN 48.48 ELSE c.lats[1 + mod(i * 31, c.n)] END,
+                   CASE WHEN mod(i, 4) = 0 THEN 135.08 ELSE c.lons[1 + mod(i * 31, c.n)] END,
+                   l.labels[1 + mod(i * 13, 8)], 1 + mod(i * 13, 8),
+                   (ARRAY['TFP','Оплата','Обмен услугами'])[1 + mod(i, 3)],
+                   CASE WHEN mod(i, 50) = 0 THEN NULL
+                        ELSE timestamp '2024-06-01' - mod(i * 7727, 20000000) * interval '1 second' END,
+                   'https://cdn.example.com/models/' || i || '.jpg'
+            FROM generate_series(1::bigint, %s) AS i, c, l
+        ''', (models,))
+        cur.execute('''
+            WITH c AS (SELECT array_agg(name ORDER BY name) AS names, array_agg(latitude ORDER BY name) AS lats,
+                              array_agg(longitude ORDER BY name) AS lons, count(*)::int AS n FROM cities)
+            INSERT INTO photographers (full_name, phone, city, latitude, longitude, experience_years, specializations,
+                                       price_range, cooperation_format, last_login)
+            SELECT 'Фотограф ' || i, '+72' || lpad(i::text, 10, '0'),
+                   CASE WHEN mod(i, 4) = 0 THEN 'Хабаровск' ELSE c.names[1 + mod(i * 17, c.n)] END,
+                   CASE WHEN mod(i, 4) = 0 THEN 48.48 ELSE c.lats[1 + mod(i * 17, c.n)] END,
+                   CASE WHEN mod(i, 4) = 0 THEN 135.08 ELSE c.lons[1 + mod(i * 17, c.n)] END,
+                   mod(i, 25),
+                   CASE mod(i, 3) WHEN 0 THEN ARRAY['Портрет','Fashion'] WHEN 1 THEN ARRAY['Репортаж','Свадьба']
+                                  ELSE ARRAY['Портрет','Предметная'] END,
+                   (1000 + mod(i, 20) * 500) || ' ₽/час',
+                   (ARRAY['TFP','Оплата'])[1 + mod(i, 2)],
+                   timestamp '2024-06-01' - mod(i * 6151, 20000000) * interval '1 second'
+            FROM generate_series(1::bigint, %s) AS i, c
+        ''', (photographers,))
+        for table, id_column, count in (('model_reviews', 'model_id', models),
+                                        ('photographer_reviews', 'photographer_id', photographers)):
+            cur.execute(f'''
+                INSERT INTO {table} ({id_column}, author_name, author_phone, rating, review_text, created_at)
+                SELECT 1 + mod(i * 7, %s), 'Автор ' || i, '+73' || lpad(i::text, 10, '0'), 1 + mod(i * 13, 5),
+                       'Отзыв номер ' || i, timestamp '2024-06-01' - mod(i * 3571, 20000000) * interval '1 second'
+                FROM generate_series(1::bigint, %s) AS i
+            ''', (count, count))
+            profile_table = 'models' if table == 'model_reviews' else 'photographers'
+            cur.execute(f'''
+                UPDATE {profile_table} p
+                SET rating_sum = r.rating_sum, review_count = r.review_count,
+                    rating_avg = ROUND(r.rating_sum::numeric / r.review_count, 2)
+                FROM (SELECT {id_column} AS id, SUM(rating) AS rating_sum, COUNT(*) AS review_count
+                      FROM {table} GROUP BY {id_column}) r
+                WHERE p.id = r.id
+            ''')
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute('VACUUM ANALYZE')
+    conn.close()
+    return {'models': models, 'photographers': photographers, 'modelReviews': models,
+            'photographerReviews': photographers}
+
+def load_handler(name: str):
+    spec = importlib.util.spec_from_file_location(f"bench_{name.replace('-', '_')}", BACKEND / name / 'index.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def scenarios(counts: Dict[str, int], trigram: bool) -> Dict[str, Tuple[str, Callable[[int], Dict[str, Any]]]]:
+    '''
+    Scenario name -> (handler directory, event factory taking the request number).
+    '''
+    models, photographers = counts['models'], counts['photographers']
+    run_id = int(time.time())
+    searches = [
+        {'type': 'model'},
+        {'type': 'model', 'city': 'Хабаровск', 'gender': 'Женщина'},
+        {'type': 'model', 'city': 'Хабаровск', 'minAge': '18', 'maxAge': '30', 'count': 'estimate'},
+        {'type': 'model', 'opennessLevel': 'Ню'},
+        {'type': 'model', 'sort': 'rating', 'count': 'none'},
+        {'type': 'model', 'city': 'Хабаровск', 'radiusKm': '300'},
+        {'type': 'model', 'cursor': ''},
+        {'type': 'photographer', 'specialization': 'Портрет'},
+        {'type': 'photographer', 'city': 'Москва'},
+    ] + ([{'type': 'model', 'name': 'Смирнова 12'}] if trigram else [])
+
+    def search(i: int) -> Dict[str, Any]:
+        return {'httpMethod': 'GET', 'queryStringParameters': dict(searches[i % len(searches)])}
+
+    def search_ids(i: int) -> Dict[str, Any]:
+        rng = random.Random(i)
+        ids = [str(rng.randint(1, models)) for _ in range(10)] + [f'photographer:{rng.randint(1, photographers)}']
+        return {'httpMethod': 'GET', 'queryStringParameters': {'ids': ','.join(ids)}}
+
+    def facets(i: int) -> Dict[str, Any]:
+        return {'httpMethod': 'GET', 'queryStringParameters':
+                {'type': 'model' if i % 2 else 'photographer', 'facets': '1', 'city': 'Хабаровск'}}
+
+    def list_reviews(i: int) -> Dict[str, Any]:
+        rng = random.Random(i)
+        ids = ','.join(str(rng.randint(1, models)) for _ in range(1 + i % 5))
+        return {'httpMethod': 'GET', 'queryStringParameters': {'type': 'model', 'ids': ids, 'limit': '5'}}
+
+    def review(profile_key: str, upper: int) -> Callable[[int], Dict[str, Any]]:
+        def event(i: int) -> Dict[str, Any]:
+            return {'httpMethod': 'POST', 'body': json.dumps({
+                profile_key: 1 + (i * 7919) % upper, 'authorName': 'Нагрузка', 'authorPhone': f'+74{run_id % 10**6:06d}{i:04d}',
+                'rating': 1 + i % 5, 'reviewText': 'Отзыв из нагрузочного теста'
+            }, ensure_ascii=False)}
+        return event
+
+    def register_model(i: int) -> Dict[str, Any]:
+        return {'httpMethod': 'POST', 'body': json.dumps({
+            'fullName': f'Нагрузка {i}', 'phone': f'+75{run_id % 10**6:06d}{i:04d}', 'birthDate': '2000-01-01',
+            'gender': 'Женщина', 'city': 'Хабаровск', 'opennessLevel': 'Портрет'
+        }, ensure_ascii=False)}
+
+    def register_photographer(i: int) -> Dict[str, Any]:
+        return {'httpMethod': 'POST', 'body': json.dumps({
+            'fullName': f'Нагрузка {i}', 'phone': f'+76{run_id % 10**6:06d}{i:04d}', 'city': 'Хабаровск'
+        }, ensure_ascii=False)}
+
+    return {
+        'search-profiles': ('search-profiles', search),
+        'search-profiles:ids': ('search-profiles', search_ids),
+        'search-profiles:facets': ('search-profiles', facets),
+        'list-reviews': ('list-reviews', list_reviews),
+        'submit-model-review': ('submit-model-review', review('modelId', models)),
+        'submit-photographer-review': ('submit-photographer-review', review('photographerId', photographers)),
+        'register-model': ('register-model', register_model),
+        'register-photographer': ('register-photographer', register_photographer),
+    }
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def drive(handler: Callable, make_event: Callable[[int], Dict[str, Any]],
+          requests: int, concurrency: int) -> Dict[str, Any]:
+    def one(i: int) -> Tuple[float, int, int]:
+        event = make_event(i)
+        _counters.queries = 0
+        started = time.perf_counter()
+        try:
+            status = handler(event, None)['statusCode']
+        except Exception:
+            status = 599
+        return (time.perf_counter() - started) * 1000, status, _counters.queries
+
+    with redirect_stdout(io.StringIO()):
+        for i in range(min(concurrency, requests)):
+            one(-1 - i)  # warm the connection pool and per-container caches
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            outcomes = list(pool.map(one, range(requests)))
+        elapsed = time.perf_counter() - started
+
+    latencies = [latency for latency, _, _ in outcomes]
+    statuses: Dict[str, int] = {}
+    for _, status, _ in outcomes:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        'requests': requests,
+        'errors': sum(count for status, count in statuses.items() if int(status) >= 500),
+        'statuses': statuses,
+        'p50Ms': round(percentile(latencies, 0.50), 3),
+        'p95Ms': round(percentile(latencies, 0.95), 3),
+        'p99Ms': round(percentile(latencies, 0.99), 3),
+        'throughputRps': round(requests / elapsed, 1),
+        'queriesPerRequest': round(sum(queries for _, _, queries in outcomes) / requests, 2),
+    }
+
+def git_commit() -> Optional[str]:
+    result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True)
+    return result.stdout.strip() or None
+
+def compare(old: Dict[str, Any], new: Dict[str, Any]) -> None:
+    for scale, run in new['runs'].items():
+        previous = old.get('runs', {}).get(scale)
+        if not previous:
+            continue
+        print(f"\n{scale}: {old.get('commit')} -> {new.get('commit')}")
+        for name, result in run['scenarios'].items():
+            before = previous['scenarios'].get(name)
+            if not before:
+                continue
+            deltas = '  '.join(
+                f"{metric} {before[metric]:.1f}->{result[metric]:.1f} ({(result[metric] / before[metric] - 1) * 100 if before[metric] else 0:+.0f}%)"
+                for metric in ('p50Ms', 'p95Ms', 'throughputRps')
+            )
+            print(f'  {name:>28}: {deltas}')
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--database-url')
+    target.add_argument('--initdb', action='store_true')
+    parser.add_argument('--scale', default='10k')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--output')
+    parser.add_argument('--compare')
+    parser.add_argument('--result-cache', action='store_true')
+    args = parser.parse_args()
+    scales = [scale.strip() for scale in args.scale.split(',')]
+    if any(scale not in SCALES for scale in scales):
+        parser.error(f"--scale takes a comma-separated list of {', '.join(SCALES)}")
+
+    psycopg2_connect = psycopg2.connect
+    psycopg2.connect = lambda *a, connection_factory=None, **kw: psycopg2_connect(
+        *a, connection_factory=counting_connection(connection_factory or psycopg2.extensions.connection), **kw)
+    admin_url, stop = start_temporary_cluster() if args.initdb else (args.database_url, lambda: None)
+    commit = git_commit()
+    report: Dict[str, Any] = {
+        'commit': commit,
+        'startedAt': datetime.now(timezone.utc).isoformat(),
+        'concurrency': args.concurrency,
+        'requestsPerScenario': args.requests,
+        'resultCache': args.result_cache,
+        'runs': {},
+    }
+    try:
+        for scale in scales:
+            url, failed = create_schema(admin_url)
+            for failure in failed:
+                print(f'migration skipped: {failure}', file=sys.stderr)
+            started = time.perf_counter()
+            counts = seed(url, SCALES[scale])
+            print(f'{scale}: seeded {counts} in {time.perf_counter() - started:.1f}s', file=sys.stderr)
+            os.environ['DATABASE_URL'] = url
+            conn = psycopg2_connect(url)
+            with conn.cursor() as cur:
+                cur.execute("SELECT current_setting('server_version'), EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')")
+                server_version, trigram = cur.fetchone()
+            conn.close()
+
+            run: Dict[str, Any] = {'seed': counts, 'serverVersion': server_version,
+                                   'skippedMigrations': failed, 'scenarios': {}}
+            for name, (directory, make_event) in scenarios(counts, trigram).items():
+                module = load_handler(directory)
+                module.DB_POOL_MAX_SIZE = args.concurrency
+                if hasattr(module, 'result_cache') and not args.result_cache:
+                    module.result_cache = module.MemoryResultCache(0)
+                result = drive(module.handler, make_event, args.requests, args.concurrency)
+                run['scenarios'][name] = result
+                print(f"{scale} {name:>28}: p50 {result['p50Ms']:8.2f} ms  p95 {result['p95Ms']:8.2f} ms  "
+                      f"p99 {result['p99Ms']:8.2f} ms  {result['throughputRps']:8.1f} req/s  "
+                      f"{result['queriesPerRequest']:5.2f} q/req  errors {result['errors']}")
+            report['runs'][scale] = run
+    finally:
+        stop()
+
+    output = Path(args.output or f"load_test_{commit or 'worktree'}_{'_'.join(scales)}.json")
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2))
+    print(f'results written to {output}', file=sys.stderr)
+    if args.compare:
+        compare(json.loads(Path(args.compare).read_text()), report)
+    return 1 if any(result['errors'] for run in report['runs'].values() for result in run['scenarios'].values()) else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,79 @@
+'''
+Compare the query plan of the search-profiles name filter before and after the
+pg_trgm GIN index (V0004) on a synthetic models table.
+
+Usage: DATABASE_URL=postgres://... python benchmarks/name_search_plan.py [rows]
+Everything is created in a scratch schema that is dropped at the end.
+'''
+import json
+import os
+import sys
+from typing import Any, Dict
+
+import psycopg2
+
+SCHEMA = 'bench_name_search'
+FIRST_NAMES = ['Анна', 'Мария', 'Елена', 'Ольга', 'Дарья', 'Иван', 'Пётр', 'Сергей', 'Алексей', 'Дмитрий']
+LAST_NAMES = ['Петрова', 'Иванова', 'Смирнова', 'Кузнецова', 'Попова', 'Соколов', 'Морозов', 'Волков', 'Лебедев', 'Козлов']
+QUERY = f'''
+    SELECT id, full_name
+    FROM {SCHEMA}.models
+    WHERE is_blocked = FALSE
+      AND (full_name ILIKE '%%' || %s || '%%' OR full_name %% %s)
+    ORDER BY similarity(full_name, %s) DESC, last_login DESC NULLS LAST
+    LIMIT 21
+'''
+
+def explain(cur, name: str) -> Dict[str, Any]:
+    cur.execute('EXPLAIN (ANALYZE, FORMAT JSON) ' + QUERY, (name, name, name))
+    plan = cur.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]
+
+def scan_nodes(node: Dict[str, Any]) -> list:
+    nodes = [node['Node Type']] if 'Scan' in node['Node Type'] else []
+    for child in node.get('Plans', []):
+        nodes.extend(scan_nodes(child))
+    return nodes
+
+def main(rows: int) -> None:
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    conn.autocommit = True
+    cur = conn.cursor()
+    cur.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    cur.execute(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE')
+    cur.execute(f'CREATE SCHEMA {SCHEMA}')
+    try:
+        cur.execute(f'''
+            CREATE TABLE {SCHEMA}.models (
+                id SERIAL PRIMARY KEY,
+                full_name VARCHAR(255) NOT NULL,
+                is_blocked BOOLEAN DEFAULT FALSE,
+                last_login TIMESTAMP
+            )
+        ''')
+        cur.execute(f'''
+            INSERT INTO {SCHEMA}.models (full_name, last_login)
+            SELECT (%s::text[])[1 + i %% 10] || ' ' || (%s::text[])[1 + (i / 10) %% 10] || ' ' || i,
+                   now() - (i || ' minutes')::interval
+            FROM generate_series(1, %s) AS i
+        ''', (FIRST_NAMES, LAST_NAMES, rows))
+        cur.execute(f'ANALYZE {SCHEMA}.models')
+
+        results = {'rows': rows}
+        results['before'] = explain(cur, 'Смирн')
+        cur.execute(f'CREATE INDEX ON {SCHEMA}.models USING GIN (full_name gin_trgm_ops)')
+        cur.execute(f'ANALYZE {SCHEMA}.models')
+        results['after'] = explain(cur, 'Смирн')
+
+        for label in ('before', 'after'):
+            plan = results[label]
+            print(f"{label:>6}: {plan['Execution Time']:.2f} ms, scans={scan_nodes(plan['Plan'])}")
+    finally:
+        cur.execute(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE')
+        cur.close()
+        conn.close()
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
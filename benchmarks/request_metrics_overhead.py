@@ -0,0 +1,69 @@
+'''
+Cost of the per-request instrumentation (REQUEST_METRICS): loads each read handler
+twice in one interpreter, once with metrics on and once with them off, runs the same
+events against both copies, alternating which goes first, and prints the median handler time and the
+relative overhead. The slow-query log is kept out of the measurement by a high
+SLOW_QUERY_MS.
+
+Usage: DATABASE_URL=postgres://... python benchmarks/request_metrics_overhead.py [rounds]
+'''
+import importlib.util
+import io
+import os
+import statistics
+import sys
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import Any, Dict, List
+
+BACKEND = Path(__file__).resolve().parent.parent / 'backend'
+EVENTS = {
+    'search-profiles': [
+        {'type': 'model'},
+        {'type': 'model', 'city': 'Хабаровск', 'gender': 'Женщина'},
+        {'type': 'model', 'sort': 'rating', 'count': 'none'},
+        {'type': 'photographer', 'specialization': 'Портрет'},
+        {'type': 'model', 'ids': '1,2,3,4,5,photographer:1'},
+    ],
+    'list-reviews': [
+        {'type': 'model', 'ids': '1,2,3', 'limit': '5'},
+    ],
+}
+
+def load_handler(name: str, metrics: bool):
+    os.environ['REQUEST_METRICS'] = '1' if metrics else '0'
+    spec = importlib.util.spec_from_file_location(f"{name.replace('-', '_')}_{int(metrics)}", BACKEND / name / 'index.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    if hasattr(module, 'result_cache'):
+        module.result_cache = module.MemoryResultCache(0)
+    return module
+
+def timed_us(module, params: Dict[str, str]) -> float:
+    event: Dict[str, Any] = {'httpMethod': 'GET', 'queryStringParameters': params}
+    started = time.perf_counter()
+    response = module.handler(event, None)
+    elapsed = (time.perf_counter() - started) * 1e6
+    assert response['statusCode'] == 200, response
+    return elapsed
+
+def main(rounds: int) -> None:
+    os.environ['SLOW_QUERY_MS'] = '1e9'
+    for name, events in EVENTS.items():
+        modules = {label: load_handler(name, label == 'on') for label in ('off', 'on')}
+        samples: Dict[str, List[float]] = {label: [] for label in modules}
+        with redirect_stdout(io.StringIO()):
+            for params in events:
+                for module in modules.values():
+                    timed_us(module, params)  # warm connections, prepared statements and lookups
+            for round_number in range(rounds):
+                order = list(modules.items())[::1 if round_number % 2 else -1]
+                for params in events:
+                    for label, module in order:
+                        samples[label].append(timed_us(module, params))
+        off, on = (statistics.median(samples[label]) for label in ('off', 'on'))
+        print(f'{name:>16}: metrics off {off:8.0f} us  on {on:8.0f} us  overhead {(on / off - 1) * 100:+.1f}% ({on - off:+.0f} us)')
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,157 @@
+'''
+Review submission under a burst: direct inserts versus the batched write-behind
+queue (REVIEW_INGEST_MODE=batched). Each run sends the same burst to one handler:
+most reviews target one popular profile and a share are resubmissions of the same
+(profile, authorPhone). It prints throughput and the Postgres connections and
+statements per review, then checks that every unique review was stored exactly
+once (batched) and that rating_sum/review_count match the stored reviews. The
+reviews written by the run are deleted and the aggregates restored afterwards.
+
+Usage: DATABASE_URL=postgres://... python benchmarks/review_ingestion.py [reviews] [workers]
+'''
+import importlib.util
+import io
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import psycopg2
+
+BACKEND = Path(__file__).resolve().parent.parent / 'backend'
+HANDLERS = {
+    'submit-model-review': ('modelId', 'models', 'model_reviews', 'model_id'),
+    'submit-photographer-review': ('photographerId', 'photographers', 'photographer_reviews', 'photographer_id'),
+}
+DUPLICATE_SHARE = 0.2
+POPULAR_SHARE = 0.8
+
+def load_handler(name: str, mode: str, queue_dir: str):
+    os.environ['REVIEW_INGEST_MODE'] = mode
+    os.environ['REVIEW_QUEUE_PATH'] = os.path.join(queue_dir, f'{name}.sqlite3')
+    spec = importlib.util.spec_from_file_location(f"{name.replace('-', '_')}_{mode}", BACKEND / name / 'index.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def burst(id_field: str, profile_ids: List[int], count: int, phone_prefix: str) -> List[Dict[str, Any]]:
+    rng = random.Random(7)
+    popular = profile_ids[0]
+    reviews: List[Dict[str, Any]] = []
+    for i in range(count):
+        if reviews and rng.random() < DUPLICATE_SHARE:
+            reviews.append(dict(rng.choice(reviews)))
+            continue
+        reviews.append({
+            id_field: popular if rng.random() < POPULAR_SHARE else rng.choice(profile_ids),
+            'authorName': 'Нагрузка', 'authorPhone': f'{phone_prefix}{i:06d}',
+            'rating': 1 + i % 5, 'reviewText': 'Отзыв из пакетного теста'
+        })
+    return reviews
+
+def stored(conn, table: str, column: str, profile_table: str, phone_prefix: str) -> Tuple[int, int]:
+    '''
+    (reviews stored by this run, profiles whose aggregates disagree with their reviews)
+    '''
+    with conn.cursor() as cur:
+        cur.execute(f'''
+            WITH touched AS (
+                SELECT DISTINCT {column} AS id FROM t_p16461725_model_photo_db.{table} WHERE author_phone LIKE %s
+            )
+            SELECT
+                (SELECT COUNT(*) FROM t_p16461725_model_photo_db.{table} WHERE author_phone LIKE %s),
+                (SELECT COUNT(*) FROM touched t
+                 JOIN t_p16461725_model_photo_db.{profile_table} p ON p.id = t.id
+                 CROSS JOIN LATERAL (
+                     SELECT COALESCE(SUM(rating), 0) AS rating_sum, COUNT(*) AS review_count
+                     FROM t_p16461725_model_photo_db.{table} r WHERE r.{column} = p.id
+                 ) actual
+                 WHERE p.rating_sum <> actual.rating_sum OR p.review_count <> actual.review_count)
+        ''', (phone_prefix + '%', phone_prefix + '%'))
+        result = cur.fetchone()
+    conn.rollback()
+    return result
+
+def cleanup(conn, table: str, column: str, profile_table: str, phone_prefix: str) -> None:
+    conn.rollback()
+    with conn.cursor() as cur:
+        cur.execute(f'''
+            WITH removed AS (
+                DELETE FROM t_p16461725_model_photo_db.{table} WHERE author_phone LIKE %s RETURNING {column} AS id
+            )
+            UPDATE t_p16461725_model_photo_db.{profile_table} p
+            SET rating_sum = r.rating_sum, review_count = r.review_count,
+                rating_avg = CASE WHEN r.review_count = 0 THEN 0 ELSE ROUND(r.rating_sum::numeric / r.review_count, 2) END
+            FROM (
+                SELECT d.id, COALESCE(SUM(x.rating), 0) AS rating_sum, COUNT(x.rating) AS review_count
+                FROM (SELECT DISTINCT id FROM removed) d
+                LEFT JOIN t_p16461725_model_photo_db.{table} x ON x.{column} = d.id AND x.author_phone NOT LIKE %s
+                GROUP BY d.id
+            ) r
+            WHERE p.id = r.id
+        ''', (phone_prefix + '%', phone_prefix + '%'))
+    conn.commit()
+
+def run(module, reviews: List[Dict[str, Any]], workers: int) -> Dict[str, Any]:
+    def submit(review: Dict[str, Any]) -> int:
+        event = {'httpMethod': 'POST', 'body': json.dumps(review, ensure_ascii=False)}
+        return module.handler(event, None)['statusCode']
+
+    output = io.StringIO()
+    with redirect_stdout(output):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            statuses = list(pool.map(submit, reviews))
+        elapsed = time.perf_counter() - started
+        if module.REVIEW_INGEST_MODE == 'batched':
+            module.handler({'httpMethod': 'POST', 'body': json.dumps({'flush': True})}, None)
+    log = output.getvalue()
+    return {
+        'seconds': elapsed,
+        'statuses': {status: statuses.count(status) for status in sorted(set(statuses))},
+        'connections': sum(int(n) for n in re.findall(r'\bconnects=(\d+)', log)),
+        'statements': sum(int(n) for n in re.findall(r'\bqueries=(\d+)', log)),
+        'flushes': log.count('review_flush rows='),
+    }
+
+def main(count: int, workers: int) -> int:
+    failed = False
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    with tempfile.TemporaryDirectory() as queue_dir:
+        for name, (id_field, profile_table, table, column) in HANDLERS.items():
+            with conn.cursor() as cur:
+                cur.execute(f'SELECT id FROM t_p16461725_model_photo_db.{profile_table} ORDER BY id LIMIT 200')
+                profile_ids = [row[0] for row in cur.fetchall()]
+            conn.rollback()
+            for mode in ('direct', 'batched'):
+                module = load_handler(name, mode, queue_dir)
+                module.DB_POOL_MAX_SIZE = workers
+                phone_prefix = f'+7997{int(time.time()) % 10000:04d}'
+                reviews = burst(id_field, profile_ids, count, phone_prefix)
+                unique = len({(review[id_field], review['authorPhone']) for review in reviews})
+                try:
+                    result = run(module, reviews, workers)
+                    rows, inconsistent = stored(conn, table, column, profile_table, phone_prefix)
+                finally:
+                    cleanup(conn, table, column, profile_table, phone_prefix)
+                expected = unique if mode == 'batched' else count
+                ok = rows == expected and inconsistent == 0
+                failed = failed or not ok
+                print(f"{'ok' if ok else 'FAIL':>4} {name:>26} {mode:>7}: {count / result['seconds']:7.0f} reviews/s  "
+                      f"{result['connections'] / count:5.3f} conn/review  {result['statements'] / count:5.2f} stmt/review  "
+                      f"stored {rows}/{expected}  flushes {result['flushes']}  statuses {result['statuses']}")
+    conn.close()
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 2000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    ))
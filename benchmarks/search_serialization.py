@@ -0,0 +1,107 @@
+'''
+Microbenchmark of the search-profiles response path: rows to items to JSON body,
+for 20, 100 and 1000-row pages, in microseconds per row. Compares the old dict-row
+path (RealDictCursor rows, datetime.now() per row, stdlib json.dumps) with the
+tuple-row item builders using the stdlib encoder and, if installed, orjson.
+
+Usage: python benchmarks/search_serialization.py [repeat]
+No database is needed; rows are synthetic.
+'''
+import importlib.util
+import json
+import sys
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+HANDLER_PATH = Path(__file__).resolve().parent.parent / 'backend' / 'search-profiles' / 'index.py'
+PAGE_SIZES = (20, 100, 1000)
+
+def load_handler():
+    spec = importlib.util.spec_from_file_location('search_profiles', HANDLER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def synthetic_rows(search, count: int) -> List[Tuple[Any, ...]]:
+    started = datetime(2024, 6, 1, 12, 0, 0, 250000)
+    rows = []
+    for i in range(count):
+        values = {
+            'id': i + 1,
+            'full_name': f'Анна Смирнова {i}',
+            'birth_date': date(1990 + i % 15, 1 + i % 12, 1 + i % 28),
+            'gender': 'Женщина',
+            'height': 160 + i % 30,
+            'city': 'Хабаровск',
+            'profile_photo_url': f'https://cdn.example.com/photos/{i}.jpg',
+            'openness_level': 'Портрет',
+            'cooperation_format': 'TFP',
+            'last_login': started - timedelta(minutes=i),
+            'rating_avg': Decimal('4.25'),
+            'review_count': i % 7,
+        }
+        rows.append(tuple(values[field] for field in search.MODEL_FIELDS))
+    return rows
+
+def legacy_body(rows: List[Dict[str, Any]]) -> str:
+    result = []
+    for model in rows:
+        age = None
+        if model['birth_date']:
+            today = datetime.now().date()
+            birth = model['birth_date']
+            age = today.year - birth.year - ((today.month, today.day) < (birth.month, birth.day))
+        result.append({
+            'id': model['id'],
+            'fullName': model['full_name'],
+            'age': age,
+            'height': model['height'],
+            'city': model['city'],
+            'gender': model['gender'],
+            'opennessLevel': model['openness_level'],
+            'cooperationFormat': model['cooperation_format'],
+            'profilePhotoUrl': model['profile_photo_url'],
+            'rating': float(model['rating_avg']) if model['review_count'] else None,
+            'reviewCount': model['review_count'],
+            'lastLogin': model['last_login'].isoformat() if model['last_login'] else None
+        })
+    return json.dumps({'profiles': result}, ensure_ascii=False)
+
+def current_body(search) -> Callable[[List[Tuple[Any, ...]]], str]:
+    def build(rows: List[Tuple[Any, ...]]) -> str:
+        today = date.today()
+        return search.dump_json({'profiles': [search.model_item(row, today) for row in rows]})
+    return build
+
+def per_row_us(build: Callable[[Any], str], rows: Any, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        build(rows)
+        best = min(best, time.perf_counter() - started)
+    return best / len(rows) * 1e6
+
+def main(repeat: int) -> None:
+    search = load_handler()
+    orjson = search.orjson
+    for size in PAGE_SIZES:
+        rows = synthetic_rows(search, size)
+        dict_rows = [dict(zip(search.MODEL_FIELDS, row)) for row in rows]
+        results = {'dict rows + json': per_row_us(legacy_body, dict_rows, repeat)}
+        search.orjson = None
+        results['tuple rows + json'] = per_row_us(current_body(search), rows, repeat)
+        if orjson is not None:
+            search.orjson = orjson
+            results['tuple rows + orjson'] = per_row_us(current_body(search), rows, repeat)
+            assert current_body(search)(rows) == json.dumps(
+                json.loads(current_body(search)(rows)), ensure_ascii=False, separators=(',', ':')
+            )
+        print(f'{size:>5} rows: ' + '  '.join(f'{label} {value:6.2f} us/row' for label, value in results.items()))
+    if orjson is None:
+        print('orjson is not installed; only the stdlib encoder was measured')
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
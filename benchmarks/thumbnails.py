@@ -0,0 +1,166 @@
+'''
+Thumbnail stage of register-model: bulk registrations whose profile photos are data:
+URLs, as the registration form sends them. Part of the photos repeat earlier uploads.
+Runs the stage once with THUMBNAIL_WORKERS=0 (rendered in the handler process) and
+once with the process pool, each into an empty store, and prints images per second
+and the cache hit rate taken from the handler's thumbnails log lines. Then the same
+photos are registered again under new phones, which should be all hits. Finally the
+first search page (keyset mode, so ties in last_login cannot reorder it) is checked
+with THUMBNAIL_BASE_URL=/thumbnails standing in for the served store: every new
+profile has thumbnailUrls whose files exist, and both render modes return the same
+body. Card image bytes are compared between originals and 160 px thumbnails.
+Profiles written by the run are deleted afterwards.
+
+Usage: DATABASE_URL=postgres://... python benchmarks/thumbnails.py [profiles] [repeat_share]
+Requires Pillow.
+'''
+import base64
+import importlib.util
+import io
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import Any, Dict, List
+
+import psycopg2
+from PIL import Image, ImageDraw
+
+BACKEND = Path(__file__).resolve().parent.parent / 'backend'
+PHONE_PREFIX = '+7995'
+BATCH = 50
+
+def load_handler(name: str, label: str, **env: str):
+    os.environ.update(env)
+    module_name = f"{name.replace('-', '_')}_{label}"
+    spec = importlib.util.spec_from_file_location(module_name, BACKEND / name / 'index.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    if hasattr(module, 'result_cache'):
+        module.result_cache = module.MemoryResultCache(0)
+    return module
+
+def load_pooled_handler(name: str, **env: str):
+    '''
+    The handler imported as index from its directory, as the function runtime does:
+    spawned pool workers unpickle render_thumbnails by importing its module by name.
+    '''
+    os.environ.update(env)
+    sys.path.insert(0, str(BACKEND / name))
+    import index
+    return index
+
+def photo(seed: int) -> str:
+    '''
+    A 1600x2400 JPEG with some structure (gradient, shapes, noise), roughly the size
+    of a phone photo after the browser has read it.
+    '''
+    rng = random.Random(seed)
+    image = Image.linear_gradient('L').resize((1600, 2400)).convert('RGB')
+    draw = ImageDraw.Draw(image)
+    for _ in range(40):
+        x, y = rng.randrange(1600), rng.randrange(2400)
+        draw.ellipse((x, y, x + rng.randrange(50, 600), y + rng.randrange(50, 600)),
+                     fill=(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    image = Image.blend(image, Image.effect_noise((1600, 2400), 40).convert('RGB'), 0.25)
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=88)
+    return 'data:image/jpeg;base64,' + base64.b64encode(buffer.getvalue()).decode()
+
+def profiles(photos: List[str], phone_block: int) -> List[Dict[str, Any]]:
+    return [{
+        'fullName': 'Миниатюра Тестовая', 'phone': f'{PHONE_PREFIX}{phone_block}{i:06d}', 'birthDate': '2000-01-01',
+        'gender': 'Женщина', 'city': 'Хабаровск', 'profilePhotoUrl': url
+    } for i, url in enumerate(photos)]
+
+def register(module, batch: List[Dict[str, Any]]) -> Dict[str, float]:
+    output = io.StringIO()
+    with redirect_stdout(output):
+        started = time.perf_counter()
+        for offset in range(0, len(batch), BATCH):
+            response = module.handler({'httpMethod': 'POST', 'body': json.dumps(batch[offset:offset + BATCH])}, None)
+            assert response['statusCode'] == 200, response
+        elapsed = time.perf_counter() - started
+    stats = {'seconds': elapsed, 'hits': 0, 'generated': 0, 'failed': 0, 'render_ms': 0.0}
+    for line in output.getvalue().splitlines():
+        if line.startswith('thumbnails '):
+            fields = dict(re.findall(r'(\w+)=([\d.]+)', line))
+            for key in ('hits', 'generated', 'failed'):
+                stats[key] += int(fields[key])
+            stats['render_ms'] += float(fields['ms'])
+    return stats
+
+def report(label: str, stats: Dict[str, float]) -> None:
+    images = stats['hits'] + stats['generated'] + stats['failed']
+    print(f"{label:>22}: {stats['generated'] / (stats['render_ms'] / 1000) if stats['generated'] else 0:6.1f} images/s  "
+          f"hit rate {stats['hits'] / images if images else 0:.2f}  generated {stats['generated']:.0f}  "
+          f"failed {stats['failed']:.0f}  {stats['seconds']:.2f} s end to end")
+
+def check_search(conn, store: Path, count: int) -> int:
+    problems = 0
+    bodies = {}
+    for mode in ('python', 'postgres'):
+        search = load_handler('search-profiles', mode, SEARCH_RENDER_MODE=mode, THUMBNAIL_BASE_URL='/thumbnails')
+        with redirect_stdout(io.StringIO()):
+            response = search.handler({'httpMethod': 'GET', 'queryStringParameters': {'type': 'model', 'cursor': ''}}, None)
+        bodies[mode] = response['body']
+    problems += bodies['python'] != bodies['postgres']
+    cards = [card for card in json.loads(bodies['python'])['profiles'] if card['fullName'] == 'Миниатюра Тестовая']
+    original_bytes = thumbnail_bytes = 0
+    for card in cards:
+        urls = card['thumbnailUrls'] or {}
+        files = [store / url.split('/thumbnails/', 1)[1] for url in urls.values()]
+        problems += len(files) != 2 or not all(path.exists() for path in files)
+        original_bytes += len(base64.b64decode(card['profilePhotoUrl'].split(',', 1)[1]))
+        thumbnail_bytes += files[0].stat().st_size if files else 0
+    print(f"search page: {len(cards)} new cards, render modes {'match' if bodies['python'] == bodies['postgres'] else 'DIFFER'}, "
+          f"card images {original_bytes / 2**20:.1f} MiB as originals vs {thumbnail_bytes / 2**10:.0f} KiB as 160 px thumbnails")
+    with conn.cursor() as cur:
+        cur.execute('SELECT COUNT(*), COUNT(thumbnail_key) FROM t_p16461725_model_photo_db.models WHERE phone LIKE %s',
+                    (PHONE_PREFIX + '%',))
+        stored, with_key = cur.fetchone()
+    conn.rollback()
+    problems += stored != count or with_key != count
+    print(f'stored {stored} profiles, {with_key} with a thumbnail key')
+    return problems
+
+def main(count: int, repeat_share: float) -> int:
+    rng = random.Random(11)
+    started = time.perf_counter()
+    distinct = [photo(seed) for seed in range(int(count * (1 - repeat_share)))]
+    photos = distinct + [rng.choice(distinct) for _ in range(count - len(distinct))]
+    rng.shuffle(photos)
+    print(f'{count} photos ({len(distinct)} distinct, {sum(len(url) for url in photos) * 3 / 4 / len(photos) / 1024:.0f} KiB '
+          f'on average) prepared in {time.perf_counter() - started:.1f} s, {os.cpu_count()} CPUs')
+
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    problems = 0
+    try:
+        with tempfile.TemporaryDirectory() as inline_dir, tempfile.TemporaryDirectory() as pool_dir:
+            inline = load_handler('register-model', 'inline', THUMBNAIL_WORKERS='0', THUMBNAIL_DIR=inline_dir)
+            report('in handler process', register(inline, profiles(photos, 0)))
+            pooled = load_pooled_handler('register-model', THUMBNAIL_WORKERS=str(os.cpu_count()), THUMBNAIL_DIR=pool_dir)
+            report(f'process pool ({os.cpu_count()})', register(pooled, profiles(photos, 1)))
+            again = register(pooled, profiles(photos, 2))
+            report('registered again', again)
+            problems += again['generated'] != 0
+            problems += check_search(conn, Path(pool_dir), count * 3)
+    finally:
+        conn.rollback()
+        with conn.cursor() as cur:
+            cur.execute('DELETE FROM t_p16461725_model_photo_db.models WHERE phone LIKE %s', (PHONE_PREFIX + '%',))
+        conn.commit()
+        conn.close()
+    print(f'{problems} problem(s)')
+    return 1 if problems else 0
+
+if __name__ == '__main__':
+    sys.exit(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 100,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 0.3
+    ))
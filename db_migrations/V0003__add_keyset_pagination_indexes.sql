@@ -0,0 +1,3 @@
+-- Индексы под keyset-пагинацию (ORDER BY last_login DESC NULLS LAST, id DESC)
+CREATE INDEX IF NOT EXISTS idx_models_last_login_id ON t_p16461725_model_photo_db.models(last_login DESC NULLS LAST, id DESC);
+CREATE INDEX IF NOT EXISTS idx_photographers_last_login_id ON t_p16461725_model_photo_db.photographers(last_login DESC NULLS LAST, id DESC);
@@ -0,0 +1,5 @@
+-- Триграммный поиск по имени (ILIKE '%...%' и нечёткое совпадение через %)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_models_full_name_trgm ON t_p16461725_model_photo_db.models USING GIN (full_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_photographers_full_name_trgm ON t_p16461725_model_photo_db.photographers USING GIN (full_name gin_trgm_ops);
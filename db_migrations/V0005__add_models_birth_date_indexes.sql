@@ -0,0 +1,3 @@
+-- Фильтр по возрасту через диапазон birth_date
+CREATE INDEX IF NOT EXISTS idx_models_birth_date ON t_p16461725_model_photo_db.models(birth_date) WHERE is_blocked = FALSE;
+CREATE INDEX IF NOT EXISTS idx_models_city_gender_birth_date ON t_p16461725_model_photo_db.models(city, gender, birth_date) WHERE is_blocked = FALSE;
@@ -0,0 +1,11 @@
+-- Частичные составные индексы под реальные запросы поиска:
+-- is_blocked = FALSE AND city = ? [AND gender = ?] ORDER BY last_login DESC NULLS LAST, id DESC
+CREATE INDEX IF NOT EXISTS idx_models_active_last_login ON t_p16461725_model_photo_db.models(last_login DESC NULLS LAST, id DESC) WHERE is_blocked = FALSE;
+CREATE INDEX IF NOT EXISTS idx_models_active_city_last_login ON t_p16461725_model_photo_db.models(city, last_login DESC NULLS LAST, id DESC) WHERE is_blocked = FALSE;
+CREATE INDEX IF NOT EXISTS idx_models_active_city_gender_last_login ON t_p16461725_model_photo_db.models(city, gender, last_login DESC NULLS LAST, id DESC) WHERE is_blocked = FALSE;
+
+CREATE INDEX IF NOT EXISTS idx_photographers_active_last_login ON t_p16461725_model_photo_db.photographers(last_login DESC NULLS LAST, id DESC) WHERE is_blocked = FALSE;
+CREATE INDEX IF NOT EXISTS idx_photographers_active_city_last_login ON t_p16461725_model_photo_db.photographers(city, last_login DESC NULLS LAST, id DESC) WHERE is_blocked = FALSE;
+
+-- Фильтр по специализации фотографа (specializations @> ARRAY[?])
+CREATE INDEX IF NOT EXISTS idx_photographers_specializations ON t_p16461725_model_photo_db.photographers USING GIN (specializations) WHERE is_blocked = FALSE;
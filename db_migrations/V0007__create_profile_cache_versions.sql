@@ -0,0 +1,9 @@
+-- Счётчики версий для инвалидации кэша результатов поиска
+CREATE TABLE IF NOT EXISTS t_p16461725_model_photo_db.profile_cache_versions (
+    profile_type VARCHAR(20) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT INTO t_p16461725_model_photo_db.profile_cache_versions (profile_type, version)
+VALUES ('model', 0), ('photographer', 0)
+ON CONFLICT (profile_type) DO NOTHING;
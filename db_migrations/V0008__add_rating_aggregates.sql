@@ -0,0 +1,37 @@
+-- Денормализованный рейтинг профилей (обновляется при добавлении отзыва)
+ALTER TABLE t_p16461725_model_photo_db.models
+    ADD COLUMN IF NOT EXISTS rating_sum INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS review_count INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS rating_avg NUMERIC(3,2) NOT NULL DEFAULT 0;
+
+ALTER TABLE t_p16461725_model_photo_db.photographers
+    ADD COLUMN IF NOT EXISTS rating_sum INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS review_count INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS rating_avg NUMERIC(3,2) NOT NULL DEFAULT 0;
+
+-- Заполняем по уже существующим отзывам
+UPDATE t_p16461725_model_photo_db.models m
+SET rating_sum = r.rating_sum,
+    review_count = r.review_count,
+    rating_avg = ROUND(r.rating_sum::numeric / r.review_count, 2)
+FROM (
+    SELECT model_id, SUM(rating) AS rating_sum, COUNT(*) AS review_count
+    FROM t_p16461725_model_photo_db.model_reviews
+    GROUP BY model_id
+) r
+WHERE m.id = r.model_id;
+
+UPDATE t_p16461725_model_photo_db.photographers p
+SET rating_sum = r.rating_sum,
+    review_count = r.review_count,
+    rating_avg = ROUND(r.rating_sum::numeric / r.review_count, 2)
+FROM (
+    SELECT photographer_id, SUM(rating) AS rating_sum, COUNT(*) AS review_count
+    FROM t_p16461725_model_photo_db.photographer_reviews
+    GROUP BY photographer_id
+) r
+WHERE p.id = r.photographer_id;
+
+-- Сортировка по рейтингу (sort=rating)
+CREATE INDEX IF NOT EXISTS idx_models_active_rating ON t_p16461725_model_photo_db.models(rating_avg DESC, review_count DESC, last_login DESC NULLS LAST) WHERE is_blocked = FALSE;
+CREATE INDEX IF NOT EXISTS idx_photographers_active_rating ON t_p16461725_model_photo_db.photographers(rating_avg DESC, review_count DESC, last_login DESC NULLS LAST) WHERE is_blocked = FALSE;
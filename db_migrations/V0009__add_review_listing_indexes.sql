@@ -0,0 +1,4 @@
+-- Лента отзывов профиля: WHERE model_id = ? ORDER BY created_at DESC, id DESC
+-- rating в INCLUDE позволяет строить гистограмму оценок index-only сканом
+CREATE INDEX IF NOT EXISTS idx_model_reviews_model_created ON t_p16461725_model_photo_db.model_reviews(model_id, created_at DESC, id DESC) INCLUDE (rating);
+CREATE INDEX IF NOT EXISTS idx_photographer_reviews_photographer_created ON t_p16461725_model_photo_db.photographer_reviews(photographer_id, created_at DESC, id DESC) INCLUDE (rating);
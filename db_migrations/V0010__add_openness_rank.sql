@@ -0,0 +1,21 @@
+-- Уровни откровенности съёмки по возрастанию (общий список для регистрации и поиска)
+CREATE TABLE IF NOT EXISTS t_p16461725_model_photo_db.openness_levels (
+    rank SMALLINT PRIMARY KEY,
+    label VARCHAR(50) NOT NULL UNIQUE
+);
+
+INSERT INTO t_p16461725_model_photo_db.openness_levels (rank, label)
+VALUES (1, 'Портрет'), (2, 'Купальник'), (3, 'Бельё'), (4, 'Гламур'),
+       (5, 'Эротика'), (6, 'Ню'), (7, 'Метарт'), (8, 'Порно')
+ON CONFLICT (rank) DO NOTHING;
+
+-- Ранг уровня у модели: фильтр «не ниже уровня» становится диапазоном openness_rank >= ?
+ALTER TABLE t_p16461725_model_photo_db.models
+    ADD COLUMN IF NOT EXISTS openness_rank SMALLINT;
+
+UPDATE t_p16461725_model_photo_db.models m
+SET openness_rank = l.rank
+FROM t_p16461725_model_photo_db.openness_levels l
+WHERE l.label = m.openness_level AND m.openness_rank IS DISTINCT FROM l.rank;
+
+CREATE INDEX IF NOT EXISTS idx_models_active_openness_rank ON t_p16461725_model_photo_db.models(openness_rank, last_login DESC NULLS LAST, id DESC) WHERE is_blocked = FALSE;
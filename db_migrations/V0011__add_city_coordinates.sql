@@ -0,0 +1,135 @@
+-- Справочник городов с координатами для поиска «рядом со мной»
+CREATE TABLE IF NOT EXISTS t_p16461725_model_photo_db.cities (
+    name VARCHAR(100) PRIMARY KEY,
+    latitude DOUBLE PRECISION NOT NULL,
+    longitude DOUBLE PRECISION NOT NULL
+);
+
+INSERT INTO t_p16461725_model_photo_db.cities (name, latitude, longitude)
+VALUES
+    ('Абакан', 53.72, 91.44),
+    ('Азов', 47.11, 39.42),
+    ('Анапа', 44.89, 37.32),
+    ('Архангельск', 64.54, 40.54),
+    ('Астрахань', 46.35, 48.04),
+    ('Барнаул', 53.35, 83.78),
+    ('Белгород', 50.60, 36.59),
+    ('Благовещенск', 50.29, 127.53),
+    ('Брянск', 53.24, 34.36),
+    ('Великий Новгород', 58.52, 31.27),
+    ('Владивосток', 43.12, 131.89),
+    ('Владимир', 56.13, 40.41),
+    ('Волгоград', 48.71, 44.51),
+    ('Вологда', 59.22, 39.89),
+    ('Воронеж', 51.66, 39.20),
+    ('Екатеринбург', 56.84, 60.61),
+    ('Иваново', 57.00, 40.97),
+    ('Ижевск', 56.85, 53.20),
+    ('Иркутск', 52.29, 104.28),
+    ('Йошкар-Ола', 56.63, 47.89),
+    ('Казань', 55.79, 49.12),
+    ('Калининград', 54.71, 20.51),
+    ('Калуга', 54.51, 36.26),
+    ('Кемерово', 55.35, 86.09),
+    ('Киров', 58.60, 49.66),
+    ('Краснодар', 45.04, 38.98),
+    ('Красноярск', 56.01, 92.87),
+    ('Курск', 51.73, 36.19),
+    ('Липецк', 52.61, 39.59),
+    ('Магадан', 59.57, 150.80),
+    ('Магнитогорск', 53.41, 58.98),
+    ('Махачкала', 42.98, 47.50),
+    ('Москва', 55.76, 37.62),
+    ('Мурманск', 68.97, 33.07),
+    ('Набережные Челны', 55.74, 52.41),
+    ('Нижний Новгород', 56.33, 44.00),
+    ('Новокузнецк', 53.76, 87.12),
+    ('Новосибирск', 55.03, 82.92),
+    ('Омск', 54.99, 73.37),
+    ('Оренбург', 51.77, 55.10),
+    ('Орёл', 52.97, 36.07),
+    ('Пенза', 53.20, 45.00),
+    ('Пермь', 58.01, 56.25),
+    ('Петрозаводск', 61.79, 34.36),
+    ('Псков', 57.82, 28.33),
+    ('Ростов-на-Дону', 47.24, 39.71),
+    ('Рязань', 54.63, 39.74),
+    ('Самара', 53.20, 50.15),
+    ('Санкт-Петербург', 59.94, 30.31),
+    ('Саранск', 54.19, 45.18),
+    ('Саратов', 51.53, 46.03),
+    ('Севастополь', 44.62, 33.52),
+    ('Симферополь', 44.95, 34.10),
+    ('Смоленск', 54.78, 32.04),
+    ('Сочи', 43.60, 39.73),
+    ('Ставрополь', 45.04, 41.97),
+    ('Сургут', 61.25, 73.40),
+    ('Тамбов', 52.72, 41.45),
+    ('Тверь', 56.86, 35.91),
+    ('Тольятти', 53.51, 49.42),
+    ('Томск', 56.48, 84.95),
+    ('Тула', 54.19, 37.62),
+    ('Тюмень', 57.15, 65.53),
+    ('Улан-Удэ', 51.83, 107.58),
+    ('Ульяновск', 54.31, 48.40),
+    ('Уфа', 54.74, 55.97),
+    ('Хабаровск', 48.48, 135.08),
+    ('Чебоксары', 56.15, 47.25),
+    ('Челябинск', 55.16, 61.40),
+    ('Чита', 52.03, 113.50),
+    ('Южно-Сахалинск', 46.96, 142.73),
+    ('Якутск', 62.03, 129.73),
+    ('Ярославль', 57.63, 39.87),
+    ('Комсомольск-на-Амуре', 50.55, 137.01),
+    ('Амурск', 50.23, 136.89),
+    ('Бикин', 46.82, 134.26),
+    ('Вяземский', 47.53, 134.75),
+    ('Биробиджан', 48.79, 132.92),
+    ('Николаевск-на-Амуре', 53.14, 140.72),
+    ('Советская Гавань', 48.97, 140.29),
+    ('Уссурийск', 43.80, 131.95),
+    ('Артём', 43.35, 132.19),
+    ('Находка', 42.82, 132.87),
+    ('Подольск', 55.43, 37.54),
+    ('Химки', 55.89, 37.43),
+    ('Балашиха', 55.80, 37.94),
+    ('Мытищи', 55.91, 37.73),
+    ('Гатчина', 59.57, 30.13),
+    ('Энгельс', 51.50, 46.12),
+    ('Новочеркасск', 47.42, 40.09),
+    ('Таганрог', 47.21, 38.94),
+    ('Новороссийск', 44.72, 37.77),
+    ('Стерлитамак', 53.63, 55.95),
+    ('Нижний Тагил', 57.91, 59.97),
+    ('Бердск', 54.76, 83.10),
+    ('Ангарск', 52.54, 103.89)
+ON CONFLICT (name) DO NOTHING;
+
+-- Координаты профиля (по городу на момент регистрации)
+ALTER TABLE t_p16461725_model_photo_db.models
+    ADD COLUMN IF NOT EXISTS latitude DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS longitude DOUBLE PRECISION;
+
+ALTER TABLE t_p16461725_model_photo_db.photographers
+    ADD COLUMN IF NOT EXISTS latitude DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS longitude DOUBLE PRECISION;
+
+-- Город сравнивается так же, как city_key() в обработчиках: без пробелов по краям, без учёта регистра, ё = е.
+-- lower() переводит кириллицу в нижний регистр только при UTF-8 LC_CTYPE, поэтому она сворачивается через translate().
+UPDATE t_p16461725_model_photo_db.models m
+SET latitude = c.latitude, longitude = c.longitude
+FROM t_p16461725_model_photo_db.cities c
+WHERE translate(lower(btrim(c.name, E' \t\r\n')), 'АБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯё', 'абвгдеежзийклмнопрстуфхцчшщъыьэюяе')
+    = translate(lower(btrim(m.city, E' \t\r\n')), 'АБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯё', 'абвгдеежзийклмнопрстуфхцчшщъыьэюяе')
+  AND m.latitude IS NULL;
+
+UPDATE t_p16461725_model_photo_db.photographers p
+SET latitude = c.latitude, longitude = c.longitude
+FROM t_p16461725_model_photo_db.cities c
+WHERE translate(lower(btrim(c.name, E' \t\r\n')), 'АБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯё', 'абвгдеежзийклмнопрстуфхцчшщъыьэюяе')
+    = translate(lower(btrim(p.city, E' \t\r\n')), 'АБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯё', 'абвгдеежзийклмнопрстуфхцчшщъыьэюяе')
+  AND p.latitude IS NULL;
+
+-- Поиск в радиусе: point(longitude, latitude) <@ box(...) через встроенный GiST
+CREATE INDEX IF NOT EXISTS idx_models_active_location ON t_p16461725_model_photo_db.models USING GIST (point(longitude, latitude)) WHERE is_blocked = FALSE;
+CREATE INDEX IF NOT EXISTS idx_photographers_active_location ON t_p16461725_model_photo_db.photographers USING GIST (point(longitude, latitude)) WHERE is_blocked = FALSE;
@@ -0,0 +1,25 @@
+-- updated_at обновляется при любом изменении профиля (регистрация, отзыв, блокировка),
+-- чтобы колоночный индекс поиска мог дочитывать только изменённые строки
+CREATE OR REPLACE FUNCTION t_p16461725_model_photo_db.touch_updated_at() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at := now();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS models_touch_updated_at ON t_p16461725_model_photo_db.models;
+CREATE TRIGGER models_touch_updated_at
+    BEFORE UPDATE ON t_p16461725_model_photo_db.models
+    FOR EACH ROW EXECUTE FUNCTION t_p16461725_model_photo_db.touch_updated_at();
+
+DROP TRIGGER IF EXISTS photographers_touch_updated_at ON t_p16461725_model_photo_db.photographers;
+CREATE TRIGGER photographers_touch_updated_at
+    BEFORE UPDATE ON t_p16461725_model_photo_db.photographers
+    FOR EACH ROW EXECUTE FUNCTION t_p16461725_model_photo_db.touch_updated_at();
+
+UPDATE t_p16461725_model_photo_db.models SET updated_at = CURRENT_TIMESTAMP WHERE updated_at IS NULL;
+UPDATE t_p16461725_model_photo_db.photographers SET updated_at = CURRENT_TIMESTAMP WHERE updated_at IS NULL;
+
+-- Инкрементальное обновление индекса: WHERE updated_at > водяной знак
+CREATE INDEX IF NOT EXISTS idx_models_updated_at ON t_p16461725_model_photo_db.models (updated_at);
+CREATE INDEX IF NOT EXISTS idx_photographers_updated_at ON t_p16461725_model_photo_db.photographers (updated_at);
@@ -0,0 +1,3 @@
+-- Проверка дублей при пакетной записи отзывов: WHERE model_id = ? AND author_phone = ?
+CREATE INDEX IF NOT EXISTS idx_model_reviews_model_author ON t_p16461725_model_photo_db.model_reviews(model_id, author_phone);
+CREATE INDEX IF NOT EXISTS idx_photographer_reviews_photographer_author ON t_p16461725_model_photo_db.photographer_reviews(photographer_id, author_phone);
@@ -0,0 +1,7 @@
+-- Адрес миниатюр фото профиля (sha256 исходного изображения и параметров),
+-- файлы лежат в хранилище миниатюр как <ключ>/<размер>.webp
+ALTER TABLE t_p16461725_model_photo_db.models
+    ADD COLUMN IF NOT EXISTS thumbnail_key VARCHAR(64);
+
+ALTER TABLE t_p16461725_model_photo_db.photographers
+    ADD COLUMN IF NOT EXISTS thumbnail_key VARCHAR(64);
@@ -0,0 +1,4 @@
+-- Полные keyset-индексы из V0003 дублируют частичные из V0006: все запросы поиска
+-- содержат is_blocked = FALSE и читают idx_*_active_last_login
+DROP INDEX IF EXISTS t_p16461725_model_photo_db.idx_models_last_login_id;
+DROP INDEX IF EXISTS t_p16461725_model_photo_db.idx_photographers_last_login_id;
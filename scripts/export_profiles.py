@@ -0,0 +1,45 @@
+'''
+Export every model or photographer matching the search-profiles filters as NDJSON
+or CSV, without the row cap of the HTTP export. Uses the handler's own filter and
+streaming code, so memory stays flat for any number of rows. Throughput is
+reported on stderr.
+
+Usage: DATABASE_URL=postgres://... python scripts/export_profiles.py model|photographer ndjson|csv [filter=value ...] > out
+Example: python scripts/export_profiles.py model csv city=Хабаровск opennessLevel=Ню > models.csv
+'''
+import importlib.util
+import os
+import sys
+from contextlib import redirect_stdout
+from pathlib import Path
+
+HANDLER_PATH = Path(__file__).resolve().parent.parent / 'backend' / 'search-profiles' / 'index.py'
+
+def load_handler():
+    spec = importlib.util.spec_from_file_location('search_profiles', HANDLER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def main(argv) -> int:
+    if len(argv) < 2 or argv[0] not in ('model', 'photographer'):
+        print(__doc__, file=sys.stderr)
+        return 2
+    profile_type, export_format = argv[0], argv[1]
+    params = dict(arg.split('=', 1) for arg in argv[2:])
+
+    search = load_handler()
+    if export_format not in search.EXPORT_FORMATS:
+        print(f'Unknown format {export_format}, expected one of {", ".join(search.EXPORT_FORMATS)}', file=sys.stderr)
+        return 2
+    conn = search.load_driver().connect(os.environ['DATABASE_URL'])
+    out = sys.stdout
+    try:
+        with redirect_stdout(sys.stderr):
+            search.export_profiles(conn, profile_type, params, export_format, out.write)
+    finally:
+        conn.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
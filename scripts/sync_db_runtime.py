@@ -0,0 +1,80 @@
+'''
+Copy the shared code in shared/ into the handlers in backend/ that use it: the
+database runtime into every handler, the other fragments into the handlers listed in
+FRAGMENTS. Each handler carries the code between the fragment's markers because its
+cloud function is deployed from its own directory. Run this after editing a shared
+file, and with --check before deploying: it rewrites nothing and exits non-zero if
+any handler's copy differs from the source or a handler lacks the markers.
+
+Usage: python scripts/sync_db_runtime.py [--check]
+'''
+import ast
+import sys
+from pathlib import Path
+from typing import List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+SHARED = ROOT / 'shared'
+HANDLERS = sorted((ROOT / 'backend').glob('*/index.py'))
+# shared file -> names of the handlers that carry it (None: every handler)
+FRAGMENTS = {
+    'db_runtime.py': None,
+    'thumbnails.py': ('register-model', 'register-photographer'),
+    'reference_data.py': ('search-profiles', 'register-model', 'register-photographer'),
+}
+
+def markers(source: str) -> Tuple[str, str]:
+    label = source[:-len('.py')].replace('_', ' ')
+    return (f'# --- {label}: copied from shared/{source} by scripts/sync_db_runtime.py, edit it there ---\n',
+            f'# --- end of {label} ---\n')
+
+def fragment_code(source: str) -> str:
+    '''
+    The shared source without its module docstring, which describes the file
+    rather than the handler it is copied into.
+    '''
+    text = (SHARED / source).read_text(encoding='utf-8')
+    docstring = ast.parse(text).body[0]
+    lines = text.splitlines(keepends=True)[docstring.end_lineno:]
+    return ''.join(lines).lstrip('\n')
+
+def synced(handler: str, code: str, begin: str, end: str) -> str:
+    start = handler.index(begin) + len(begin)
+    stop = handler.index(end, start)
+    return handler[:start] + code + handler[stop:]
+
+def main(argv: List[str]) -> int:
+    check = '--check' in argv
+    stale = copies = 0
+    for source, names in FRAGMENTS.items():
+        code = fragment_code(source)
+        begin, end = markers(source)
+        for path in HANDLERS:
+            name = path.parent.name
+            handler = path.read_text(encoding='utf-8')
+            if names is not None and name not in names:
+                if begin in handler:
+                    print(f'{name}: carries shared/{source} but is not listed for it in FRAGMENTS')
+                    stale += 1
+                continue
+            try:
+                updated = synced(handler, code, begin, end)
+            except ValueError:
+                print(f'{name}: no markers for shared/{source}')
+                stale += 1
+                continue
+            if updated == handler:
+                copies += 1
+                continue
+            stale += 1
+            if check:
+                print(f'{name}: copy of shared/{source} differs from the source')
+            else:
+                path.write_text(updated, encoding='utf-8')
+                print(f'{name}: copy of shared/{source} updated')
+    if check:
+        print(f'{copies} shared copies in sync, {stale} problem(s)')
+    return 1 if check and stale else 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,56 @@
+'''
+Reference data shared by search-profiles, register-model and register-photographer:
+the openness level ranks and the cities gazetteer with the city_key normalization
+that profile cities and search params are matched by, so registration and search
+cannot disagree about a level or a city.
+scripts/sync_db_runtime.py copies this code into each of those index.py files; edit
+it here, never in a handler. It relies on the handler's imports.
+'''
+OPENNESS_LEVELS_SQL = 'SELECT label, rank FROM t_p16461725_model_photo_db.openness_levels'
+_openness_ranks: Dict[str, int] = {}
+
+def openness_ranks(conn) -> Dict[str, int]:
+    '''
+    Openness level label -> rank from the openness_levels table, the one list shared
+    by register-model and search-profiles. Loaded once per container.
+    '''
+    if not _openness_ranks:
+        with conn.cursor() as cur:
+            cur.execute(OPENNESS_LEVELS_SQL)
+            _openness_ranks.update(cur.fetchall())
+    return _openness_ranks
+
+async def openness_ranks_async(conn) -> Dict[str, int]:
+    if not _openness_ranks:
+        async with conn.cursor() as cur:
+            await cur.execute(OPENNESS_LEVELS_SQL)
+            _openness_ranks.update(await cur.fetchall())
+    return _openness_ranks
+
+def city_key(name: str) -> str:
+    '''
+    Gazetteer key of a city name; db_migrations/V0011 backfills coordinates with the
+    same fold written in SQL.
+    '''
+    return name.strip().lower().replace('ё', 'е')
+
+CITIES_SQL = 'SELECT name, latitude, longitude FROM t_p16461725_model_photo_db.cities'
+_city_coordinates: Dict[str, Tuple[float, float]] = {}
+
+def city_coordinates(conn) -> Dict[str, Tuple[float, float]]:
+    '''
+    Gazetteer from the cities table keyed by city_key(name): (latitude, longitude).
+    Loaded once per container.
+    '''
+    if not _city_coordinates:
+        with conn.cursor() as cur:
+            cur.execute(CITIES_SQL)
+            _city_coordinates.update((city_key(name), (latitude, longitude)) for name, latitude, longitude in cur.fetchall())
+    return _city_coordinates
+
+async def city_coordinates_async(conn) -> Dict[str, Tuple[float, float]]:
+    if not _city_coordinates:
+        async with conn.cursor() as cur:
+            await cur.execute(CITIES_SQL)
+            _city_coordinates.update((city_key(name), (latitude, longitude)) for name, latitude, longitude in await cur.fetchall())
+    return _city_coordinates
@@ -0,0 +1,178 @@
+'''
+Thumbnail stage of register-model and register-photographer: profile photos sent as
+data: URLs are rendered once per distinct image into WebP thumbnails, written to
+thumbnail_store and referenced from the profile row by thumbnail_key. The handlers
+are deployed from their own directories, so scripts/sync_db_runtime.py copies this
+code into both index.py files; edit it here, never in a handler. It relies on the
+handler's Image global and imports.
+'''
+THUMBNAIL_SIZES = tuple(int(size) for size in os.environ.get('THUMBNAIL_SIZES', '160,480').split(','))
+THUMBNAIL_QUALITY = int(os.environ.get('THUMBNAIL_QUALITY', '80'))
+THUMBNAIL_DIR = os.environ.get('THUMBNAIL_DIR', '')  # persistent directory served at search-profiles' THUMBNAIL_BASE_URL
+# 0 renders in the handler process; set it to the CPU count on multi-core containers
+THUMBNAIL_WORKERS = int(os.environ.get('THUMBNAIL_WORKERS', '0'))
+THUMBNAIL_MAX_SOURCE_BYTES = 10 * 2**20
+THUMBNAIL_MAX_PIXELS = 40_000_000
+
+_thumbnail_pool = None
+_thumbnail_pool_lock = threading.Lock()
+_thumbnail_stats: Dict[str, int] = {'hits': 0, 'generated': 0, 'failed': 0}
+
+class LocalThumbnailStore:
+    '''
+    Thumbnails as files under root named <key>/<size>.webp; search-profiles builds
+    their URLs from THUMBNAIL_BASE_URL, so root must be persistent storage served at
+    that URL (a mounted bucket, not the function's /tmp). Any object with the same
+    exists/put methods (e.g. an object storage client) can be assigned to
+    thumbnail_store instead.
+    '''
+    def __init__(self, root: str):
+        self.root = root
+
+    def exists(self, name: str) -> bool:
+        return os.path.exists(os.path.join(self.root, name))
+
+    def put(self, name: str, data: bytes) -> None:
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial = f'{path}.{os.getpid()}.{threading.get_ident()}.part'
+        with open(partial, 'wb') as f:
+            f.write(data)
+        os.replace(partial, path)
+
+# None turns the thumbnail stage off: profiles are stored without a thumbnail key
+thumbnail_store = LocalThumbnailStore(THUMBNAIL_DIR) if THUMBNAIL_DIR else None
+
+def load_pillow():
+    '''
+    Pillow is an optional dependency of the thumbnail stage; without it profiles are
+    stored without a thumbnail key and search returns thumbnailUrls: null.
+    '''
+    global Image
+    if Image is None:
+        try:
+            from PIL import Image
+        except ImportError:
+            return None
+    return Image
+
+def thumbnail_pool() -> ProcessPoolExecutor:
+    '''
+    Workers are spawned, not forked: the handler process already runs the pool lock,
+    the async event loop and the review flush timers, and a forked child would
+    inherit their locks in whatever state they were in. Spawned workers import the
+    handler module afresh by name.
+    '''
+    global _thumbnail_pool
+    with _thumbnail_pool_lock:
+        if _thumbnail_pool is None:
+            _thumbnail_pool = ProcessPoolExecutor(max_workers=THUMBNAIL_WORKERS,
+                                                  mp_context=multiprocessing.get_context('spawn'))
+        return _thumbnail_pool
+
+def discard_thumbnail_pool() -> None:
+    global _thumbnail_pool
+    with _thumbnail_pool_lock:
+        _thumbnail_pool = None
+
+def decode_data_url(url: Any) -> Optional[bytes]:
+    '''
+    Image bytes of a data:image/...;base64 URL (what the registration form sends),
+    or None for anything else, including remote URLs, which are never fetched.
+    '''
+    if not isinstance(url, str) or not url.startswith('data:image/'):
+        return None
+    header, _, payload = url.partition(',')
+    if not header.endswith(';base64') or len(payload) > THUMBNAIL_MAX_SOURCE_BYTES * 4 // 3 + 4:
+        return None
+    try:
+        return base64.b64decode(payload, validate=True)
+    except ValueError:
+        return None
+
+def thumbnail_key(source: bytes) -> str:
+    '''
+    Content address of the thumbnails of one image: the same photo uploaded again
+    maps to thumbnails already in the store, and changing the sizes or quality
+    gives new names instead of overwriting files that may be cached downstream.
+    '''
+    spec = f"webp:{THUMBNAIL_QUALITY}:{','.join(map(str, THUMBNAIL_SIZES))}\n".encode()
+    return hashlib.sha256(spec + source).hexdigest()
+
+def render_thumbnails(source: bytes, sizes: Tuple[int, ...], quality: int) -> List[bytes]:
+    '''
+    Runs in a pool worker: decode the image once and encode one WebP per size, fitted
+    into size x size with the aspect ratio kept and never upscaled.
+    '''
+    from PIL import Image, ImageOps
+    Image.MAX_IMAGE_PIXELS = THUMBNAIL_MAX_PIXELS
+    encoded: Dict[int, bytes] = {}
+    with Image.open(io.BytesIO(source)) as original:
+        original.draft('RGB', (max(sizes), max(sizes)))  # JPEGs decode straight at a reduced scale
+        image = ImageOps.exif_transpose(original)
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+        for size in sorted(sizes, reverse=True):
+            image.thumbnail((size, size), Image.LANCZOS)
+            buffer = io.BytesIO()
+            image.save(buffer, 'WEBP', quality=quality, method=4)
+            encoded[size] = buffer.getvalue()
+    return [encoded[size] for size in sizes]
+
+def make_thumbnails(photo_urls: List[Any]) -> List[Optional[str]]:
+    '''
+    Thumbnail key for each photo (None where there is no decodable data: URL). Images
+    whose thumbnails are all in thumbnail_store already are cache hits; the other
+    distinct images are rendered in the process pool and written to the store. A
+    photo that cannot be rendered gets no key and does not fail the registration.
+    Without a thumbnail_store every key is None.
+    '''
+    keys: List[Optional[str]] = [None] * len(photo_urls)
+    if thumbnail_store is None or load_pillow() is None:
+        return keys
+    started = time.perf_counter()
+    sources: Dict[str, bytes] = {}
+    hits = 0
+    for index, url in enumerate(photo_urls):
+        source = decode_data_url(url)
+        if source is None:
+            continue
+        key = keys[index] = thumbnail_key(source)
+        if key in sources:
+            continue
+        if all(thumbnail_store.exists(f'{key}/{size}.webp') for size in THUMBNAIL_SIZES):
+            hits += 1
+            sources[key] = b''
+            continue
+        sources[key] = source
+
+    pending = {key: source for key, source in sources.items() if source}
+    if THUMBNAIL_WORKERS > 0 and pending:
+        futures = {key: thumbnail_pool().submit(render_thumbnails, source, THUMBNAIL_SIZES, THUMBNAIL_QUALITY)
+                   for key, source in pending.items()}
+        render = lambda key: futures[key].result()
+    else:
+        render = lambda key: render_thumbnails(pending[key], THUMBNAIL_SIZES, THUMBNAIL_QUALITY)
+    failed: Set[str] = set()
+    for key in pending:
+        try:
+            for size, data in zip(THUMBNAIL_SIZES, render(key)):
+                thumbnail_store.put(f'{key}/{size}.webp', data)
+        except Exception as e:  # any decode/encode error raised in the worker
+            failed.add(key)
+            print(f'thumbnail_failed key={key} error={type(e).__name__}: {e}')
+            if isinstance(e, BrokenProcessPool):
+                discard_thumbnail_pool()
+    if failed:
+        keys = [None if key in failed else key for key in keys]
+
+    if sources:
+        generated = len(pending) - len(failed)
+        _thumbnail_stats['hits'] += hits
+        _thumbnail_stats['generated'] += generated
+        _thumbnail_stats['failed'] += len(failed)
+        elapsed = time.perf_counter() - started
+        total = sum(_thumbnail_stats.values())
+        print(f"thumbnails images={len(sources)} hits={hits} generated={generated} failed={len(failed)} "
+              f"ms={elapsed * 1000:.1f} images_per_sec={len(pending) / elapsed if pending else 0:.1f} "
+              f"container_hit_rate={_thumbnail_stats['hits'] / total if total else 0:.3f}")
+    return keys